@@ -3,17 +3,27 @@
 
 Usage:
     python3 append_encoder_residuals.py <joints_csv> <encoder_info_csv> [--output <out_csv>]
+        [--chunk-rows N [--align-prefix-rows N] [--align-decimate K]]
+
+--chunk-rows streams both inputs block by block instead of loading them, so peak
+memory stays near the chunk size; alignment lags then come from a bounded prefix
+(optionally decimated) of the encoder info table.
 """
 
 from __future__ import annotations
 
 import argparse
+import math
 import re
 from pathlib import Path
+from typing import Iterator
 
 import numpy as np
 import pandas as pd
-from scipy.signal import correlate, correlation_lags
+
+from instrumentation import instrumented
+from lag_search import best_lags
+from table_io import TableWriter, iter_table, read_table, table_columns, write_table
 
 
 def _shift_array(arr: np.ndarray, lag: int) -> np.ndarray:
@@ -28,34 +38,40 @@ def _shift_array(arr: np.ndarray, lag: int) -> np.ndarray:
     return out
 
 
+def _shift_array_fractional(arr: np.ndarray, lag: float) -> np.ndarray:
+    """Shift by a sub-sample lag with linear interpolation; samples shifted in from outside are NaN."""
+    positions = np.arange(len(arr), dtype=float)
+    return np.interp(positions - lag, positions, arr.astype(float, copy=False), left=np.nan, right=np.nan)
+
+
+def _best_lags_for_alignment(
+    residuals: list[np.ndarray],
+    references: list[np.ndarray],
+    max_lag: int,
+    subsample: bool = False,
+) -> list[tuple[float, float]]:
+    """Lag and correlation for every (residual, reference) pair in one batched bounded search."""
+    results: list[tuple[float, float]] = [(0, float("nan"))] * len(residuals)
+    pairs = []
+    for i, (residual, reference) in enumerate(zip(residuals, references)):
+        valid = np.isfinite(residual) & np.isfinite(reference)
+        if np.count_nonzero(valid) >= 3:
+            pairs.append((i, residual[valid], reference[valid]))
+    if not pairs:
+        return results
+
+    lags, corrs = best_lags([p[1] for p in pairs], [p[2] for p in pairs], max_lag, subsample=subsample)
+    for (i, _r, _x), lag, corr in zip(pairs, lags, corrs):
+        results[i] = (float(lag) if subsample else int(lag), float(corr))
+    return results
+
+
 def _best_lag_for_alignment(
     residual: np.ndarray,
     reference: np.ndarray,
     max_lag: int,
 ) -> tuple[int, float]:
-    valid = np.isfinite(residual) & np.isfinite(reference)
-    if np.count_nonzero(valid) < 3:
-        return 0, float("nan")
-
-    r = residual[valid].astype(float, copy=False)
-    x = reference[valid].astype(float, copy=False)
-    r = r - np.mean(r)
-    x = x - np.mean(x)
-
-    c = correlate(r, x, mode="full")
-    lags = correlation_lags(len(r), len(x), mode="full")
-    keep = (lags >= -max_lag) & (lags <= max_lag)
-    c = c[keep]
-    lags = lags[keep]
-    if c.size == 0:
-        return 0, float("nan")
-
-    best_idx = int(np.argmax(np.abs(c)))
-    best_lag = int(lags[best_idx])
-
-    denom = float(np.sqrt(np.sum(r * r) * np.sum(x * x)))
-    best_corr = float(c[best_idx] / denom) if denom > np.finfo(float).eps else float("nan")
-    return best_lag, best_corr
+    return _best_lags_for_alignment([residual], [reference], max_lag)[0]
 
 
 def _joint_index_from_residual_col(col_name: str) -> int | None:
@@ -90,6 +106,7 @@ def _select_residual_columns(columns: list[str]) -> list[str]:
     return ordered_joint_cols + fallback_order
 
 
+@instrumented()
 def append_encoder_residuals(
     joints_csv: Path,
     encoder_info_csv: Path,
@@ -98,14 +115,15 @@ def append_encoder_residuals(
     align_residuals: bool = False,
     align_reference: str = "encoder",
     align_max_lag: int = 200,
+    align_subsample: bool = False,
 ) -> Path:
     if not joints_csv.is_file():
         raise FileNotFoundError(f"Missing joints CSV: {joints_csv}")
     if not encoder_info_csv.is_file():
         raise FileNotFoundError(f"Missing encoder info CSV: {encoder_info_csv}")
 
-    joints_df = pd.read_csv(joints_csv, header=None)
-    encoder_df = pd.read_csv(encoder_info_csv)
+    joints_df = read_table(joints_csv, header=False)
+    encoder_df = read_table(encoder_info_csv, header=True)
 
     residual_cols = _select_residual_columns(list(encoder_df.columns))
     if not residual_cols:
@@ -117,35 +135,60 @@ def append_encoder_residuals(
     if align_max_lag < 0:
         raise ValueError(f"align_max_lag must be >= 0, got {align_max_lag}")
 
+    numeric_cache: dict[str, np.ndarray] = {}
+
+    def numeric(col: str) -> np.ndarray:
+        if col not in numeric_cache:
+            numeric_cache[col] = pd.to_numeric(encoder_df[col], errors="coerce").to_numpy(dtype=float)
+        return numeric_cache[col]
+
     residual_df_full = encoder_df.loc[:, residual_cols].copy()
     alignment_debug_cols: dict[str, np.ndarray] = {}
-    lag_info: dict[str, int] = {}
+    lag_info: dict[str, float] = {}
     corr_info: dict[str, float] = {}
     ref_prefix = "ENCODER_POS_" if align_reference == "encoder" else "MAPPED_POT_"
+    joint_ids = []
     for fallback_i, res_col in enumerate(residual_cols, start=1):
         joint_i = _joint_index_from_residual_col(str(res_col))
-        idx = joint_i if joint_i is not None else fallback_i
+        joint_ids.append(joint_i if joint_i is not None else fallback_i)
+
+    # Every joint's lag comes from one batched bounded search.
+    alignment: dict[str, tuple[float, float]] = {}
+    if align_residuals:
+        to_align = []
+        for res_col, idx in zip(residual_cols, joint_ids):
+            ref_col = f"{ref_prefix}{idx}"
+            if ref_col not in encoder_df.columns:
+                print(f"Skipping alignment for {res_col}: missing reference column {ref_col}.")
+            else:
+                to_align.append((res_col, ref_col))
+        results = _best_lags_for_alignment(
+            [numeric(res_col) for res_col, _ in to_align],
+            [numeric(ref_col) for _, ref_col in to_align],
+            align_max_lag,
+            subsample=align_subsample,
+        )
+        alignment = {res_col: result for (res_col, _), result in zip(to_align, results)}
+
+    for res_col, idx in zip(residual_cols, joint_ids):
         ref_col = f"{ref_prefix}{idx}"
         enc_col = f"ENCODER_POS_{idx}"
         pot_col = f"MAPPED_POT_{idx}"
-        raw_residual = pd.to_numeric(encoder_df[res_col], errors="coerce").to_numpy(dtype=float)
+        raw_residual = numeric(res_col)
 
         lag = 0
         corr = float("nan")
         shifted_filled = raw_residual
 
-        if align_residuals:
-            if ref_col not in encoder_df.columns:
-                print(f"Skipping alignment for {res_col}: missing reference column {ref_col}.")
+        if res_col in alignment:
+            lag, corr = alignment[res_col]
+            if align_subsample:
+                shifted = _shift_array_fractional(raw_residual, lag)
             else:
-                reference = pd.to_numeric(encoder_df[ref_col], errors="coerce").to_numpy(dtype=float)
-                lag, corr = _best_lag_for_alignment(raw_residual, reference, align_max_lag)
                 shifted = _shift_array(raw_residual, lag)
-                shifted_filled = pd.Series(shifted).bfill().ffill().to_numpy(dtype=float)
-                residual_df_full[res_col] = shifted_filled
-                print(
-                    f"{res_col} alignment: lag={lag} samples, corr={corr:.6f}, reference={ref_col}"
-                )
+            shifted_filled = pd.Series(shifted).bfill().ffill().to_numpy(dtype=float)
+            residual_df_full[res_col] = shifted_filled
+            print(f"{res_col} alignment: lag={lag:g} samples, corr={corr:.6f}, reference={ref_col}")
 
         alignment_debug_cols[f"JOINT_{idx}_RESIDUAL_RAW"] = raw_residual
         alignment_debug_cols[f"JOINT_{idx}_RESIDUAL_SHIFTED"] = shifted_filled
@@ -153,17 +196,11 @@ def append_encoder_residuals(
         corr_info[f"JOINT_{idx}_ALIGN_CORR"] = corr
 
         if ref_col in encoder_df.columns:
-            alignment_debug_cols[f"JOINT_{idx}_ALIGN_REFERENCE"] = pd.to_numeric(
-                encoder_df[ref_col], errors="coerce"
-            ).to_numpy(dtype=float)
+            alignment_debug_cols[f"JOINT_{idx}_ALIGN_REFERENCE"] = numeric(ref_col)
         if enc_col in encoder_df.columns:
-            alignment_debug_cols[f"JOINT_{idx}_ENCODER_POS"] = pd.to_numeric(
-                encoder_df[enc_col], errors="coerce"
-            ).to_numpy(dtype=float)
+            alignment_debug_cols[f"JOINT_{idx}_ENCODER_POS"] = numeric(enc_col)
         if pot_col in encoder_df.columns:
-            alignment_debug_cols[f"JOINT_{idx}_MAPPED_POT"] = pd.to_numeric(
-                encoder_df[pot_col], errors="coerce"
-            ).to_numpy(dtype=float)
+            alignment_debug_cols[f"JOINT_{idx}_MAPPED_POT"] = numeric(pot_col)
 
     min_len = min(len(joints_df), len(encoder_df))
     if len(joints_df) != len(encoder_df):
@@ -180,10 +217,9 @@ def append_encoder_residuals(
 
     out_df = pd.concat([joints_df, residual_df], axis=1)
     out_path = output_csv if output_csv is not None else joints_csv
-    out_df.to_csv(out_path, index=False, header=False)
+    write_table(out_df, out_path, header=False)
 
     if save_alignment_debug_csv is not None:
-        print("SAVING DEBUG INFO")
         debug_df = pd.DataFrame()
         if "TIMESTAMP" in encoder_df.columns:
             debug_df["TIMESTAMP"] = pd.to_numeric(encoder_df["TIMESTAMP"], errors="coerce")
@@ -200,7 +236,7 @@ def append_encoder_residuals(
 
         debug_df = debug_df.iloc[:min_len].reset_index(drop=True)
         save_alignment_debug_csv.parent.mkdir(parents=True, exist_ok=True)
-        debug_df.to_csv(save_alignment_debug_csv, index=False)
+        write_table(debug_df, save_alignment_debug_csv, header=True)
         print(f"Saved alignment debug CSV: {save_alignment_debug_csv}")
 
     print(
@@ -210,6 +246,289 @@ def append_encoder_residuals(
     return out_path
 
 
+class _RowWindow:
+    """Sliding window of rows [start, end) over a table read as consecutive DataFrame chunks."""
+
+    def __init__(self, chunks: Iterator[pd.DataFrame]):
+        self._chunks = chunks
+        self.data: pd.DataFrame | None = None
+        self.start = 0
+        self.exhausted = False
+
+    @property
+    def end(self) -> int:
+        return self.start + (0 if self.data is None else len(self.data))
+
+    def fill_to(self, row: int) -> None:
+        """Read chunks until the window reaches row or the table ends."""
+        pieces = [] if self.data is None else [self.data]
+        end = self.end
+        while end < row and not self.exhausted:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self.exhausted = True
+                break
+            pieces.append(chunk.reset_index(drop=True))
+            end += len(chunk)
+        if pieces:
+            self.data = pd.concat(pieces, ignore_index=True) if len(pieces) > 1 else pieces[0]
+
+    def drain(self) -> int:
+        """Count the remaining rows without keeping them; returns the table length."""
+        total = self.end
+        for chunk in self._chunks:
+            total += len(chunk)
+        self.exhausted = True
+        return total
+
+    def rows(self, lo: int, hi: int) -> pd.DataFrame:
+        return self.data.iloc[lo - self.start : hi - self.start]
+
+    def drop_before(self, row: int) -> None:
+        k = row - self.start
+        if k > 0 and self.data is not None:
+            self.data = self.data.iloc[k:].reset_index(drop=True)
+            self.start = row
+
+
+def _numeric_chunks(chunks: Iterator[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+    for chunk in chunks:
+        yield chunk.apply(pd.to_numeric, errors="coerce").astype(float)
+
+
+def _alignment_sample(
+    encoder_info_path: Path,
+    columns: list[str],
+    prefix_rows: int | None,
+    decimate: int,
+    chunk_rows: int,
+) -> dict[str, np.ndarray]:
+    """Every decimate-th row of the first prefix_rows rows (all rows if None) of the given columns."""
+    pieces = []
+    seen = 0
+    for chunk in _numeric_chunks(iter_table(encoder_info_path, header=True, chunk_rows=chunk_rows, usecols=columns)):
+        if prefix_rows is not None:
+            chunk = chunk.iloc[: max(0, prefix_rows - seen)]
+        # Keep global rows 0, k, 2k, ... regardless of chunk boundaries.
+        pieces.append(chunk.iloc[(-seen) % decimate :: decimate])
+        seen += len(chunk)
+        if prefix_rows is not None and seen >= prefix_rows:
+            break
+    sample = pd.concat(pieces, ignore_index=True) if pieces else pd.DataFrame(columns=columns)
+    return {col: sample[col].to_numpy(dtype=float) for col in columns}
+
+
+def _shift_block(window: _RowWindow, col: str, lag: float, lo: int, hi: int, n_source: float) -> np.ndarray:
+    """Rows [lo, hi) of the column shifted by lag, as _shift_array/_shift_array_fractional would give."""
+    positions = np.arange(lo, hi, dtype=float) - lag
+    base = np.floor(positions).astype(np.int64)
+    frac = positions - base
+    valid = (positions >= 0) & (positions <= n_source - 1)
+    values = window.data[col].to_numpy(dtype=float)
+    idx = np.clip(base - window.start, 0, len(values) - 1)
+    out = values[idx]
+    blend = valid & (frac > 0)
+    if np.any(blend):
+        nxt = values[np.clip(idx + 1, 0, len(values) - 1)]
+        out = np.where(blend, out + (nxt - out) * frac, out)
+    return np.where(valid, out, np.nan)
+
+
+@instrumented()
+def append_encoder_residuals_streaming(
+    joints_csv: Path,
+    encoder_info_csv: Path,
+    output_csv: Path | None = None,
+    save_alignment_debug_csv: Path | None = None,
+    align_residuals: bool = False,
+    align_reference: str = "encoder",
+    align_max_lag: int = 200,
+    align_subsample: bool = False,
+    chunk_rows: int = 262_144,
+    align_prefix_rows: int | None = 2_000_000,
+    align_decimate: int = 1,
+) -> Path:
+    """
+    Chunked variant of append_encoder_residuals with peak memory near chunk_rows.
+
+    Lags are estimated from the first align_prefix_rows rows of the encoder info table
+    (None for all), keeping every align_decimate-th row; a decimated lag is only resolved
+    to align_decimate samples. Both inputs are then streamed together and the output and
+    debug tables are written block by block. With lags computed on the whole table
+    (align_prefix_rows=None, align_decimate=1) the output equals append_encoder_residuals,
+    except that a NaN run in an aligned residual longer than 4 * chunk_rows is forward-filled
+    instead of back-filled, which bounds how many rows are held back.
+    """
+    if not joints_csv.is_file():
+        raise FileNotFoundError(f"Missing joints CSV: {joints_csv}")
+    if not encoder_info_csv.is_file():
+        raise FileNotFoundError(f"Missing encoder info CSV: {encoder_info_csv}")
+    if align_max_lag < 0:
+        raise ValueError(f"align_max_lag must be >= 0, got {align_max_lag}")
+    if chunk_rows < 1 or align_decimate < 1:
+        raise ValueError(f"chunk_rows and align_decimate must be >= 1, got {chunk_rows} and {align_decimate}")
+
+    encoder_columns = table_columns(encoder_info_csv, header=True)
+    residual_cols = _select_residual_columns(encoder_columns)
+    if not residual_cols:
+        raise ValueError(
+            f"No residual columns found in {encoder_info_csv}. "
+            "Expected at least one column containing 'residual'."
+        )
+
+    ref_prefix = "ENCODER_POS_" if align_reference == "encoder" else "MAPPED_POT_"
+    joint_ids = []
+    for fallback_i, res_col in enumerate(residual_cols, start=1):
+        joint_i = _joint_index_from_residual_col(str(res_col))
+        joint_ids.append(joint_i if joint_i is not None else fallback_i)
+
+    alignment: dict[str, tuple[float, float]] = {}
+    if align_residuals:
+        to_align = []
+        for res_col, idx in zip(residual_cols, joint_ids):
+            ref_col = f"{ref_prefix}{idx}"
+            if ref_col not in encoder_columns:
+                print(f"Skipping alignment for {res_col}: missing reference column {ref_col}.")
+            else:
+                to_align.append((res_col, ref_col))
+        needed = list(dict.fromkeys(col for pair in to_align for col in pair))
+        sample = _alignment_sample(encoder_info_csv, needed, align_prefix_rows, align_decimate, chunk_rows)
+        results = _best_lags_for_alignment(
+            [sample[res_col] for res_col, _ in to_align],
+            [sample[ref_col] for _, ref_col in to_align],
+            math.ceil(align_max_lag / align_decimate),
+            subsample=align_subsample,
+        )
+        for (res_col, ref_col), (lag, corr) in zip(to_align, results):
+            lag = float(np.clip(lag * align_decimate, -align_max_lag, align_max_lag))
+            alignment[res_col] = (lag if align_subsample else int(lag), corr)
+            print(f"{res_col} alignment: lag={lag:g} samples, corr={corr:.6f}, reference={ref_col}")
+
+    # Debug columns in the order append_encoder_residuals writes them.
+    debug_sources: list[tuple[str, str, str]] = []
+    for res_col, idx in zip(residual_cols, joint_ids):
+        debug_sources.append((f"JOINT_{idx}_RESIDUAL_RAW", "raw", res_col))
+        debug_sources.append((f"JOINT_{idx}_RESIDUAL_SHIFTED", "shifted", res_col))
+        for key, col in (
+            (f"JOINT_{idx}_ALIGN_REFERENCE", f"{ref_prefix}{idx}"),
+            (f"JOINT_{idx}_ENCODER_POS", f"ENCODER_POS_{idx}"),
+            (f"JOINT_{idx}_MAPPED_POT", f"MAPPED_POT_{idx}"),
+        ):
+            if col in encoder_columns:
+                debug_sources.append((key, "raw", col))
+    lag_info = {f"JOINT_{idx}_LAG_SAMPLES": alignment.get(col, (0, 0.0))[0] for col, idx in zip(residual_cols, joint_ids)}
+    corr_info = {
+        f"JOINT_{idx}_ALIGN_CORR": alignment.get(col, (0, float("nan")))[1] for col, idx in zip(residual_cols, joint_ids)
+    }
+
+    stream_cols = list(residual_cols)
+    if save_alignment_debug_csv is not None:
+        has_timestamp = "TIMESTAMP" in encoder_columns
+        stream_cols += [col for _key, _kind, col in debug_sources] + (["TIMESTAMP"] if has_timestamp else [])
+    stream_cols = list(dict.fromkeys(stream_cols))
+
+    lags = {col: float(alignment.get(col, (0, 0.0))[0]) for col in residual_cols}
+    back = max(0, math.ceil(max(lags.values()))) + 1
+    ahead = max(0, math.ceil(-min(lags.values()))) + 1
+
+    encoder = _RowWindow(_numeric_chunks(iter_table(encoder_info_csv, header=True, chunk_rows=chunk_rows, usecols=stream_cols)))
+    joints = _RowWindow(iter_table(joints_csv, header=False, chunk_rows=chunk_rows))
+    out_path = output_csv if output_csv is not None else joints_csv
+    out_writer = TableWriter(out_path, header=False)
+    debug_writer = None
+    if save_alignment_debug_csv is not None:
+        save_alignment_debug_csv.parent.mkdir(parents=True, exist_ok=True)
+        debug_writer = TableWriter(save_alignment_debug_csv, header=True)
+
+    try:
+        last_valid = {col: np.nan for col in residual_cols}
+        emit_from = 0
+        scanned_to = 0
+        while True:
+            target = max(emit_from, scanned_to) + chunk_rows
+            encoder.fill_to(target + ahead)
+            joints.fill_to(target)
+            n_encoder = encoder.end if encoder.exhausted else np.inf
+            hi = min(target, encoder.end if encoder.exhausted else encoder.end - ahead)
+            if joints.exhausted and emit_from >= joints.end or emit_from >= n_encoder:
+                break
+            scanned_to = hi
+            final = encoder.exhausted and hi == encoder.end
+
+            # Shift, then back-fill within the block; rows ending in an unresolved NaN run wait
+            # for the next block, which is what a whole-column bfill() would have looked ahead to.
+            shifted = {}
+            cut = hi
+            for col in residual_cols:
+                values = _shift_block(encoder, col, lags[col], emit_from, hi, n_encoder)
+                shifted[col] = values
+                if col not in alignment:
+                    continue
+                values = shifted[col] = pd.Series(values).bfill().to_numpy()
+                finite = np.flatnonzero(np.isfinite(values))
+                trailing_start = emit_from + (finite[-1] + 1 if len(finite) else 0)
+                if not final and hi - trailing_start < 4 * chunk_rows:
+                    cut = min(cut, trailing_start)
+            stop = min(cut, joints.end)
+            if stop <= emit_from and not final:
+                continue
+
+            n = stop - emit_from
+            block = pd.DataFrame(index=range(n))
+            for col in residual_cols:
+                values = shifted[col][:n]
+                if col not in alignment:
+                    shifted[col] = block[col] = values
+                    continue
+                # Forward-fill the tail of the column (and any run longer than the hold-back limit).
+                values = pd.Series(np.concatenate(([last_valid[col]], values))).ffill().to_numpy()[1:]
+                if n:
+                    last_valid[col] = values[-1]
+                shifted[col] = values
+                block[col] = values
+            out_writer.write(pd.concat([joints.rows(emit_from, stop).reset_index(drop=True), block], axis=1))
+
+            if debug_writer is not None:
+                source = encoder.rows(emit_from, stop).reset_index(drop=True)
+                debug_df = pd.DataFrame(index=range(n))
+                if "TIMESTAMP" in source.columns:
+                    debug_df["TIMESTAMP"] = source["TIMESTAMP"].to_numpy()
+                else:
+                    debug_df["SAMPLE_INDEX"] = np.arange(emit_from, stop, dtype=int)
+                for key, kind, col in debug_sources:
+                    debug_df[key] = shifted[col] if kind == "shifted" else source[col].to_numpy()
+                for key, value in lag_info.items():
+                    debug_df[key] = value
+                for key, value in corr_info.items():
+                    debug_df[key] = value
+                debug_writer.write(debug_df)
+
+            emit_from = stop
+            encoder.drop_before(emit_from - back)
+            joints.drop_before(emit_from)
+
+        n_joints = joints.drain()
+        n_encoder = encoder.drain()
+        min_len = min(n_joints, n_encoder)
+        if n_joints != n_encoder:
+            print(f"Length mismatch: joints={n_joints}, encoder={n_encoder}. Truncating to {min_len}.")
+        if min_len == 0:
+            raise ValueError("No rows available after alignment (min length is 0)")
+    except BaseException:
+        # Leave no .partial files behind when the stream fails or turns out empty.
+        out_writer.abort()
+        if debug_writer is not None:
+            debug_writer.abort()
+        raise
+
+    out_writer.close()
+    if debug_writer is not None:
+        debug_writer.close()
+        print(f"Saved alignment debug CSV: {save_alignment_debug_csv}")
+    print(f"Appended {len(residual_cols)} residual columns to {out_path}. Rows written: {out_writer.n_rows}")
+    return out_path
+
+
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(
         description="Append encoder residual columns to the end of a joints/interpolated_all_joints.csv file."
@@ -253,11 +572,49 @@ def parse_args() -> argparse.Namespace:
         default=1000,
         help="Max lag (in samples) searched in both directions for alignment.",
     )
+    parser.add_argument(
+        "--align-subsample",
+        action="store_true",
+        help="Refine each lag to a fraction of a sample (parabolic peak fit) and shift by interpolation.",
+    )
+    parser.add_argument(
+        "--chunk-rows",
+        type=int,
+        default=None,
+        help="Stream both inputs in blocks of this many rows instead of loading them.",
+    )
+    parser.add_argument(
+        "--align-prefix-rows",
+        type=int,
+        default=2_000_000,
+        help="With --chunk-rows: rows of the encoder info table used to estimate lags (0 = all).",
+    )
+    parser.add_argument(
+        "--align-decimate",
+        type=int,
+        default=1,
+        help="With --chunk-rows: estimate lags on every Nth row (lag resolution N samples).",
+    )
     return parser.parse_args()
 
 
 def main() -> None:
     args = parse_args()
+    if args.chunk_rows is not None:
+        append_encoder_residuals_streaming(
+            args.joints_csv,
+            args.encoder_info_csv,
+            args.output,
+            args.save_alignment_debug_csv,
+            align_residuals=not args.no_align_residuals,
+            align_reference=args.align_reference,
+            align_max_lag=args.align_max_lag,
+            align_subsample=args.align_subsample,
+            chunk_rows=args.chunk_rows,
+            align_prefix_rows=args.align_prefix_rows or None,
+            align_decimate=args.align_decimate,
+        )
+        return
     append_encoder_residuals(
         args.joints_csv,
         args.encoder_info_csv,
@@ -266,6 +623,7 @@ def main() -> None:
         align_residuals=not args.no_align_residuals,
         align_reference=args.align_reference,
         align_max_lag=args.align_max_lag,
+        align_subsample=args.align_subsample,
     )
 
 
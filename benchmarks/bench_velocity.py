@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Compare the velocity estimators in velocity.py with pot_to_encoder's original one.
+
+Three joints follow slow sinusoids (0.3-1.5 Hz) sampled at 10 kHz with timestamp
+jitter, plus pot-like position noise. The true velocity is known, so each
+estimator reports wall time, RMS error against it, and its lag (the
+cross-correlation peak against the true velocity, sub-sample refined). The
+baseline is the original per-joint pandas implementation (EWM, np.gradient,
+EWM), kept here verbatim.
+
+Usage:
+    python3 benchmarks/bench_velocity.py [--seconds 600] [--span 6] [--noise 2e-4]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from lag_search import best_lags  # noqa: E402
+from velocity import estimate_velocity, estimate_velocity_chunked  # noqa: E402
+
+FS = 10000.0
+JOINT_FREQS_HZ = np.array([0.3, 0.8, 1.5])
+MAX_LAG = 2000
+
+
+def original_smoothed_velocity(ts, pos, smooth_span):
+    """pot_to_encoder._smoothed_velocity as it was before velocity.py."""
+    if len(pos) < 3:
+        return np.zeros_like(pos)
+    span = max(3, int(smooth_span))
+    pos_smooth = pd.Series(pos).ewm(span=span, adjust=False).mean().to_numpy()
+    dt = np.diff(ts)
+    if np.all(dt > 0):
+        vel = np.gradient(pos_smooth, ts, edge_order=1)
+    else:
+        positive_dt = dt[dt > 0]
+        step = float(np.median(positive_dt)) if len(positive_dt) else 1.0
+        vel = np.gradient(pos_smooth, step, edge_order=1)
+    return pd.Series(vel).ewm(span=max(3, span // 2), adjust=False).mean().to_numpy()
+
+
+def synthetic_positions(seconds, noise, seed=0):
+    rng = np.random.default_rng(seed)
+    n = int(seconds * FS)
+    t = np.arange(n) / FS + rng.uniform(-2e-6, 2e-6, size=n)
+    phase = 2 * np.pi * t[:, np.newaxis] * JOINT_FREQS_HZ
+    pos = np.sin(phase) + noise * rng.standard_normal((n, len(JOINT_FREQS_HZ)))
+    vel = 2 * np.pi * JOINT_FREQS_HZ * np.cos(phase)
+    return t, pos, vel
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=600, help="Length of the synthetic capture.")
+    parser.add_argument("--span", type=int, default=6, help="EWM span (pot_to_encoder.py's CLI default is 6).")
+    parser.add_argument("--noise", type=float, default=2e-4, help="Position noise standard deviation.")
+    parser.add_argument("--chunk-rows", type=int, default=1_000_000, help="Chunk size for the streaming runs.")
+    args = parser.parse_args()
+
+    t, pos, true_vel = synthetic_positions(args.seconds, args.noise)
+    print(f"{len(t)} rows x {pos.shape[1]} joints at {FS:g} Hz, noise {args.noise:g}")
+    runs = {
+        "original (pandas)": lambda: np.column_stack(
+            [original_smoothed_velocity(t, pos[:, j], args.span) for j in range(pos.shape[1])]
+        ),
+        "ewm": lambda: estimate_velocity(t, pos, "ewm", span=args.span),
+        "savgol": lambda: estimate_velocity(t, pos, "savgol"),
+        "kalman": lambda: estimate_velocity(t, pos, "kalman"),
+        "savgol (chunked)": lambda: estimate_velocity_chunked(t, pos, "savgol", chunk_rows=args.chunk_rows),
+        "kalman (chunked)": lambda: estimate_velocity_chunked(t, pos, "kalman", chunk_rows=args.chunk_rows),
+    }
+    edge = MAX_LAG
+    for name, run in runs.items():
+        start = time.perf_counter()
+        vel = run()
+        seconds = time.perf_counter() - start
+        err = vel[edge:-edge] - true_vel[edge:-edge]
+        lags, _ = best_lags(vel[edge:-edge].T, true_vel[edge:-edge].T, MAX_LAG, subsample=True)
+        print(
+            f"{name:>18}: {seconds:7.3f} s, {len(t) / seconds / 1e6:6.1f} M rows/s, "
+            f"RMS error {np.sqrt(np.mean(err**2)):.3e}, lag {np.mean(lags) / FS * 1e3:6.3f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""Time every preprocessing stage on synthetic 10 kHz captures and report JSON.
+
+Each (stage, capture size) pair runs in a fresh process, so peak RSS is that
+stage's own high-water mark rather than the largest stage seen so far. Inputs
+a stage takes in memory are loaded before the clock starts; stages that take
+file paths are timed including their own reads and writes, as they run in
+the pipeline.
+
+Usage:
+    python3 benchmarks/run_benchmarks.py [--sizes 1m 10m 1h] [--only filter interpolate] \
+        [--workdir /tmp/bench] [-o results.json] [--baseline old.json --tolerance 0.2]
+
+With --baseline, stages whose rows/s dropped by more than --tolerance against
+the baseline are listed and the script exits with status 1.
+"""
+
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import multiprocessing as mp
+import os
+import platform
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from instrumentation import peak_rss_mb  # noqa: E402
+from synthetic import CAPTURE_SECONDS, FS, capture_rows, write_capture  # noqa: E402
+
+DOWNSAMPLE_HZ = 100.0
+FILTER_CUTOFF_HZ = 60.0
+FILTER_ORDER = 30
+
+
+def _bench_preprocess(paths, out_dir):
+    from preprocessing import preprocess_csv
+
+    return lambda: preprocess_csv(str(paths["zynq"]), str(out_dir / "preprocessed.csv"))
+
+
+def _bench_filter(paths, out_dir, executor="thread"):
+    import filter as fir
+
+    df = pd.read_csv(paths["joints"], header=None)
+    columns = fir.torque_feedback_columns(filter_velocity=True, filter_position=True)
+
+    def run():
+        coeffs = fir.design_fir_filter("kaiser", FS, FILTER_CUTOFF_HZ, FILTER_ORDER)
+        return fir.apply_filter_to_dataframe(df.copy(), coeffs, column_indices=columns, executor=executor)
+
+    return run
+
+
+def _bench_filter_serial(paths, out_dir):
+    return _bench_filter(paths, out_dir, executor="serial")
+
+
+def _bench_filter_process(paths, out_dir):
+    return _bench_filter(paths, out_dir, executor="process")
+
+
+def _bench_downsample(paths, out_dir):
+    from downsample import downsample_dataframe
+
+    df = pd.read_csv(paths["joints"], header=None)
+    return lambda: downsample_dataframe(df, FS, DOWNSAMPLE_HZ, use_moving_average=True)
+
+
+def _bench_decimate(paths, out_dir):
+    from downsample import decimate_dataframe, design_decimation_filter
+
+    df = pd.read_csv(paths["joints"], header=None)
+    return lambda: decimate_dataframe(df, FS, DOWNSAMPLE_HZ, design_decimation_filter(FS, DOWNSAMPLE_HZ))
+
+
+def _bench_interpolate(paths, out_dir):
+    from interpolate_timestamps import interpolate_dataframe_to_sample_rate
+
+    df = pd.read_csv(paths["joints"], header=None)
+    return lambda: interpolate_dataframe_to_sample_rate(df, FS)
+
+
+def _bench_jacobian(paths, out_dir):
+    from interpolate_jacobian2 import compute_flattened_jacobian
+
+    return lambda: compute_flattened_jacobian(
+        str(paths["joints"]), str(out_dir / "jacobian.csv"), str(REPO_ROOT / "dvpsm.rob")
+    )
+
+
+def _bench_pot_to_encoder(paths, out_dir):
+    from pot_to_encoder import replace_encoder_from_pots
+
+    return lambda: replace_encoder_from_pots(str(paths["zynq"]), str(out_dir / "pot_mapped.csv"))
+
+
+def _bench_extract_encoder_info(paths, out_dir):
+    from extract_encoder_info import extract_encoder_info
+
+    return lambda: extract_encoder_info(str(paths["zynq"]), str(out_dir / "encoder_info.csv"), pot_filter=True)
+
+
+def _bench_append_residuals(paths, out_dir):
+    from append_encoder_residuals import append_encoder_residuals
+
+    return lambda: append_encoder_residuals(
+        paths["joints"],
+        paths["encoder_info"],
+        output_csv=out_dir / "joints_with_residuals.csv",
+        align_residuals=True,
+    )
+
+
+BENCHMARKS = {
+    "preprocess_csv": _bench_preprocess,
+    "filter": _bench_filter,
+    "filter_serial": _bench_filter_serial,
+    "filter_process": _bench_filter_process,
+    "downsample": _bench_downsample,
+    "decimate": _bench_decimate,
+    "interpolate": _bench_interpolate,
+    "jacobian": _bench_jacobian,
+    "pot_to_encoder": _bench_pot_to_encoder,
+    "extract_encoder_info": _bench_extract_encoder_info,
+    "append_encoder_residuals": _bench_append_residuals,
+}
+
+
+def _run_one(name, size, paths, out_dir, queue):
+    try:
+        # Stage scripts report progress on stdout; keep it out of the JSON output.
+        with contextlib.redirect_stdout(io.StringIO()):
+            run = BENCHMARKS[name](paths, out_dir)
+            setup_rss = peak_rss_mb()
+            wall, cpu = time.perf_counter(), time.process_time()
+            run()
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        rows = capture_rows(size)
+        queue.put(
+            {
+                "benchmark": name,
+                "size": size,
+                "rows": rows,
+                "wall_s": wall,
+                "cpu_s": cpu,
+                "rows_per_s": rows / wall if wall > 0 else float("inf"),
+                "setup_rss_mb": setup_rss,
+                "peak_rss_mb": peak_rss_mb(),
+            }
+        )
+    except Exception as exc:  # reported, not raised, so one broken stage does not stop the suite
+        queue.put({"benchmark": name, "size": size, "error": f"{type(exc).__name__}: {exc}"})
+
+
+def run_benchmark(name: str, size: str, paths: dict, out_dir: Path) -> dict:
+    """Run one stage on one capture in a fresh spawned process and return its result record."""
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_run_one, args=(name, size, paths, out_dir, queue))
+    proc.start()
+    proc.join()
+    if proc.exitcode != 0:
+        return {"benchmark": name, "size": size, "error": f"process exited with code {proc.exitcode}"}
+    return queue.get()
+
+
+def compare_with_baseline(results: list[dict], baseline: dict, tolerance: float) -> list[str]:
+    """Stages whose rows/s fell by more than tolerance (a fraction) relative to the baseline run."""
+    before = {(r["benchmark"], r["size"]): r for r in baseline["results"] if "rows_per_s" in r}
+    regressions = []
+    for r in results:
+        old = before.get((r["benchmark"], r["size"]))
+        if old is None or "rows_per_s" not in r:
+            continue
+        ratio = r["rows_per_s"] / old["rows_per_s"]
+        if ratio < 1.0 - tolerance:
+            regressions.append(f"{r['benchmark']} [{r['size']}]: {ratio:.2f}x baseline rows/s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the preprocessing stages on synthetic captures.")
+    parser.add_argument("--sizes", nargs="+", default=list(CAPTURE_SECONDS), choices=list(CAPTURE_SECONDS))
+    parser.add_argument("--only", nargs="+", default=list(BENCHMARKS), choices=list(BENCHMARKS))
+    parser.add_argument("--workdir", type=str, default="bench_data", help="Synthetic captures and stage outputs.")
+    parser.add_argument("-o", "--output", type=str, default=None, help="Write the JSON report here (default: stdout).")
+    parser.add_argument("--baseline", type=str, default=None, help="Earlier JSON report to compare rows/s against.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed fractional rows/s drop vs. baseline.")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        capture_dir = Path(args.workdir) / size
+        print(f"Preparing {size} capture ({capture_rows(size)} rows) in {capture_dir}", file=sys.stderr)
+        paths = write_capture(capture_dir, size)
+        out_dir = capture_dir / "out"
+        out_dir.mkdir(exist_ok=True)
+        for name in args.only:
+            result = run_benchmark(name, size, paths, out_dir)
+            results.append(result)
+            if "error" in result:
+                print(f"{name:>25} [{size}]: {result['error']}", file=sys.stderr)
+            else:
+                print(
+                    f"{name:>25} [{size}]: {result['wall_s']:8.3f} s, {result['rows_per_s'] / 1e6:7.2f} M rows/s, "
+                    f"peak RSS {result['peak_rss_mb']:8.1f} MB",
+                    file=sys.stderr,
+                )
+
+    report = {
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "sample_rate_hz": FS,
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        regressions = compare_with_baseline(results, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
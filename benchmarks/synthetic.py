@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""Synthetic 10 kHz captures with the column layouts the preprocessing scripts expect.
+
+Three tables are written per capture:
+    zynq.csv                     headered raw capture (TIMESTAMP, POSITION/VELOCITY/TORQUE_FEEDBACK_1..6,
+                                 POT_1..6, ENCODER_POS_1..6, ENCODER_VEL_1..6)
+    interpolated_all_joints.csv  headerless 19-column table written by preprocessing.py
+    encoder_info.csv             headered extract_encoder_info.py output (MAPPED_POT, ENCODER_POS, residuals)
+
+Signals are slow sinusoids within the dVRK PSM joint limits plus a little noise, and
+timestamps carry sample-clock jitter, so filters, resamplers and the lag search see
+realistic data. Rows are generated in blocks, so an hour-long capture never has to
+fit in memory at once.
+
+Usage:
+    python3 benchmarks/synthetic.py out_dir [--size 10m]
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from pot_calibration import POT_ENCODER_PAIRS  # noqa: E402
+
+FS = 10000.0
+CAPTURE_SECONDS = {"1m": 60, "10m": 600, "1h": 3600}
+BLOCK_ROWS = 500_000
+JITTER_S = 2e-6
+ENCODER_LAG = 12  # samples the encoder trails the pots by, for the residual alignment search
+
+# Joint centre and amplitude (rad, or m for the prismatic joint 3).
+JOINT_CENTRE = np.array([0.0, 0.0, 0.12, 0.0, 0.0, 0.0])
+JOINT_AMPLITUDE = np.array([0.8, 0.5, 0.05, 1.5, 0.6, 0.6])
+# Joint (0-based) measured by POT_1..6 and the pot's sign. POT_3/4/5 follow the
+# POT_ENCODER_PAIRS wiring (joints 1/2/3, POT_5 inverted); the other pots are unused.
+POT_JOINT = np.array([3, 4, 0, 1, 2, 5])
+POT_SIGN = np.array([1.0, 1.0, 1.0, 1.0, -1.0, 1.0])
+# Smallest |correlation| a block may show between a pot and the encoder it is paired with.
+MIN_PAIR_CORRELATION = 0.9
+
+ZYNQ_COLS = (
+    ["TIMESTAMP"]
+    + [f"POSITION_FEEDBACK_{i}" for i in range(1, 7)]
+    + [f"VELOCITY_FEEDBACK_{i}" for i in range(1, 7)]
+    + [f"TORQUE_FEEDBACK_{i}" for i in range(1, 7)]
+    + [f"POT_{i}" for i in range(1, 7)]
+    + [f"ENCODER_POS_{i}" for i in range(1, 7)]
+    + [f"ENCODER_VEL_{i}" for i in range(1, 7)]
+)
+ENCODER_INFO_COLS = ["TIMESTAMP"] + [
+    col for i in range(1, 4) for col in (f"MAPPED_POT_{i}", f"ENCODER_POS_{i}", f"JOINT_{i}_RESIDUAL")
+]
+
+
+def capture_rows(size: str) -> int:
+    if size not in CAPTURE_SECONDS:
+        raise ValueError(f"Unknown capture size: {size}. Expected one of {list(CAPTURE_SECONDS)}")
+    return int(CAPTURE_SECONDS[size] * FS)
+
+
+def _joint_frequencies(seed: int) -> np.ndarray:
+    return np.random.default_rng(seed).uniform(0.05, 1.0, size=6)
+
+
+def zynq_block(start: int, stop: int, seed: int = 0) -> pd.DataFrame:
+    """Rows [start, stop) of the raw capture; any block split gives the same table."""
+    freqs = _joint_frequencies(seed)
+    rng = np.random.default_rng([seed, start])
+    n = np.arange(start, stop)
+    t = n / FS + rng.uniform(-JITTER_S, JITTER_S, size=len(n))
+    phase = 2 * np.pi * t[:, np.newaxis] * freqs
+
+    position = JOINT_CENTRE + JOINT_AMPLITUDE * np.sin(phase)
+    velocity = JOINT_AMPLITUDE * 2 * np.pi * freqs * np.cos(phase)
+    torque = 0.2 * np.sin(phase + 0.3) + 0.01 * rng.standard_normal(position.shape)
+    # The encoder trails the pots by ENCODER_LAG samples; pots are noisier and uncalibrated.
+    lagged = JOINT_CENTRE + JOINT_AMPLITUDE * np.sin(phase - 2 * np.pi * freqs * ENCODER_LAG / FS)
+    pot = POT_SIGN * (1.7 * position[:, POT_JOINT] + 0.05) + 2e-3 * rng.standard_normal(position.shape)
+    if len(n) >= FS:
+        for pot_col, enc_col, _sign in POT_ENCODER_PAIRS:
+            p, e = int(pot_col.split("_")[1]) - 1, int(enc_col.split("_")[-1]) - 1
+            corr = np.corrcoef(pot[:, p], lagged[:, e])[0, 1]
+            assert abs(corr) > MIN_PAIR_CORRELATION, f"{pot_col} vs {enc_col}: correlation {corr:.3f}"
+    encoder_vel = velocity + 1e-3 * rng.standard_normal(position.shape)
+
+    values = np.column_stack((t, position, velocity, torque, pot, lagged, encoder_vel))
+    return pd.DataFrame(values, columns=ZYNQ_COLS)
+
+
+def encoder_info_block(zynq: pd.DataFrame) -> pd.DataFrame:
+    """extract_encoder_info-style columns for joints 1..3 (POT_3, POT_4 and inverted POT_5)."""
+    out = {"TIMESTAMP": zynq["TIMESTAMP"].to_numpy()}
+    for i, (pot_col, enc_col, sign) in enumerate(POT_ENCODER_PAIRS, start=1):
+        enc = zynq[enc_col].to_numpy()
+        mapped = (sign * zynq[pot_col].to_numpy() - 0.05) / 1.7
+        out[f"MAPPED_POT_{i}"] = mapped
+        out[f"ENCODER_POS_{i}"] = enc
+        out[f"JOINT_{i}_RESIDUAL"] = mapped - enc
+    return pd.DataFrame(out, columns=ENCODER_INFO_COLS)
+
+
+def write_capture(out_dir: str | Path, size: str, seed: int = 0) -> dict[str, Path]:
+    """Write the three tables for one capture size; existing complete files are reused."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    paths = {
+        "zynq": out_dir / "zynq.csv",
+        "joints": out_dir / "interpolated_all_joints.csv",
+        "encoder_info": out_dir / "encoder_info.csv",
+    }
+    done = out_dir / ".complete"
+    if done.exists() and done.read_text() == f"{size} {seed}":
+        return paths
+
+    n_rows = capture_rows(size)
+    for start in range(0, n_rows, BLOCK_ROWS):
+        block = zynq_block(start, min(start + BLOCK_ROWS, n_rows), seed)
+        first = start == 0
+        mode = "w" if first else "a"
+        block.to_csv(paths["zynq"], mode=mode, header=first, index=False)
+        block.iloc[:, :19].to_csv(paths["joints"], mode=mode, header=False, index=False)
+        encoder_info_block(block).to_csv(paths["encoder_info"], mode=mode, header=first, index=False)
+    done.write_text(f"{size} {seed}")
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic 10 kHz capture.")
+    parser.add_argument("out_dir", type=str, help="Directory for the generated tables.")
+    parser.add_argument("--size", type=str, default="1m", choices=list(CAPTURE_SECONDS), help="Capture length.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    paths = write_capture(args.out_dir, args.size, args.seed)
+    print(f"Wrote {capture_rows(args.size)} rows to:")
+    for path in paths.values():
+        print(f" - {path}")
+
+
+if __name__ == "__main__":
+    main()
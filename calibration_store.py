@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""Per-robot store of pot-to-encoder calibrations, reused across captures.
+
+The pot maps depend on the physical PSM and its pots, not on any one capture.
+Calibrations are therefore stored once per robot and date:
+
+    <store>/<robot>/<YYYY-MM-DD>.json
+
+<robot> is the arm and serial from the IO configuration file name; for
+example sawRobotIO1394-PSM3-698534.xml gives "PSM3-698534". Each file is a
+pot_calibration calibration plus the capture it was fitted from. A lookup for
+a capture date returns the newest calibration on or before that date.
+
+pot_to_encoder.py and extract_encoder_info.py take --calibration-store and
+--robot. A stored map is applied without refitting. The first capture of a
+robot that has no calibration is fitted and stored under its date. That date
+is --capture-date, or the date of the first TIMESTAMP when the timestamps are
+Unix epoch times; captures with relative timestamps need --capture-date.
+--check-drift also fits the capture and reports how far the stored map
+strays from the fresh fit over the capture's pot range. That costs the fit
+scan the store otherwise saves, so it only runs on request.
+
+Usage:
+    python3 calibration_store.py list calibrations/
+    python3 calibration_store.py add calibrations/ zynq_data.csv --robot sawRobotIO1394-PSM3-698534.xml [--date 2025-03-14]
+    python3 calibration_store.py check calibrations/ zynq_data.csv --robot PSM3-698534
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from pot_calibration import (
+    FIT_METHODS,
+    POT_ENCODER_PAIRS,
+    PotCalibration,
+    calibrate_frame,
+    load_or_fit_calibration,
+    numeric_columns,
+)
+
+ROBOT_PATTERN = re.compile(r"(PSM\d+|ECM|MTM[LR]?\d*)-(\d+)", re.IGNORECASE)
+# Largest stored-vs-fresh mapped difference tolerated, as a fraction of the encoder's range.
+DEFAULT_DRIFT_TOLERANCE = 0.01
+# TIMESTAMP values from 2001-09-09 on, in ns/us/ms/s, are read as Unix epoch times.
+EPOCH_SECONDS_MIN = 1e9
+EPOCH_UNITS = (1e9, 1e6, 1e3, 1.0)
+
+
+def robot_key(robot: str) -> str:
+    """"PSM3-698534" from a robot key or an IO configuration name/path (sawRobotIO1394-PSM3-698534.xml)."""
+    match = ROBOT_PATTERN.search(Path(str(robot)).name)
+    if match is None:
+        raise ValueError(f"Cannot find an arm and serial (e.g. PSM3-698534) in {robot!r}")
+    return f"{match.group(1).upper()}-{match.group(2)}"
+
+
+def _as_date(date) -> datetime.date:
+    if date is None:
+        return datetime.date.today()
+    if isinstance(date, datetime.date):
+        return date
+    return datetime.date.fromisoformat(str(date))
+
+
+def timestamp_date(df: pd.DataFrame) -> datetime.date | None:
+    """UTC date of the first finite TIMESTAMP if it is a Unix epoch time, else None."""
+    if "TIMESTAMP" not in df.columns:
+        return None
+    t = numeric_columns(df, ["TIMESTAMP"])[:, 0]
+    t = t[np.isfinite(t)]
+    if not len(t):
+        return None
+    now = datetime.datetime.now(datetime.timezone.utc).timestamp()
+    for per_second in EPOCH_UNITS:
+        seconds = t[0] / per_second
+        if EPOCH_SECONDS_MIN <= seconds <= now + 86400:
+            return datetime.datetime.fromtimestamp(seconds, datetime.timezone.utc).date()
+    return None
+
+
+def capture_date_of(df: pd.DataFrame, capture_date=None) -> datetime.date:
+    """capture_date, else the date of df's epoch TIMESTAMPs; prints which was used."""
+    if capture_date is not None:
+        date = _as_date(capture_date)
+        print(f"Capture date {date.isoformat()} (given)")
+        return date
+    date = timestamp_date(df)
+    if date is None:
+        raise ValueError(
+            "Cannot tell the capture date: TIMESTAMP is not a Unix epoch time. "
+            "Pass --capture-date YYYY-MM-DD so the calibration is filed under the capture's date."
+        )
+    print(f"Capture date {date.isoformat()} (from TIMESTAMP)")
+    return date
+
+
+class CalibrationStore:
+    """Calibrations under root/<robot>/<date>.json."""
+
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+
+    def path(self, robot: str, date=None) -> Path:
+        return self.root / robot_key(robot) / f"{_as_date(date).isoformat()}.json"
+
+    def robots(self) -> list[str]:
+        if not self.root.is_dir():
+            return []
+        return sorted(p.name for p in self.root.iterdir() if p.is_dir())
+
+    def dates(self, robot: str) -> list[datetime.date]:
+        robot_dir = self.root / robot_key(robot)
+        if not robot_dir.is_dir():
+            return []
+        return sorted(datetime.date.fromisoformat(p.stem) for p in robot_dir.glob("*.json"))
+
+    def save(self, calibration: PotCalibration, robot: str, date=None, source: str | None = None) -> Path:
+        path = self.path(robot, date)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        meta = calibration.to_dict()
+        meta["robot"] = robot_key(robot)
+        meta["date"] = _as_date(date).isoformat()
+        if source is not None:
+            meta["source"] = str(source)
+        path.write_text(json.dumps(meta, indent=2) + "\n")
+        return path
+
+    def find(self, robot: str, date=None) -> Path | None:
+        """The newest calibration file for robot dated on or before date (default: newest of all)."""
+        dates = self.dates(robot)
+        if date is not None:
+            dates = [d for d in dates if d <= _as_date(date)]
+        return self.path(robot, dates[-1]) if dates else None
+
+    def lookup(self, robot: str, date=None) -> PotCalibration | None:
+        path = self.find(robot, date)
+        if path is None:
+            return None
+        with open(path, "r") as fh:
+            return PotCalibration.from_dict(json.load(fh))
+
+
+def calibration_drift(
+    stored: PotCalibration,
+    df: pd.DataFrame,
+    fit_encoder_cols: list[str] | None = None,
+    tolerance: float = DEFAULT_DRIFT_TOLERANCE,
+) -> list[dict]:
+    """
+    Compare a stored calibration with a fresh fit of the same method on df.
+
+    Drift is the largest |stored map - fresh map| over the capture's rows, in encoder
+    units and as a fraction of the encoder's range; joints above tolerance are flagged.
+    """
+    fresh = calibrate_frame(df, fit_encoder_cols, method=stored.method, segments=stored.segments)
+    stored_mapped = stored.apply_frame(df)
+    fresh_mapped = fresh.apply_frame(df)
+    enc_cols = fit_encoder_cols or [e for _, e, _ in POT_ENCODER_PAIRS]
+    enc = numeric_columns(df, enc_cols)
+    report = []
+    for j, name in enumerate(stored.encoders):
+        diff = np.abs(stored_mapped[:, j] - fresh_mapped[:, j])
+        drift = float(np.nanmax(diff)) if np.isfinite(diff).any() else float("nan")
+        span = float(np.nanmax(enc[:, j]) - np.nanmin(enc[:, j])) if np.isfinite(enc[:, j]).any() else float("nan")
+        relative = drift / span if span > 0 else float("nan")
+        report.append(
+            {
+                "encoder": name,
+                "drift": drift,
+                "relative_drift": relative,
+                "stored_slope": float(stored.slopes[j]),
+                "fresh_slope": float(fresh.slopes[j]),
+                "exceeds": bool(relative > tolerance),
+            }
+        )
+    return report
+
+
+def print_drift(report: list[dict], tolerance: float = DEFAULT_DRIFT_TOLERANCE) -> None:
+    for joint in report:
+        flag = "  DRIFT" if joint["exceeds"] else ""
+        print(
+            f" - {joint['encoder']}: max |stored - fresh| = {joint['drift']:.6g} "
+            f"({100 * joint['relative_drift']:.3g}% of range, tolerance {100 * tolerance:g}%), "
+            f"slope {joint['stored_slope']:.6g} -> {joint['fresh_slope']:.6g}{flag}"
+        )
+
+
+def resolve_calibration(
+    df: pd.DataFrame,
+    fit_encoder_cols: list[str] | None = None,
+    calibration_path: str | Path | None = None,
+    store: str | Path | None = None,
+    robot: str | None = None,
+    capture_date=None,
+    refit: bool = False,
+    check_drift: bool = False,
+    drift_tolerance: float = DEFAULT_DRIFT_TOLERANCE,
+    source: str | None = None,
+    **fit_kwargs,
+) -> PotCalibration:
+    """
+    The calibration to apply to df.
+
+    With store and robot, the stored calibration for capture_date is used; when there is
+    none (or refit), df is fitted and stored under capture_date. Without capture_date the
+    date comes from df's epoch timestamps (see capture_date_of), or it is an error. Otherwise
+    this is load_or_fit_calibration(df, calibration_path, ...). check_drift compares a
+    stored or loaded calibration with a fresh fit of df.
+    """
+    if store is None or robot is None:
+        if store is not None or robot is not None:
+            raise ValueError("A calibration store needs both --calibration-store and --robot")
+        stored = calibration_path is not None and Path(calibration_path).is_file() and not refit
+        calibration = load_or_fit_calibration(df, calibration_path, fit_encoder_cols, refit=refit, **fit_kwargs)
+    else:
+        store = CalibrationStore(store)
+        capture_date = capture_date_of(df, capture_date)
+        calibration = None if refit else store.lookup(robot, capture_date)
+        stored = calibration is not None
+        if stored:
+            print(f"Using stored pot calibration {store.find(robot, capture_date)}")
+        else:
+            calibration = calibrate_frame(df, fit_encoder_cols, **fit_kwargs)
+            path = store.save(calibration, robot, capture_date, source=source)
+            print(f"Stored pot calibration for {robot_key(robot)} in {path}")
+
+    if check_drift and stored:
+        print_drift(calibration_drift(calibration, df, fit_encoder_cols, drift_tolerance), drift_tolerance)
+    return calibration
+
+
+def add_store_arguments(parser: argparse.ArgumentParser) -> None:
+    """--calibration-store/--robot/--capture-date/--check-drift options shared by the pot scripts."""
+    parser.add_argument("--calibration-store", type=str, default=None, help="Directory of per-robot calibrations.")
+    parser.add_argument(
+        "--robot",
+        type=str,
+        default=None,
+        help="Robot key (PSM3-698534) or its sawRobotIO1394 configuration file name.",
+    )
+    parser.add_argument(
+        "--capture-date",
+        type=str,
+        default=None,
+        help="Capture date, YYYY-MM-DD (default: from epoch TIMESTAMPs; required when they are relative).",
+    )
+    parser.add_argument("--check-drift", action="store_true", help="Refit the capture and report drift from the stored map.")
+    parser.add_argument(
+        "--drift-tolerance",
+        type=float,
+        default=DEFAULT_DRIFT_TOLERANCE,
+        help="Flag joints whose drift exceeds this fraction of the encoder range.",
+    )
+
+
+def _fit_columns(df: pd.DataFrame) -> list[str]:
+    return [f"ORIGINAL_{enc}" if f"ORIGINAL_{enc}" in df.columns else enc for _, enc, _ in POT_ENCODER_PAIRS]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Manage the per-robot pot calibration store.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    listing = sub.add_parser("list", help="List stored calibrations.")
+    listing.add_argument("store", type=str)
+    add = sub.add_parser("add", help="Fit a capture and store its calibration.")
+    check = sub.add_parser("check", help="Report drift of the stored calibration against a capture.")
+    for cmd in (add, check):
+        cmd.add_argument("store", type=str)
+        cmd.add_argument("input_csv", type=str, help="Headered capture (or pot_to_encoder output).")
+        cmd.add_argument("--robot", type=str, required=True)
+        cmd.add_argument(
+            "--date", type=str, default=None, help="Capture date, YYYY-MM-DD (default: from epoch TIMESTAMPs)."
+        )
+    add.add_argument("--method", type=str, default="lstsq", choices=list(FIT_METHODS))
+    add.add_argument("--segments", type=int, default=1)
+    check.add_argument("--tolerance", type=float, default=DEFAULT_DRIFT_TOLERANCE)
+    args = parser.parse_args()
+
+    store = CalibrationStore(args.store)
+    if args.command == "list":
+        for robot in store.robots():
+            print(f"{robot}: {', '.join(d.isoformat() for d in store.dates(robot))}")
+        return
+
+    df = pd.read_csv(args.input_csv)
+    try:
+        date = capture_date_of(df, args.date)
+    except ValueError as exc:
+        raise SystemExit(str(exc).replace("--capture-date", "--date")) from exc
+    if args.command == "add":
+        calibration = calibrate_frame(df, _fit_columns(df), method=args.method, segments=args.segments)
+        print(f"Saved {store.save(calibration, args.robot, date, source=args.input_csv)}")
+        return
+
+    stored = store.lookup(args.robot, date)
+    if stored is None:
+        raise SystemExit(f"No calibration for {robot_key(args.robot)} on or before {date}")
+    report = calibration_drift(stored, df, _fit_columns(df), args.tolerance)
+    print_drift(report, args.tolerance)
+    if any(joint["exceeds"] for joint in report):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,16 @@
-import pandas as pd
+from instrumentation import instrumented
+from table_io import read_table, write_table
 
+@instrumented()
 def truncate_dataframe(df, seconds_to_trim, frequency):
-    print("here")
     total_rows = len(df)
-    print("total rows: ", total_rows)
     rows_to_trim = int(seconds_to_trim * frequency)
     total_rows_to_remove = 2 * rows_to_trim
     if total_rows_to_remove >= total_rows:
         raise ValueError("Cannot remove more rows than available in the dataframe")
     df_truncated = df.iloc[rows_to_trim:total_rows - rows_to_trim]
 
-    print("Finished truncating dataframe!")
+    print(f"Truncated {total_rows} rows to {len(df_truncated)}")
     return df_truncated
 
 if __name__ == "__main__":
@@ -22,7 +22,7 @@ if __name__ == "__main__":
     parser.add_argument("--frequency", type=float, required=True)
     args = parser.parse_args()
 
-    df = pd.read_csv(args.input_csv, header=None)
+    df = read_table(args.input_csv, header=False)
     df_truncated = truncate_dataframe(df, args.seconds_to_trim, args.frequency)
-    df_truncated.to_csv(args.output_csv, index=False, header=False)
+    write_table(df_truncated, args.output_csv, header=False)
     print(f"Saved truncated CSV to {args.output_csv}, removed {args.seconds_to_trim} seconds from beginning and end")
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""Fixed-layout binary datasets for the joint and Jacobian tables, read by memory-mapping.
+
+A .dset file is a small self-describing header followed by the rows in
+row-major order:
+
+    8 bytes   magic b"FEDSET01"
+    4 bytes   little-endian uint32 length of the JSON header
+    JSON      {"columns": [...], "dtype": "<f8" | "<f4", "header": bool}, space-padded so
+              the data starts on a 64-byte boundary
+    data      rows x len(columns) values
+
+The row count follows from the file size, so files can be appended to (and
+opened while a writer is still appending whole rows). open_dataset() maps the
+file without reading it. Column lookups such as ds["POSITION_FEEDBACK_3"] or
+ds.jacobian() are zero-copy NumPy views, and a random window only touches the
+pages it covers.
+
+Usage:
+    python3 dataset.py convert interpolated_all_joints.csv joints.dset [--layout joints] [--dtype float32]
+    python3 dataset.py info joints.dset
+
+read_table/write_table in table_io handle .dset paths too.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import struct
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from preprocessing import ORDERED_COLS
+from table_io import iter_table
+
+MAGIC = b"FEDSET01"
+ALIGNMENT = 64
+DATASET_DTYPES = {"float64": "<f8", "float32": "<f4"}
+
+JOINT_COLUMNS = list(ORDERED_COLS)
+JACOBIAN_COLUMNS = ["TIMESTAMP"] + [f"J{r}{c}" for r in range(1, 7) for c in range(1, 7)]
+LAYOUTS = {"joints": JOINT_COLUMNS, "jacobian": JACOBIAN_COLUMNS}
+
+
+def _column_labels(columns) -> list:
+    return [int(c) if isinstance(c, (int, np.integer)) else str(c) for c in columns]
+
+
+def _encode_header(columns: list, dtype: str, header: bool) -> bytes:
+    meta = json.dumps({"columns": _column_labels(columns), "dtype": dtype, "header": bool(header)})
+    body = meta.encode("utf-8")
+    prefix = len(MAGIC) + 4
+    body += b" " * (-(prefix + len(body)) % ALIGNMENT)
+    return MAGIC + struct.pack("<I", len(body)) + body
+
+
+def read_dataset_header(path: str | Path) -> tuple[dict, int]:
+    """The header metadata of a .dset file and the byte offset of its first row."""
+    with open(path, "rb") as fh:
+        if fh.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a dataset file (bad magic)")
+        (length,) = struct.unpack("<I", fh.read(4))
+        meta = json.loads(fh.read(length).decode("utf-8"))
+    return meta, len(MAGIC) + 4 + length
+
+
+class DatasetWriter:
+    """Append rows to a .dset file; the header is written up front and never rewritten."""
+
+    def __init__(self, path: str | Path, columns: list, dtype: str = "float64", header: bool = True):
+        if dtype not in DATASET_DTYPES:
+            raise ValueError(f"Unsupported dataset dtype: {dtype}. Expected one of {list(DATASET_DTYPES)}")
+        self.path = Path(path)
+        self.columns = _column_labels(columns)
+        self.dtype = DATASET_DTYPES[dtype]
+        self.n_rows = 0
+        self._fh = open(self.path, "wb")
+        self._fh.write(_encode_header(self.columns, self.dtype, header))
+
+    def append(self, rows) -> None:
+        rows = rows.to_numpy() if isinstance(rows, pd.DataFrame) else np.asarray(rows)
+        if rows.ndim != 2 or rows.shape[1] != len(self.columns):
+            raise ValueError(f"Expected rows with {len(self.columns)} columns, got shape {rows.shape}")
+        self._fh.write(np.ascontiguousarray(rows, dtype=self.dtype).tobytes())
+        self.n_rows += rows.shape[0]
+
+    def close(self) -> Path:
+        self._fh.close()
+        return self.path
+
+    def __enter__(self) -> DatasetWriter:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def write_dataset(data, path: str | Path, columns: list | None = None, dtype: str = "float64", header: bool = True) -> Path:
+    """Write a DataFrame or 2-D array as a .dset file; columns default to the DataFrame's labels."""
+    if columns is None:
+        if not isinstance(data, pd.DataFrame):
+            raise ValueError("columns are required when writing an array")
+        columns = list(data.columns)
+    with DatasetWriter(path, columns, dtype=dtype, header=header) as writer:
+        writer.append(data)
+    return Path(path)
+
+
+class Dataset:
+    """A memory-mapped .dset table; every accessor returns a view into the mapped file."""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        meta, offset = read_dataset_header(self.path)
+        self.columns: list = meta["columns"]
+        self.header = bool(meta.get("header", True))
+        self.dtype = np.dtype(meta["dtype"])
+        row_bytes = len(self.columns) * self.dtype.itemsize
+        n_rows = (self.path.stat().st_size - offset) // row_bytes
+        if n_rows:
+            self.data = np.memmap(self.path, dtype=self.dtype, mode="r", offset=offset, shape=(n_rows, len(self.columns)))
+        else:
+            self.data = np.empty((0, len(self.columns)), dtype=self.dtype)
+        self._index = {name: i for i, name in enumerate(self.columns)}
+
+    def __len__(self) -> int:
+        return self.data.shape[0]
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.data.shape
+
+    def column_index(self, name) -> int:
+        if name not in self._index:
+            raise KeyError(f"No column {name!r} in {self.path}")
+        return self._index[name]
+
+    def __getitem__(self, key) -> np.ndarray:
+        """ds["TORQUE_FEEDBACK_1"] -> 1-D view; ds[["J11", "J12"]] -> 2-D view (a copy if not adjacent)."""
+        if isinstance(key, (list, tuple)):
+            return self.columns_view(key)
+        return self.data[:, self.column_index(key)]
+
+    def columns_view(self, names, start: int = 0, stop: int | None = None) -> np.ndarray:
+        """Rows [start, stop) of the named columns; a view when they are adjacent and in order."""
+        idx = [self.column_index(name) for name in names]
+        rows = slice(start, stop)
+        if idx and idx == list(range(idx[0], idx[0] + len(idx))):
+            return self.data[rows, idx[0] : idx[0] + len(idx)]
+        return self.data[rows][:, idx]
+
+    def group(self, prefix: str, start: int = 0, stop: int | None = None) -> np.ndarray:
+        """Columns prefix_1..prefix_n, e.g. group("POSITION_FEEDBACK") -> (rows, 6) view."""
+        names = [name for name in self.columns if isinstance(name, str) and name.rsplit("_", 1)[0] == prefix]
+        if not names:
+            raise KeyError(f"No {prefix}_<i> columns in {self.path}")
+        return self.columns_view(names, start, stop)
+
+    def window(self, start: int, stop: int) -> np.ndarray:
+        """Rows [start, stop) of every column, as a view."""
+        return self.data[start:stop]
+
+    @property
+    def time(self) -> np.ndarray:
+        return self["TIMESTAMP"] if "TIMESTAMP" in self._index else self.data[:, 0]
+
+    def jacobian(self, start: int = 0, stop: int | None = None) -> np.ndarray:
+        """J11..J66 of rows [start, stop) as a (rows, 6, 6) row-major view."""
+        block = self.columns_view(JACOBIAN_COLUMNS[1:], start, stop)
+        return block.reshape(block.shape[0], 6, 6)
+
+    def to_dataframe(self, copy: bool = False) -> pd.DataFrame:
+        """A DataFrame over the mapped rows (copy=True reads them into memory)."""
+        return pd.DataFrame(np.array(self.data) if copy else self.data, columns=self.columns, copy=False)
+
+
+def open_dataset(path: str | Path) -> Dataset:
+    return Dataset(path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Convert tables to memory-mapped .dset files and inspect them.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    convert = sub.add_parser("convert", help="Stream a headerless table into a .dset file.")
+    convert.add_argument("input", type=str, help="Source table (.csv, .npy, ...), headerless unless --has-header.")
+    convert.add_argument("output", type=str, help="Destination .dset file.")
+    convert.add_argument("--layout", type=str, default=None, choices=list(LAYOUTS), help="Name the columns.")
+    convert.add_argument("--dtype", type=str, default="float64", choices=list(DATASET_DTYPES))
+    convert.add_argument("--has-header", action="store_true", help="Take column names from the source header.")
+    convert.add_argument("--chunk-rows", type=int, default=1_000_000)
+    info = sub.add_parser("info", help="Print the layout of a .dset file.")
+    info.add_argument("path", type=str)
+    args = parser.parse_args()
+
+    if args.command == "info":
+        ds = open_dataset(args.path)
+        print(f"{ds.path}: {len(ds)} rows x {len(ds.columns)} columns, {ds.dtype}")
+        print(f"columns: {ds.columns}")
+        return
+
+    writer = None
+    for chunk in iter_table(args.input, header=args.has_header, chunk_rows=args.chunk_rows):
+        if writer is None:
+            columns = LAYOUTS[args.layout] if args.layout else list(chunk.columns)
+            if len(columns) != chunk.shape[1]:
+                raise ValueError(f"Layout '{args.layout}' has {len(columns)} columns, {args.input} has {chunk.shape[1]}")
+            writer = DatasetWriter(args.output, columns, dtype=args.dtype, header=bool(args.layout or args.has_header))
+        writer.append(chunk)
+    if writer is None:
+        raise ValueError(f"No rows in {args.input}")
+    writer.close()
+    print(f"Wrote {writer.n_rows} rows to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""Vectorized modified-DH kinematics for the PSM model described in dvpsm.rob.
+
+Forward kinematics and spatial/body Jacobians are evaluated for a whole batch
+of joint configurations at once, reproducing cisstRobotPython's
+robManipulator conventions (twist rows ordered [v; w], no tool frame).
+
+Usage:
+    python3 dh_kinematics.py dvpsm.rob --verify-cisst
+"""
+
+from __future__ import annotations
+
+import argparse
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import cisstRobotPython
+    _HAVE_CISST = True
+except ImportError:
+    _HAVE_CISST = False
+
+
+@dataclass(frozen=True)
+class DHModel:
+    """Per-link modified-DH parameters, one array entry per joint."""
+
+    alpha: np.ndarray
+    a: np.ndarray
+    theta: np.ndarray
+    d: np.ndarray
+    prismatic: np.ndarray
+    offset: np.ndarray
+    qmin: np.ndarray
+    qmax: np.ndarray
+
+    @property
+    def n_joints(self) -> int:
+        return int(self.alpha.shape[0])
+
+
+def load_dh_model(robot_file: str | Path) -> DHModel:
+    """Parse a cisst .rob file (link count line followed by one line per link)."""
+    path = Path(robot_file).expanduser()
+    if not path.is_file():
+        raise FileNotFoundError(f"Robot file not found: {path}")
+
+    lines = [line.split() for line in path.read_text().splitlines() if line.strip()]
+    if not lines:
+        raise ValueError(f"Empty robot file: {path}")
+    n_links = int(lines[0][0])
+    link_lines = lines[1 : n_links + 1]
+    if len(link_lines) != n_links:
+        raise ValueError(f"Expected {n_links} links in {path}, found {len(link_lines)}")
+
+    params = []
+    prismatic = []
+    for i, tokens in enumerate(link_lines, start=1):
+        if len(tokens) < 10:
+            raise ValueError(f"Link {i} in {path} has {len(tokens)} fields, expected 10")
+        convention, alpha, a, theta, d, joint_type, _mode, offset, qmin, qmax = tokens[:10]
+        if convention != "modified":
+            raise ValueError(f"Link {i} in {path} uses '{convention}' DH; only 'modified' is supported")
+        if joint_type not in ("revolute", "prismatic"):
+            raise ValueError(f"Link {i} in {path} has unknown joint type '{joint_type}'")
+        params.append([float(v) for v in (alpha, a, theta, d, offset, qmin, qmax)])
+        prismatic.append(joint_type == "prismatic")
+
+    table = np.asarray(params, dtype=np.float64)
+    return DHModel(
+        alpha=table[:, 0],
+        a=table[:, 1],
+        theta=table[:, 2],
+        d=table[:, 3],
+        prismatic=np.asarray(prismatic, dtype=bool),
+        offset=table[:, 4],
+        qmin=table[:, 5],
+        qmax=table[:, 6],
+    )
+
+
+def _as_joint_batch(model: DHModel, q: np.ndarray) -> np.ndarray:
+    q = np.asarray(q, dtype=np.float64)
+    if q.ndim == 1:
+        q = q[np.newaxis, :]
+    if q.ndim != 2 or q.shape[1] != model.n_joints:
+        raise ValueError(f"Expected joint array of shape (N, {model.n_joints}), got {q.shape}")
+    return q
+
+
+def link_transform(model: DHModel, j: int, qj: np.ndarray) -> np.ndarray:
+    """Batched ^(j-1)T_j for link j (0-based) with joint values qj of shape (N,)."""
+    qj = np.asarray(qj, dtype=np.float64)
+    if model.prismatic[j]:
+        theta = np.full_like(qj, model.theta[j])
+        d = model.d[j] + qj + model.offset[j]
+    else:
+        theta = model.theta[j] + qj + model.offset[j]
+        d = np.full_like(qj, model.d[j])
+
+    ct, st = np.cos(theta), np.sin(theta)
+    ca, sa = np.cos(model.alpha[j]), np.sin(model.alpha[j])
+
+    T = np.zeros(qj.shape + (4, 4), dtype=np.float64)
+    T[..., 0, 0] = ct
+    T[..., 0, 1] = -st
+    T[..., 0, 3] = model.a[j]
+    T[..., 1, 0] = st * ca
+    T[..., 1, 1] = ct * ca
+    T[..., 1, 2] = -sa
+    T[..., 1, 3] = -sa * d
+    T[..., 2, 0] = st * sa
+    T[..., 2, 1] = ct * sa
+    T[..., 2, 2] = ca
+    T[..., 2, 3] = ca * d
+    T[..., 3, 3] = 1.0
+    return T
+
+
+def forward_kinematics(model: DHModel, q: np.ndarray) -> np.ndarray:
+    """Return base-to-tip frames ^0T_n with shape (N, 4, 4)."""
+    q = _as_joint_batch(model, q)
+    T = np.broadcast_to(np.eye(4), (q.shape[0], 4, 4)).copy()
+    for j in range(model.n_joints):
+        T = T @ link_transform(model, j, q[:, j])
+    return T
+
+
+def rotation_to_quaternion(R: np.ndarray) -> np.ndarray:
+    """Convert rotation matrices (..., 3, 3) to unit quaternions (..., 4) ordered [x, y, z, w]."""
+    R = np.asarray(R, dtype=np.float64)
+    m00, m11, m22 = R[..., 0, 0], R[..., 1, 1], R[..., 2, 2]
+    trace = m00 + m11 + m22
+
+    # Shepperd's method: pick the largest of w, x, y, z to keep the division well conditioned.
+    candidates = np.stack((trace, m00, m11, m22), axis=-1)
+    branch = np.argmax(candidates, axis=-1)
+    q = np.empty(R.shape[:-2] + (4,), dtype=np.float64)
+
+    sel = branch == 0
+    s = 2.0 * np.sqrt(1.0 + trace[sel])
+    q[sel, 3] = 0.25 * s
+    q[sel, 0] = (R[sel, 2, 1] - R[sel, 1, 2]) / s
+    q[sel, 1] = (R[sel, 0, 2] - R[sel, 2, 0]) / s
+    q[sel, 2] = (R[sel, 1, 0] - R[sel, 0, 1]) / s
+
+    sel = branch == 1
+    s = 2.0 * np.sqrt(1.0 + m00[sel] - m11[sel] - m22[sel])
+    q[sel, 3] = (R[sel, 2, 1] - R[sel, 1, 2]) / s
+    q[sel, 0] = 0.25 * s
+    q[sel, 1] = (R[sel, 0, 1] + R[sel, 1, 0]) / s
+    q[sel, 2] = (R[sel, 0, 2] + R[sel, 2, 0]) / s
+
+    sel = branch == 2
+    s = 2.0 * np.sqrt(1.0 + m11[sel] - m00[sel] - m22[sel])
+    q[sel, 3] = (R[sel, 0, 2] - R[sel, 2, 0]) / s
+    q[sel, 0] = (R[sel, 0, 1] + R[sel, 1, 0]) / s
+    q[sel, 1] = 0.25 * s
+    q[sel, 2] = (R[sel, 1, 2] + R[sel, 2, 1]) / s
+
+    sel = branch == 3
+    s = 2.0 * np.sqrt(1.0 + m22[sel] - m00[sel] - m11[sel])
+    q[sel, 3] = (R[sel, 1, 0] - R[sel, 0, 1]) / s
+    q[sel, 0] = (R[sel, 0, 2] + R[sel, 2, 0]) / s
+    q[sel, 1] = (R[sel, 1, 2] + R[sel, 2, 1]) / s
+    q[sel, 2] = 0.25 * s
+
+    # Fix the sign so w >= 0; q and -q are the same rotation.
+    q *= np.where(q[..., 3:] < 0.0, -1.0, 1.0)
+    return q
+
+
+def _spatial_jacobian_and_tip(model: DHModel, q: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    q = _as_joint_batch(model, q)
+    n_samples = q.shape[0]
+    J = np.zeros((n_samples, 6, model.n_joints), dtype=np.float64)
+    T = np.broadcast_to(np.eye(4), (n_samples, 4, 4)).copy()
+    for j in range(model.n_joints):
+        # Modified DH: joint j moves along/about z of frame j, after its own link transform.
+        T = T @ link_transform(model, j, q[:, j])
+        z = T[:, :3, 2]
+        if model.prismatic[j]:
+            J[:, :3, j] = z
+        else:
+            J[:, :3, j] = np.cross(T[:, :3, 3], z)
+            J[:, 3:, j] = z
+    return J, T
+
+
+def jacobian_spatial(model: DHModel, q: np.ndarray) -> np.ndarray:
+    """Spatial Jacobians for every row of q, shape (N, 6, n_joints)."""
+    J, _ = _spatial_jacobian_and_tip(model, q)
+    return J
+
+
+def jacobian_body(model: DHModel, q: np.ndarray) -> np.ndarray:
+    """Body (tip-frame) Jacobians for every row of q, shape (N, 6, n_joints)."""
+    J_s, T = _spatial_jacobian_and_tip(model, q)
+    R = T[:, :3, :3]
+    p = T[:, :3, 3]
+    v = J_s[:, :3, :]
+    w = J_s[:, 3:, :]
+    # Ad(T^-1): v_b = R^T (v - p x w), w_b = R^T w
+    v_minus = v - np.cross(p[:, :, np.newaxis], w, axis=1)
+    R_t = np.swapaxes(R, 1, 2)
+    return np.concatenate((R_t @ v_minus, R_t @ w), axis=1)
+
+
+def compare_with_cisst(
+    robot_file: str | Path,
+    q: np.ndarray,
+    model: DHModel | None = None,
+) -> dict[str, float] | None:
+    """Max absolute difference against cisstRobotPython for each quantity, or None if unavailable."""
+    if not _HAVE_CISST:
+        return None
+
+    r = cisstRobotPython.robManipulator()
+    if r.LoadRobot(str(robot_file)) != 0:
+        raise RuntimeError(f"Failed to load robot file: {robot_file}")
+    model = model if model is not None else load_dh_model(robot_file)
+    q = _as_joint_batch(model, q)
+
+    J_s = jacobian_spatial(model, q)
+    J_b = jacobian_body(model, q)
+    T = forward_kinematics(model, q)
+
+    err = {"spatial": 0.0, "body": 0.0, "fk": 0.0}
+    for i, jp in enumerate(q):
+        ref_s = np.zeros((6, model.n_joints), dtype=np.float64)
+        ref_b = np.zeros((6, model.n_joints), dtype=np.float64)
+        r.JacobianSpatial(jp, ref_s)
+        r.JacobianBody(jp, ref_b)
+        ref_T = np.asarray(r.ForwardKinematics(jp), dtype=np.float64)
+        err["spatial"] = max(err["spatial"], float(np.max(np.abs(J_s[i] - ref_s))))
+        err["body"] = max(err["body"], float(np.max(np.abs(J_b[i] - ref_b))))
+        err["fk"] = max(err["fk"], float(np.max(np.abs(T[i] - ref_T))))
+    return err
+
+
+def random_joint_samples(model: DHModel, n_samples: int, seed: int = 0) -> np.ndarray:
+    """Uniform joint samples inside the model's joint limits."""
+    rng = np.random.default_rng(seed)
+    return rng.uniform(model.qmin, model.qmax, size=(n_samples, model.n_joints))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Evaluate the vectorized DH model and optionally verify it against cisstRobotPython."
+    )
+    parser.add_argument("robot_file", type=str, help="Path to robot file (.rob)")
+    parser.add_argument("--samples", type=int, default=1000, help="Random joint configurations to evaluate.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the random joint configurations.")
+    parser.add_argument("--verify-cisst", action="store_true", help="Compare against cisstRobotPython.")
+    parser.add_argument("--atol", type=float, default=1e-9, help="Tolerance used by --verify-cisst.")
+    args = parser.parse_args()
+
+    model = load_dh_model(args.robot_file)
+    q = random_joint_samples(model, args.samples, args.seed)
+    J = jacobian_spatial(model, q)
+    print(f"Loaded {model.n_joints}-link model from {args.robot_file}")
+    print(f"Spatial Jacobian at q[0]:\n{J[0]}")
+
+    if args.verify_cisst:
+        err = compare_with_cisst(args.robot_file, q, model=model)
+        if err is None:
+            print("cisstRobotPython not available; skipping verification.")
+            return
+        for key, value in err.items():
+            print(f"max |{key} - cisst| = {value:.3e}")
+        worst = max(err.values())
+        if worst > args.atol:
+            raise RuntimeError(f"DH model disagrees with cisstRobotPython by {worst:.3e} (atol={args.atol:g})")
+        print("Matches cisstRobotPython.")
+
+
+if __name__ == "__main__":
+    main()
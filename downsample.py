@@ -1,6 +1,20 @@
+from fractions import Fraction
+
+import numpy as np
 import pandas as pd
 import argparse
+from scipy.signal import resample_poly
+
+from fir_design import design_fir
+from instrumentation import instrumented
+from table_io import read_table, write_table
 
+# resample_poly's own anti-alias window is ('kaiser', 5.0).
+DECIMATION_KAISER_BETA = 5.0
+# Largest relative error between up / down and target_freq / original_freq.
+RATE_RATIO_TOLERANCE = 1e-6
+
+@instrumented()
 def downsample_dataframe(df, original_freq, target_freq, use_moving_average=False):
     # Compute window size
     window_size = int(original_freq / target_freq)
@@ -25,6 +39,67 @@ def downsample_dataframe(df, original_freq, target_freq, use_moving_average=Fals
     df_downsampled = pd.concat([timestamps_downsampled, data_downsampled], axis=1)
     return df_downsampled
 
+def rate_ratio(original_freq, target_freq, max_denominator=1000):
+    """
+    Smallest (up, down) with up / down == target_freq / original_freq.
+
+    Raises ValueError if no down <= max_denominator gets within RATE_RATIO_TOLERANCE
+    of the requested ratio, rather than resampling to a different rate.
+    """
+    exact = target_freq / original_freq
+    if exact <= 0 or exact >= 1:
+        raise ValueError("Target frequency must be lower than original frequency")
+    ratio = Fraction(exact).limit_denominator(max_denominator)
+    if ratio == 0 or abs(float(ratio) - exact) > RATE_RATIO_TOLERANCE * exact:
+        raise ValueError(
+            f"{original_freq} Hz -> {target_freq} Hz is not a rational ratio with denominator "
+            f"<= {max_denominator} (nearest is {ratio.numerator}/{ratio.denominator}, "
+            f"i.e. {original_freq * float(ratio):g} Hz)"
+        )
+    return ratio.numerator, ratio.denominator
+
+def design_decimation_filter(original_freq, target_freq, cutoff_hz=None, order=None, filter_type='kaiser'):
+    """
+    Anti-alias FIR for decimate_dataframe, designed at the upsampled rate original_freq * up.
+
+    cutoff_hz defaults to the output Nyquist frequency, order to 20 * max(up, down) and
+    the Kaiser beta to DECIMATION_KAISER_BETA, which is what resample_poly picks on its own.
+    """
+    up, down = rate_ratio(original_freq, target_freq)
+    cutoff_hz = target_freq / 2 if cutoff_hz is None else cutoff_hz
+    order = 20 * max(up, down) if order is None else order
+    return design_fir(filter_type, original_freq * up, cutoff_hz, order, beta=DECIMATION_KAISER_BETA).taps
+
+@instrumented()
+def decimate_dataframe(df, original_freq, target_freq, fir_coeffs=None):
+    """
+    Anti-alias filter and resample every data column in one polyphase pass.
+
+    Replaces filtering at the original rate followed by downsample_dataframe: only the
+    output samples are computed, and non-integer rate ratios (e.g. 10 kHz -> 60 Hz) are
+    exact. The linear-phase filter's delay is compensated, so outputs stay aligned with
+    the timestamps, which are interpolated at the output sample positions.
+
+    Parameters:
+        df (pd.DataFrame): Input with timestamps in column 0.
+        original_freq (float): Input sample rate (Hz).
+        target_freq (float): Output sample rate (Hz).
+        fir_coeffs (array-like | None): Anti-alias filter from design_decimation_filter.
+            If None, resample_poly's default Kaiser design is used.
+
+    Returns:
+        pd.DataFrame: Decimated DataFrame with the input's columns.
+    """
+    up, down = rate_ratio(original_freq, target_freq)
+    window = ('kaiser', DECIMATION_KAISER_BETA) if fir_coeffs is None else np.asarray(fir_coeffs, dtype=np.float64)
+    values = df.iloc[:, 1:].to_numpy(dtype=np.float64)
+    # padtype='line' extends each column linearly so the edges don't ring towards zero.
+    data = resample_poly(values, up, down, axis=0, window=window, padtype='line')
+
+    positions = np.arange(data.shape[0]) * (down / up)
+    timestamps = np.interp(positions, np.arange(len(df)), df.iloc[:, 0].to_numpy(dtype=np.float64))
+    return pd.DataFrame(np.column_stack((timestamps, data)), columns=df.columns)
+
 
 # MAIN
 if __name__ == "__main__":
@@ -34,9 +109,16 @@ if __name__ == "__main__":
     parser.add_argument("--original_freq", type=float, required=True, help="Original frequency (Hz)")
     parser.add_argument("--target_freq", type=float, required=True, help="Target downsample frequency (Hz)")
     parser.add_argument("--use_moving_average", action='store_true', help="Use moving average for downsampling")
+    parser.add_argument("--polyphase", action='store_true', help="Anti-alias filter and decimate in one polyphase pass")
+    parser.add_argument("--cutoff", type=float, default=None, help="Polyphase anti-alias cutoff (Hz); default target_freq / 2")
+    parser.add_argument("--order", type=int, default=None, help="Polyphase anti-alias filter order")
     args = parser.parse_args()
 
-    df = pd.read_csv(args.input_csv, header=None)
-    df_downsampled = downsample_dataframe(df, args.original_freq, args.target_freq, use_moving_average=args.use_moving_average)
-    df_downsampled.to_csv(args.output_csv, index=False, header=False)
+    df = read_table(args.input_csv, header=False)
+    if args.polyphase:
+        fir_coeffs = design_decimation_filter(args.original_freq, args.target_freq, args.cutoff, args.order)
+        df_downsampled = decimate_dataframe(df, args.original_freq, args.target_freq, fir_coeffs)
+    else:
+        df_downsampled = downsample_dataframe(df, args.original_freq, args.target_freq, use_moving_average=args.use_moving_average)
+    write_table(df_downsampled, args.output_csv, header=False)
     print(f"Saved downsampled CSV to {args.output_csv}")
\ No newline at end of file
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""Export tool-tip poses for every row of an interpolated_all_joints.csv file.
+
+Usage:
+    python3 export_tool_poses.py <joints_csv> <output_csv> dvpsm.rob [--format quat|matrix]
+
+Output rows are headerless, like the other pipeline CSVs:
+    quat:   TIMESTAMP, X, Y, Z, QX, QY, QZ, QW
+    matrix: TIMESTAMP, T11..T44 (row-major 4x4 base-to-tip frame)
+"""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+from dh_kinematics import DHModel, forward_kinematics, load_dh_model, rotation_to_quaternion
+
+POSE_FORMATS = ("quat", "matrix")
+
+
+def poses_to_rows(timestamps: np.ndarray, T: np.ndarray, pose_format: str = "quat") -> np.ndarray:
+    """Pack (N,) timestamps and (N, 4, 4) frames into flat output rows."""
+    if pose_format == "matrix":
+        return np.column_stack((timestamps, T.reshape(len(T), 16)))
+    if pose_format == "quat":
+        return np.column_stack((timestamps, T[:, :3, 3], rotation_to_quaternion(T[:, :3, :3])))
+    raise ValueError(f"Unknown pose format: {pose_format}. Expected one of {POSE_FORMATS}")
+
+
+def iter_tool_poses(
+    joints_csv: str | Path,
+    model: DHModel,
+    chunk_size: int = 100_000,
+) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+    """Yield (timestamps, (n, 4, 4) frames) for consecutive row blocks of a joints CSV."""
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be >= 1, got {chunk_size}")
+
+    # col 0 = timestamp, cols 1..6 = joint positions; the remaining columns are never parsed.
+    reader = pd.read_csv(joints_csv, header=None, usecols=range(7), chunksize=chunk_size)
+    for chunk in reader:
+        values = chunk.to_numpy(dtype=np.float64)
+        yield values[:, 0], forward_kinematics(model, values[:, 1:7])
+
+
+def export_tool_poses(
+    joints_csv: str | Path,
+    output_csv: str | Path,
+    robot_file: str | Path,
+    pose_format: str = "quat",
+    chunk_size: int = 100_000,
+) -> Path:
+    joints_path = Path(joints_csv).expanduser().resolve()
+    output_path = Path(output_csv).expanduser().resolve()
+    if not joints_path.is_file():
+        raise FileNotFoundError(f"Missing joints CSV: {joints_path}")
+    if pose_format not in POSE_FORMATS:
+        raise ValueError(f"Unknown pose format: {pose_format}. Expected one of {POSE_FORMATS}")
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    model = load_dh_model(robot_file)
+    n_rows = 0
+    for i, (timestamps, T) in enumerate(iter_tool_poses(joints_path, model, chunk_size)):
+        rows = poses_to_rows(timestamps, T, pose_format)
+        pd.DataFrame(rows).to_csv(output_path, mode="w" if i == 0 else "a", index=False, header=False)
+        n_rows += len(rows)
+
+    print(f"Wrote {n_rows} {pose_format} poses to {output_path}")
+    return output_path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compute tool-tip poses from the joint positions in interpolated_all_joints.csv."
+    )
+    parser.add_argument("joints_csv", type=str, help="Path to headerless joints CSV (timestamp + joint positions first).")
+    parser.add_argument("output_csv", type=str, help="Path to save the pose stream.")
+    parser.add_argument("robot_file", type=str, help="Path to robot file (.rob)")
+    parser.add_argument(
+        "--format",
+        dest="pose_format",
+        type=str,
+        default="quat",
+        choices=POSE_FORMATS,
+        help="quat: position + quaternion (x, y, z, w); matrix: flattened 4x4 frame.",
+    )
+    parser.add_argument("--chunk-size", type=int, default=100_000, help="Rows processed per batch.")
+    args = parser.parse_args()
+
+    export_tool_poses(
+        args.joints_csv,
+        args.output_csv,
+        args.robot_file,
+        pose_format=args.pose_format,
+        chunk_size=args.chunk_size,
+    )
+
+
+if __name__ == "__main__":
+    main()
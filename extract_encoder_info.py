@@ -4,35 +4,28 @@ from __future__ import annotations
 import argparse
 from pathlib import Path
 
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-from scipy.signal import filtfilt, firwin
 
+from calibration_store import DEFAULT_DRIFT_TOLERANCE, add_store_arguments, resolve_calibration
+import filter as fir
+from fir_design import design_fir
+from instrumentation import instrumented
+from plotting import plot_trace, save_figure, subplots
+from pot_calibration import FIT_METHODS, POT_ENCODER_PAIRS, numeric_columns
 
-def _fit_linear_map(x: pd.Series, y: pd.Series) -> tuple[float, float]:
-    x_num = pd.to_numeric(x, errors="coerce").to_numpy(dtype=float)
-    y_num = pd.to_numeric(y, errors="coerce").to_numpy(dtype=float)
 
-    valid = np.isfinite(x_num) & np.isfinite(y_num)
-    if np.count_nonzero(valid) < 2:
-        return 1.0, 0.0
+ENCODER_INFO_COLUMNS = ["TIMESTAMP"] + [
+    col
+    for i in range(1, len(POT_ENCODER_PAIRS) + 1)
+    for col in (f"MAPPED_POT_{i}", f"ENCODER_POS_{i}", f"JOINT_{i}_RESIDUAL")
+]
+# Output rows reduced per step by the moving-average downsample; bounds its temporaries.
+DOWNSAMPLE_CHUNK_ROWS = 1_000_000
 
-    x_valid = x_num[valid]
-    y_valid = y_num[valid]
-    x_mean = x_valid.mean()
-    y_mean = y_valid.mean()
-    denom = np.sum((x_valid - x_mean) ** 2)
-    if denom <= np.finfo(float).eps:
-        return 1.0, float(y_mean - x_mean)
 
-    slope = float(np.sum((x_valid - x_mean) * (y_valid - y_mean)) / denom)
-    intercept = float(y_mean - slope * x_mean)
-    return slope, intercept
-
-
-def _infer_sampling_rate(timestamps: pd.Series) -> float:
-    t = pd.to_numeric(timestamps, errors="coerce").to_numpy(dtype=float)
+def _infer_sampling_rate(timestamps) -> float:
+    t = np.asarray(timestamps, dtype=float)
     dt = np.diff(t)
     dt = dt[np.isfinite(dt) & (dt > 0)]
     if dt.size == 0:
@@ -40,58 +33,82 @@ def _infer_sampling_rate(timestamps: pd.Series) -> float:
     return 1.0 / float(np.median(dt))
 
 
-def _design_fir_filter(filter_type: str, fs: float, cutoff_hz: float, order: int) -> np.ndarray:
-    fC_norm = float(cutoff_hz) / (float(fs) / 2.0)
-    if fC_norm <= 0 or fC_norm >= 1:
-        raise ValueError(
-            f"cutoff_hz must be between 0 and Nyquist ({fs/2:.6g} Hz); got {cutoff_hz}."
-        )
-    if filter_type == "kaiser":
-        return firwin(int(order) + 1, fC_norm, window=("kaiser", 3.5))
-    if filter_type == "hamming":
-        return firwin(int(order) + 1, fC_norm, window="hamming")
-    if filter_type == "chebyshev":
-        return firwin(int(order) + 1, fC_norm, window=("chebwin", 40))
-    raise ValueError(f"Unknown filter type: {filter_type}")
+def _encoder_columns(columns) -> list[str]:
+    """Raw encoder column per joint: ORIGINAL_ENCODER_POS_i (pot_to_encoder output) or ENCODER_POS_i."""
+    enc_cols = []
+    for i in range(1, len(POT_ENCODER_PAIRS) + 1):
+        raw_enc_col = f"ORIGINAL_ENCODER_POS_{i}"
+        fallback_enc_col = f"ENCODER_POS_{i}"
+        enc_col = raw_enc_col if raw_enc_col in columns else fallback_enc_col
+        if enc_col not in columns:
+            raise ValueError(
+                f"Missing encoder column for joint {i}: expected {raw_enc_col} or {fallback_enc_col}"
+            )
+        enc_cols.append(enc_col)
+    return enc_cols
 
 
-def _apply_filter_to_extracted_df(df: pd.DataFrame, fir_coeffs: np.ndarray) -> pd.DataFrame:
-    out = df.copy()
-    value_cols = [c for c in out.columns if c != "TIMESTAMP"]
-    arr = out[value_cols].to_numpy(dtype=float)
-    valid = np.all(np.isfinite(arr), axis=1)
-    if np.count_nonzero(valid) > max(8, len(fir_coeffs)):
-        arr[valid] = filtfilt(fir_coeffs, [1.0], arr[valid], axis=0)
-    out[value_cols] = arr
-    return out
+def _encoder_info_array(df: pd.DataFrame, calibration, enc_cols: list[str]) -> np.ndarray:
+    """
+    The ENCODER_INFO_COLUMNS table as one (rows, 10) float array.
 
+    Pots are mapped in place in the MAPPED_POT columns and residuals are written straight
+    into theirs, so no per-joint temporaries are made.
+    """
+    arr = np.empty((len(df), len(ENCODER_INFO_COLUMNS)))
+    arr[:, 0] = numeric_columns(df, ["TIMESTAMP"])[:, 0]
+    mapped, enc, residual = arr[:, 1::3], arr[:, 2::3], arr[:, 3::3]
+    mapped[:] = numeric_columns(df, calibration.pots)
+    calibration.apply(mapped, out=mapped)
+    enc[:] = numeric_columns(df, enc_cols)
+    np.subtract(mapped, enc, out=residual)
+    return arr
 
-def _downsample_df(
-    df: pd.DataFrame,
+
+def _downsample_array(
+    arr: np.ndarray,
     original_freq: float,
     target_freq: float,
     use_moving_average: bool,
-) -> pd.DataFrame:
+    chunk_rows: int = DOWNSAMPLE_CHUNK_ROWS,
+) -> np.ndarray:
+    """
+    Keep every window_size-th row, or average each full window of window_size rows.
+
+    Averages match pandas' groupby mean, skipping NaN (an all-NaN window gives NaN); a
+    trailing partial window is dropped. Every column, TIMESTAMP included, is reduced the
+    same way.
+    """
     window_size = int(float(original_freq) / float(target_freq))
     if window_size < 1:
         raise ValueError("Target frequency must be lower than or equal to original frequency.")
-
-    timestamps = df.iloc[:, 0]
-    data = df.iloc[:, 1:]
-    if use_moving_average:
-        n_windows = len(df) // window_size
-        ts_ds = timestamps.iloc[: n_windows * window_size].groupby(
-            timestamps.index[: n_windows * window_size] // window_size
-        ).mean().reset_index(drop=True)
-        data_ds = data.iloc[: n_windows * window_size].groupby(
-            data.index[: n_windows * window_size] // window_size
-        ).mean().reset_index(drop=True)
-    else:
-        ts_ds = timestamps.iloc[::window_size].reset_index(drop=True)
-        data_ds = data.iloc[::window_size].reset_index(drop=True)
-    return pd.concat([ts_ds, data_ds], axis=1)
+    if not use_moving_average:
+        return arr[::window_size].copy()
+
+    n_windows = len(arr) // window_size
+    windows = arr[: n_windows * window_size].reshape(n_windows, window_size, arr.shape[1])
+    out = np.empty((n_windows, arr.shape[1]))
+    step = max(1, chunk_rows // window_size)
+    for start in range(0, n_windows, step):
+        block = windows[start : start + step]
+        # Kahan-compensated running sums in row order, as pandas' groupby mean computes them.
+        total = np.zeros(block[:, 0].shape)
+        comp = np.zeros_like(total)
+        count = np.zeros_like(total)
+        for k in range(window_size):
+            value = block[:, k]
+            valid = ~np.isnan(value)
+            y = np.where(valid, value, 0.0) - comp
+            t = total + y
+            comp = np.where(valid, (t - total) - y, comp)
+            total = np.where(valid, t, total)
+            count += valid
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out[start : start + step] = total / count
+    return out
 
 
+@instrumented()
 def extract_encoder_info(
     input_csv: str,
     output_csv: str,
@@ -104,6 +121,15 @@ def extract_encoder_info(
     pot_downsample_freq: float | None = None,
     pot_original_freq: float | None = None,
     pot_downsample_moving_average: bool = True,
+    calibration_path: str | None = None,
+    fit_method: str = "lstsq",
+    segments: int = 1,
+    refit: bool = False,
+    calibration_store: str | None = None,
+    robot: str | None = None,
+    capture_date: str | None = None,
+    check_drift: bool = False,
+    drift_tolerance: float = DEFAULT_DRIFT_TOLERANCE,
 ) -> Path:
     input_path = Path(input_csv).expanduser().resolve()
     output_path = Path(output_csv).expanduser().resolve()
@@ -112,45 +138,44 @@ def extract_encoder_info(
     if not input_path.exists():
         raise FileNotFoundError(f"Input CSV not found: {input_path}")
 
-    df = pd.read_csv(input_path)
-
+    # Only the timestamp, pot and encoder columns are parsed.
+    header = pd.read_csv(input_path, nrows=0).columns
     required = ["TIMESTAMP", "POT_3", "POT_4", "POT_5"]
-    missing = [c for c in required if c not in df.columns]
+    missing = [c for c in required if c not in header]
     if missing:
         raise ValueError(f"Missing required columns: {missing}")
-
-    pairs = [("POT_3", 1.0), ("POT_4", 1.0), ("POT_5", -1.0)]
-    t = pd.to_numeric(df["TIMESTAMP"], errors="coerce")
-    out = pd.DataFrame({"TIMESTAMP": t})
-
-    for i, (pot_col, sign) in enumerate(pairs, start=1):
-        raw_enc_col = f"ORIGINAL_ENCODER_POS_{i}"
-        fallback_enc_col = f"ENCODER_POS_{i}"
-        enc_col = raw_enc_col if raw_enc_col in df.columns else fallback_enc_col
-        if enc_col not in df.columns:
-            raise ValueError(
-                f"Missing encoder column for joint {i}: expected {raw_enc_col} or {fallback_enc_col}"
-            )
-
-        enc = pd.to_numeric(df[enc_col], errors="coerce")
-        signed_pot = pd.to_numeric(df[pot_col], errors="coerce") * sign
-        slope, intercept = _fit_linear_map(signed_pot, enc)
-        mapped_pot = slope * signed_pot + intercept
-        residual = mapped_pot - enc
-
-        out[f"MAPPED_POT_{i}"] = mapped_pot.to_numpy(dtype=float)
-        out[f"ENCODER_POS_{i}"] = enc.to_numpy(dtype=float)
-        out[f"JOINT_{i}_RESIDUAL"] = residual.to_numpy(dtype=float)
+    enc_cols = _encoder_columns(header)
+    df = pd.read_csv(input_path, usecols=required + enc_cols)
+
+    calibration = resolve_calibration(
+        df,
+        enc_cols,
+        calibration_path=calibration_path,
+        store=calibration_store,
+        robot=robot,
+        capture_date=capture_date,
+        refit=refit,
+        check_drift=check_drift,
+        drift_tolerance=drift_tolerance,
+        source=str(input_path),
+        method=fit_method,
+        segments=segments,
+    )
+    # Everything below works on one (rows, 10) array; the DataFrame is only built to write it.
+    timestamp_dtype = pd.to_numeric(df["TIMESTAMP"], errors="coerce").dtype
+    arr = _encoder_info_array(df, calibration, enc_cols)
+    del df
 
     if pot_filter:
-        fs = float(pot_original_freq) if pot_original_freq else _infer_sampling_rate(out["TIMESTAMP"])
-        taps = _design_fir_filter(
+        fs = float(pot_original_freq) if pot_original_freq else _infer_sampling_rate(arr[:, 0])
+        taps = design_fir(
             filter_type=pot_filter_type,
             fs=fs,
             cutoff_hz=float(pot_filter_cutoff_hz),
             order=int(pot_filter_order),
-        )
-        out = _apply_filter_to_extracted_df(out, taps)
+        ).taps
+        # Each column is filtered over its own finite runs, in parallel and in place.
+        fir.filtfilt_columns(arr, taps, columns=range(1, arr.shape[1]), names=ENCODER_INFO_COLUMNS)
         print(
             f"Applied POT filter: type={pot_filter_type}, cutoff={pot_filter_cutoff_hz:g} Hz, "
             f"order={pot_filter_order}, fs={fs:.6g} Hz"
@@ -159,9 +184,9 @@ def extract_encoder_info(
     if pot_downsample:
         if pot_downsample_freq is None:
             raise ValueError("--pot-downsample-freq is required when --pot-downsample is set.")
-        fs_in = float(pot_original_freq) if pot_original_freq else _infer_sampling_rate(out["TIMESTAMP"])
-        out = _downsample_df(
-            out,
+        fs_in = float(pot_original_freq) if pot_original_freq else _infer_sampling_rate(arr[:, 0])
+        arr = _downsample_array(
+            arr,
             original_freq=fs_in,
             target_freq=float(pot_downsample_freq),
             use_moving_average=pot_downsample_moving_average,
@@ -171,24 +196,28 @@ def extract_encoder_info(
             f"moving_average={pot_downsample_moving_average}"
         )
 
+    out = pd.DataFrame(arr, columns=ENCODER_INFO_COLUMNS, copy=False)
+    if timestamp_dtype.kind in "iu" and not (pot_downsample and pot_downsample_moving_average):
+        # Integer timestamps are written back as integers, as before.
+        out["TIMESTAMP"] = out["TIMESTAMP"].astype(timestamp_dtype)
     out.to_csv(output_path, index=False)
     print(f"Saved {output_path}")
 
     if plot:
-        fig, axes = plt.subplots(3, 1, figsize=(12, 8), sharex=True)
+        fig, axes = subplots(3, 1, figsize=(12, 8), sharex=True)
         tt = out["TIMESTAMP"].to_numpy(dtype=float)
         for i in range(3):
             ax = axes[i]
-            ax.plot(tt, out[f"MAPPED_POT_{i + 1}"], label=f"MAPPED_POT_{i + 1}", linewidth=0.9)
-            ax.plot(tt, out[f"ENCODER_POS_{i + 1}"], label=f"ENCODER_POS_{i + 1}", linewidth=0.9)
-            ax.plot(tt, out[f"JOINT_{i + 1}_RESIDUAL"], label=f"JOINT_{i + 1}_RESIDUAL", linewidth=0.9)
+            plot_trace(ax, tt, out[f"MAPPED_POT_{i + 1}"], label=f"MAPPED_POT_{i + 1}", linewidth=0.9)
+            plot_trace(ax, tt, out[f"ENCODER_POS_{i + 1}"], label=f"ENCODER_POS_{i + 1}", linewidth=0.9)
+            plot_trace(ax, tt, out[f"JOINT_{i + 1}_RESIDUAL"], label=f"JOINT_{i + 1}_RESIDUAL", linewidth=0.9)
             ax.set_title(f"Joint {i + 1}: mapped pot, encoder, residual")
             ax.grid(alpha=0.25)
             ax.legend(loc="upper right", fontsize=8)
         axes[-1].set_xlabel("Timestamp")
         fig.tight_layout()
         out_png = output_path.with_name(f"{output_path.stem}_plot.png")
-        fig.savefig(out_png, dpi=200)
+        save_figure(fig, out_png)
         print(f"Saved {out_png}")
 
     return output_path
@@ -217,6 +246,16 @@ def main() -> None:
         choices=["kaiser", "hamming", "chebyshev"],
         help="POT FIR window type.",
     )
+    parser.add_argument(
+        "--calibration",
+        type=str,
+        default=None,
+        help="Pot calibration JSON (e.g. from pot_to_encoder.py): loaded when it exists, otherwise fitted and saved there.",
+    )
+    parser.add_argument("--fit-method", type=str, default="lstsq", choices=list(FIT_METHODS))
+    parser.add_argument("--segments", type=int, default=1, help="Piecewise-linear segments per joint.")
+    parser.add_argument("--refit", action="store_true", help="Refit and overwrite an existing --calibration file.")
+    add_store_arguments(parser)
     parser.add_argument("--pot-downsample", action="store_true", help="Downsample extracted CSV.")
     parser.add_argument("--pot-downsample-freq", type=float, default=None, help="Target downsample frequency in Hz.")
     parser.add_argument(
@@ -253,6 +292,15 @@ def main() -> None:
         pot_downsample_freq=args.pot_downsample_freq,
         pot_original_freq=args.pot_original_freq,
         pot_downsample_moving_average=use_ma,
+        calibration_path=args.calibration,
+        fit_method=args.fit_method,
+        segments=args.segments,
+        refit=args.refit,
+        calibration_store=args.calibration_store,
+        robot=args.robot,
+        capture_date=args.capture_date,
+        check_drift=args.check_drift,
+        drift_tolerance=args.drift_tolerance,
     )
 
 
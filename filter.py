@@ -1,27 +1,30 @@
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+from pathlib import Path
+
 import numpy as np
-from scipy.signal import firwin, filtfilt
-from scipy.signal.windows import kaiser, hamming, chebwin
 import pandas as pd
 
+from fir_design import design_fir, filtfilt_fir
+from instrumentation import instrumented
+from table_io import read_table, schema_path, table_format, write_table
+
+FILTER_EXECUTORS = ("serial", "thread", "process")
+
 def design_fir_filter(filter_type: str, fs: float, fC: float, order: int):
-    fC_norm = fC / (fs / 2)  # Normalize cutoff frequency
-
-    if filter_type == 'kaiser':
-        beta = 3.5
-        return firwin(order + 1, fC_norm, window=('kaiser', beta))
-    elif filter_type == 'chebyshev':
-        atten = 40
-        return firwin(order + 1, fC_norm, window=('chebwin', atten))
-    elif filter_type == 'hamming':
-        return firwin(order + 1, fC_norm, window='hamming')
-    else:
-        raise ValueError(f"Unknown filter type: {filter_type}")
+    """Read-only taps from the shared fir_design registry (Kaiser beta 3.5, Chebyshev 40 dB)."""
+    return design_fir(filter_type, fs, fC, order).taps
 
+@instrumented()
 def apply_filter_to_dataframe(
     df: pd.DataFrame,
     fir_coeffs,
     column_indices=None,
     exclude_column_indices=None,
+    executor="thread",
+    workers=None,
 ):
     """
     Generic zero-phase FIR filter wrapper for DataFrame columns.
@@ -31,6 +34,8 @@ def apply_filter_to_dataframe(
         fir_coeffs (array-like): FIR filter coefficients.
         column_indices (iterable[int] | None): Columns to filter. If None, filters all columns.
         exclude_column_indices (iterable[int] | None): Columns to exclude from filtering.
+        executor (str): "thread" (default), "process" or "serial"; see filtfilt_columns.
+        workers (int | None): Parallel workers; defaults to one per CPU.
 
     Returns:
         pd.DataFrame: Filtered DataFrame.
@@ -47,15 +52,211 @@ def apply_filter_to_dataframe(
     if not column_indices:
         return df
 
-    df.iloc[:, column_indices] = filtfilt(
-        fir_coeffs,
-        [1.0],
-        df.iloc[:, column_indices],
-        axis=0,
-    )
+    values = df.iloc[:, column_indices].to_numpy(dtype=np.float64, copy=True)
+    names = [df.columns[idx] for idx in column_indices]
+    df.iloc[:, column_indices] = filtfilt_columns(values, fir_coeffs, executor=executor, workers=workers, names=names)
     return df
 
-def apply_filter_to_torque_feedback_df(df, fir_coeffs, filter_velocity=False, filter_position=False):
+def finite_runs(x):
+    """(start, stop) of every maximal run of finite values in a 1-D array."""
+    finite = np.concatenate(([False], np.isfinite(x), [False]))
+    edges = np.flatnonzero(finite[1:] != finite[:-1])
+    return [(int(start), int(stop)) for start, stop in zip(edges[::2], edges[1::2])]
+
+def _filter_columns_inplace(values, fir_coeffs, columns):
+    """
+    filtfilt each listed column of values in place, one finite run at a time.
+
+    Returns {column: (runs, rows)} for the finite runs too short to filter.
+    """
+    padlen = 3 * len(fir_coeffs)
+    finite_cols = [c for c in columns if np.isfinite(values[:, c]).all()]
+    if finite_cols and values.shape[0] > padlen:
+        values[:, finite_cols] = filtfilt_fir(fir_coeffs, values[:, finite_cols], axis=0)
+    skipped = {}
+    for c in columns:
+        if c in finite_cols:
+            continue
+        for start, stop in finite_runs(values[:, c]):
+            # filtfilt needs more than padlen samples; shorter runs are left as they are.
+            if stop - start > padlen:
+                values[start:stop, c] = filtfilt_fir(fir_coeffs, values[start:stop, c])
+            else:
+                runs, rows = skipped.get(c, (0, 0))
+                skipped[c] = (runs + 1, rows + stop - start)
+    return skipped
+
+def _warn_skipped(skipped, padlen, names=None):
+    for c, (runs, rows) in sorted(skipped.items()):
+        print(
+            f"Warning: column {c if names is None else names[c]} left {rows} rows unfiltered in {runs} finite run(s) "
+            f"of at most {padlen} rows (filtfilt padding)."
+        )
+
+def _filter_shared_columns(name, shape, fir_coeffs, columns):
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        values = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        skipped = _filter_columns_inplace(values, fir_coeffs, columns)
+        del values
+    finally:
+        shm.close()
+    return skipped
+
+def filtfilt_columns(values, fir_coeffs, columns=None, executor="thread", workers=None, names=None):
+    """
+    Zero-phase FIR filter columns of a 2-D float64 array in place, split across workers.
+
+    Each column is filtered independently over its finite runs, so a NaN gap in one
+    column neither drops rows from the others nor smears across the gap; runs no longer
+    than filtfilt's padding (3 * len(fir_coeffs)) are left unfiltered, with a warning
+    naming the column. A fully finite column that short raises ValueError, as filtfilt
+    does. Fully finite columns give filtfilt(fir_coeffs, [1.0], values, axis=0): exactly for short filters,
+    to rounding for long ones that fir_design.filtfilt_fir runs by FFT convolution.
+
+    executor:
+        "thread"  -- columns split over a thread pool; SciPy's filter kernels release the GIL.
+        "process" -- columns copied once into shared memory and filtered by a process pool.
+        "serial"  -- everything on the calling thread.
+
+    names (sequence | None): Label of each column of values for warnings and errors.
+
+    Returns:
+        values, filtered.
+    """
+    if executor not in FILTER_EXECUTORS:
+        raise ValueError(f"Unknown filter executor: {executor}. Expected one of {FILTER_EXECUTORS}")
+    fir_coeffs = np.asarray(fir_coeffs, dtype=np.float64)
+    columns = list(range(values.shape[1])) if columns is None else list(columns)
+    padlen = 3 * len(fir_coeffs)
+    if values.shape[0] <= padlen:
+        short = [c if names is None else names[c] for c in columns if np.isfinite(values[:, c]).all()]
+        if short:
+            raise ValueError(
+                f"Columns {short} have {values.shape[0]} rows; filtfilt needs more than {padlen} "
+                f"for {len(fir_coeffs)} taps"
+            )
+    workers = max(1, min(len(columns), workers or os.cpu_count() or 1))
+    if executor == "serial" or workers == 1:
+        _warn_skipped(_filter_columns_inplace(values, fir_coeffs, columns), padlen, names)
+        return values
+
+    groups = [columns[i::workers] for i in range(workers)]
+    if executor == "thread":
+        with ThreadPoolExecutor(workers) as pool:
+            for skipped in pool.map(lambda group: _filter_columns_inplace(values, fir_coeffs, group), groups):
+                _warn_skipped(skipped, padlen, names)
+        return values
+
+    # Only the filtered columns go to shared memory; workers address them by position there.
+    shape = (values.shape[0], len(columns))
+    shm = shared_memory.SharedMemory(create=True, size=max(1, values.shape[0] * len(columns) * 8))
+    try:
+        shared = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        shared[:] = values[:, columns]
+        position = {c: i for i, c in enumerate(columns)}
+        with ProcessPoolExecutor(workers) as pool:
+            jobs = [
+                pool.submit(_filter_shared_columns, shm.name, shape, fir_coeffs, [position[c] for c in group])
+                for group in groups
+            ]
+            for job in jobs:
+                _warn_skipped({columns[i]: counts for i, counts in job.result().items()}, padlen, names)
+        values[:, columns] = shared
+        del shared
+    finally:
+        shm.close()
+        shm.unlink()
+    return values
+
+def filtfilt_chunked(x, fir_coeffs, chunk_rows=1_000_000, columns=None, out=None):
+    """
+    Zero-phase FIR filter along axis 0, computed chunk by chunk.
+
+    Equivalent to filtfilt(fir_coeffs, [1.0], x[:, columns], axis=0) but only holds one
+    chunk in memory at a time. Each chunk is filtered with a halo of filtfilt's default
+    padlen (3 * len(fir_coeffs)) rows on both sides, which covers the 2 * (len(fir_coeffs) - 1)
+    sample support of the forward-backward pass and reproduces filtfilt's odd-extension
+    padding at the signal ends, so every output row sees exactly the samples it would in
+    the in-memory filtfilt; results agree to floating-point rounding (bit-identical in
+    practice for filters short enough to run by direct convolution).
+
+    Parameters:
+        x (array-like): (N,) or (N, C) input supporting row slicing, e.g. an np.memmap.
+        fir_coeffs (array-like): FIR filter coefficients.
+        chunk_rows (int): Output rows computed per chunk.
+        columns (list[int] | None): Columns of a 2-D x to filter. If None, filters all columns.
+        out (np.ndarray | None): Preallocated output, e.g. a memmap. If given, filtered values
+            are written to out[:, columns] and other columns are left untouched.
+
+    Returns:
+        np.ndarray: The filtered array (out, when given).
+    """
+    if chunk_rows < 1:
+        raise ValueError(f"chunk_rows must be >= 1, got {chunk_rows}")
+    n_rows = x.shape[0]
+    halo = 3 * len(fir_coeffs)
+    if n_rows <= halo:
+        raise ValueError(f"Signal has {n_rows} rows; filtfilt needs more than {halo} for {len(fir_coeffs)} taps")
+
+    if out is None:
+        shape = x.shape if columns is None else (n_rows, len(columns))
+        out = np.empty(shape, dtype=np.float64)
+        out_columns = None
+    else:
+        out_columns = columns
+
+    for start in range(0, n_rows, chunk_rows):
+        stop = min(start + chunk_rows, n_rows)
+        lo = max(0, start - halo)
+        hi = min(n_rows, stop + halo)
+        # A short last chunk is widened so filtfilt's own edge padding still fits.
+        if hi - lo <= halo:
+            lo = hi - halo - 1
+        window = np.asarray(x[lo:hi], dtype=np.float64)
+        if columns is not None:
+            window = window[:, columns]
+        filtered = filtfilt_fir(fir_coeffs, window, axis=0)[start - lo : stop - lo]
+        if out_columns is None:
+            out[start:stop] = filtered
+        else:
+            out[start:stop, out_columns] = filtered
+    return out
+
+@instrumented()
+def apply_filter_to_npy(input_path, output_path, fir_coeffs, column_indices, chunk_rows=1_000_000):
+    """
+    Filter columns of a .npy table without loading it into memory.
+
+    The input is memory-mapped, the output is written through a memory-mapped .npy of the
+    same shape, and the input's schema sidecar is copied alongside it. Columns not listed
+    in column_indices are copied unchanged.
+
+    Returns:
+        Path: The output path.
+    """
+    if table_format(input_path) != "npy" or table_format(output_path) != "npy":
+        raise ValueError("Chunked filtering needs .npy input and output; convert CSVs with table_io.py first.")
+    src = np.load(input_path, mmap_mode="r")
+    if src.ndim != 2:
+        raise ValueError(f"Expected a 2-D table in {input_path}, got shape {src.shape}")
+
+    dst = np.lib.format.open_memmap(output_path, mode="w+", dtype=np.float64, shape=src.shape)
+    for start in range(0, src.shape[0], chunk_rows):
+        dst[start : start + chunk_rows] = src[start : start + chunk_rows]
+    column_indices = sorted(set(column_indices))
+    if column_indices:
+        filtfilt_chunked(src, fir_coeffs, chunk_rows=chunk_rows, columns=column_indices, out=dst)
+    dst.flush()
+    del dst
+
+    if schema_path(input_path).is_file():
+        shutil.copyfile(schema_path(input_path), schema_path(output_path))
+    return Path(output_path)
+
+def apply_filter_to_torque_feedback_df(
+    df, fir_coeffs, filter_velocity=False, filter_position=False, executor="thread", workers=None
+):
     """
     Apply zero-phase FIR filter to torque feedback columns in a DataFrame.
 
@@ -64,21 +265,30 @@ def apply_filter_to_torque_feedback_df(df, fir_coeffs, filter_velocity=False, fi
         fir_coeffs (array): FIR filter coefficients
         filter_velocity (bool): If True, also apply filtering to velocity columns (7 through 12)
         filter_position (bool): If True, also apply filtering to position columns (1 through 6)
+        executor, workers: Parallel filtering, as for filtfilt_columns.
 
     Returns:
         pd.DataFrame: Filtered DataFrame
     """
-    torque_cols = list(range(13, 19))
-    apply_filter_to_dataframe(df, fir_coeffs, column_indices=torque_cols)
+    apply_filter_to_dataframe(
+        df,
+        fir_coeffs,
+        column_indices=torque_feedback_columns(filter_velocity, filter_position),
+        executor=executor,
+        workers=workers,
+    )
+    return df
+
+def torque_feedback_columns(filter_velocity=False, filter_position=False):
+    """Column indices filtered by apply_filter_to_torque_feedback_df."""
+    cols = list(range(13, 19))
     if filter_velocity:
-        velocity_cols = list(range(7, 13))
-        apply_filter_to_dataframe(df, fir_coeffs, column_indices=velocity_cols)
+        cols += list(range(7, 13))
     if filter_position:
-        position_cols = list(range(1, 7))
-        apply_filter_to_dataframe(df, fir_coeffs, column_indices=position_cols)
-    return df
+        cols += list(range(1, 7))
+    return cols
 
-def apply_filter_to_fs_df(df, fir_coeffs):
+def apply_filter_to_fs_df(df, fir_coeffs, executor="thread", workers=None):
     """
     Apply zero-phase FIR filter to torque feedback columns in a DataFrame.
 
@@ -86,12 +296,13 @@ def apply_filter_to_fs_df(df, fir_coeffs):
         df (pd.DataFrame): Input DataFrame
         fir_coeffs (array): FIR filter coefficients
         filter_velocity (bool): If True, also apply filtering to velocity columns (7 through 12)
+        executor, workers: Parallel filtering, as for filtfilt_columns.
 
     Returns:
         pd.DataFrame: Filtered DataFrame
     """
     force_torque_cols = list(range(1, 7))
-    apply_filter_to_dataframe(df, fir_coeffs, column_indices=force_torque_cols)
+    apply_filter_to_dataframe(df, fir_coeffs, column_indices=force_torque_cols, executor=executor, workers=workers)
     return df
 
 
@@ -108,15 +319,34 @@ if __name__ == "__main__":
     parser.add_argument("--order", type=int, default=30)
     parser.add_argument("--filter_velocity", action="store_true", help="Also filter velocity columns (7–12)")
     parser.add_argument("--filter_position", action="store_true", help="Also filter position columns (1–6)")
+    parser.add_argument(
+        "--chunk_rows",
+        type=int,
+        default=None,
+        help="Stream .npy input through memory-mapped chunks of this many rows instead of loading it.",
+    )
+    parser.add_argument("--executor", type=str, default="thread", choices=FILTER_EXECUTORS, help="Parallel filtering mode.")
+    parser.add_argument("--workers", type=int, default=None, help="Parallel filter workers (default: one per CPU).")
     args = parser.parse_args()
 
-    df = pd.read_csv(args.input_csv, header=None)
     fir_coeffs = design_fir_filter(args.filter_type, args.fs, args.fC, args.order)
-    df_filtered = apply_filter_to_torque_feedback_df(
-        df,
-        fir_coeffs,
-        filter_velocity=args.filter_velocity,
-        filter_position=args.filter_position,
-    )
-    df_filtered.to_csv(args.output_csv, index=False, header=False)
+    if args.chunk_rows is not None:
+        apply_filter_to_npy(
+            args.input_csv,
+            args.output_csv,
+            fir_coeffs,
+            torque_feedback_columns(args.filter_velocity, args.filter_position),
+            chunk_rows=args.chunk_rows,
+        )
+    else:
+        df = read_table(args.input_csv, header=False)
+        df_filtered = apply_filter_to_torque_feedback_df(
+            df,
+            fir_coeffs,
+            filter_velocity=args.filter_velocity,
+            filter_position=args.filter_position,
+            executor=args.executor,
+            workers=args.workers,
+        )
+        write_table(df_filtered, args.output_csv, header=False)
     print(f"Filtered and saved to {args.output_csv}")
@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""Per-stage timing, row, I/O and memory records for preprocessing runs.
+
+Stage functions are wrapped with @instrumented (or a `with stage(...)` block).
+Outside a recording they only pay for one global lookup. Inside one, each call
+records:
+
+    wall_s, cpu_s            elapsed and process CPU time
+    rows_in, rows_out        rows of the first DataFrame/array argument and of the result
+    bytes_read/written       rchar/wchar from /proc/self/io (Linux; None elsewhere)
+    process_peak_rss_mb      the process's RSS high-water mark when the stage finished
+    peak_alloc_mb            with trace_memory, the tracemalloc peak above the level at stage
+                             entry (numpy buffers included); tracing slows CSV-heavy stages
+                             several-fold, so it is opt-in
+
+Nested stages (e.g. apply_filter_to_dataframe inside the pipeline's filter stage)
+are recorded with their parent, and parent figures include them. With a
+profile_dir, each top-level stage is also run under cProfile and dumped to
+<profile_dir>/<nn>_<stage>.prof.
+
+Notebook use:
+    with recording("run_report.html", trace_memory=True, profile_dir="profiles"):
+        preprocess_csv(...); append_encoder_residuals(...)
+
+Any script:
+    python3 instrumentation.py --report run.json [--trace-memory] [--profile-dir profiles] -- \
+        extract_encoder_info.py in.csv out.csv
+"""
+
+from __future__ import annotations
+
+import argparse
+import cProfile
+import functools
+import html
+import io
+import json
+import pstats
+import resource
+import runpy
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+_ACTIVE: RunRecorder | None = None
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far."""
+    # ru_maxrss survives exec on Linux, so a spawned child would report its parent's peak;
+    # VmHWM belongs to the current address space.
+    status = Path("/proc/self/status")
+    if status.is_file():
+        for line in status.read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _io_counters() -> tuple[int, int] | None:
+    try:
+        fields = dict(line.split(": ") for line in Path("/proc/self/io").read_text().splitlines())
+        return int(fields["rchar"]), int(fields["wchar"])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def count_rows(obj) -> int | None:
+    """Rows of a DataFrame/array, or summed over the DataFrames/arrays of a tuple (e.g. (df, fs) or (val, test))."""
+    if isinstance(obj, (pd.DataFrame, pd.Series, np.ndarray)):
+        return int(obj.shape[0]) if obj.ndim else None
+    if isinstance(obj, tuple):
+        counts = [count_rows(item) for item in obj if isinstance(item, (pd.DataFrame, pd.Series, np.ndarray))]
+        counts = [c for c in counts if c is not None]
+        return sum(counts) if counts else None
+    return None
+
+
+@dataclass
+class StageRecord:
+    name: str
+    parent: str | None = None
+    depth: int = 0
+    rows_in: int | None = None
+    rows_out: int | None = None
+    wall_s: float = 0.0
+    cpu_s: float = 0.0
+    bytes_read: int | None = None
+    bytes_written: int | None = None
+    peak_alloc_mb: float | None = None
+    process_peak_rss_mb: float | None = None
+    profile: str | None = None
+    error: str | None = None
+    profile_top: str | None = field(default=None, repr=False)
+
+
+class RunRecorder:
+    """Collects StageRecords for one run; use recording() to make it the active recorder."""
+
+    def __init__(self, trace_memory: bool = False, profile_dir: str | Path | None = None, profile_top: int = 20):
+        self.trace_memory = trace_memory
+        self.profile_dir = Path(profile_dir) if profile_dir is not None else None
+        self.profile_top = profile_top
+        self.records: list[StageRecord] = []
+        self._stack: list[tuple[StageRecord, dict]] = []
+        self._started_tracemalloc = False
+        self._t0 = time.perf_counter()
+
+    def start(self) -> None:
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        if self.profile_dir is not None:
+            self.profile_dir.mkdir(parents=True, exist_ok=True)
+        self._t0 = time.perf_counter()
+
+    def stop(self) -> None:
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    @contextmanager
+    def stage(self, name: str, rows_in: int | None = None) -> Iterator[StageRecord]:
+        parent = self._stack[-1] if self._stack else None
+        record = StageRecord(
+            name=name,
+            parent=parent[0].name if parent else None,
+            depth=len(self._stack),
+            rows_in=rows_in,
+        )
+        self.records.append(record)
+        state = {}
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            if parent is not None:
+                parent[1]["peak"] = max(parent[1].get("peak", 0), peak)
+            tracemalloc.reset_peak()
+            state["start_alloc"] = current
+            state["peak"] = current
+        profiler = None
+        if self.profile_dir is not None and parent is None:
+            # cProfile cannot nest, so only top-level stages are profiled.
+            profiler = cProfile.Profile()
+        io_before = _io_counters()
+        self._stack.append((record, state))
+        wall, cpu = time.perf_counter(), time.process_time()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield record
+        except BaseException as exc:
+            record.error = f"{type(exc).__name__}: {exc}"
+            raise
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            record.wall_s = time.perf_counter() - wall
+            record.cpu_s = time.process_time() - cpu
+            self._stack.pop()
+            io_after = _io_counters()
+            if io_before is not None and io_after is not None:
+                record.bytes_read = io_after[0] - io_before[0]
+                record.bytes_written = io_after[1] - io_before[1]
+            if "start_alloc" in state and tracemalloc.is_tracing():
+                peak = max(state["peak"], tracemalloc.get_traced_memory()[1])
+                record.peak_alloc_mb = (peak - state["start_alloc"]) / 1024**2
+                if parent is not None:
+                    parent[1]["peak"] = max(parent[1].get("peak", 0), peak)
+            record.process_peak_rss_mb = peak_rss_mb()
+            if profiler is not None:
+                self._save_profile(record, profiler)
+
+    def _save_profile(self, record: StageRecord, profiler: cProfile.Profile) -> None:
+        index = sum(1 for r in self.records if r.depth == 0 and r is not record and r.profile)
+        path = self.profile_dir / f"{index:02d}_{record.name}.prof"
+        profiler.dump_stats(path)
+        record.profile = str(path)
+        text = io.StringIO()
+        pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(self.profile_top)
+        record.profile_top = text.getvalue()
+
+    def report(self) -> dict:
+        top = [r for r in self.records if r.depth == 0]
+        return {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "argv": sys.argv,
+            "total_wall_s": time.perf_counter() - self._t0,
+            "stages_wall_s": sum(r.wall_s for r in top),
+            "process_peak_rss_mb": peak_rss_mb(),
+            "stages": [asdict(r) for r in self.records],
+        }
+
+    def write_report(self, path: str | Path) -> Path:
+        """Write the report as JSON, or as a single HTML page when path ends in .html."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        report = self.report()
+        if path.suffix.lower() in (".html", ".htm"):
+            path.write_text(_render_html(report))
+        else:
+            for stage_record in report["stages"]:
+                stage_record.pop("profile_top", None)
+            path.write_text(json.dumps(report, indent=2) + "\n")
+        return path
+
+
+def _fmt(value, spec: str) -> str:
+    return "" if value is None else format(value, spec)
+
+
+def _render_html(report: dict) -> str:
+    stages = report["stages"]
+    slowest = max((s["wall_s"] for s in stages), default=0.0) or 1.0
+    rows = []
+    for s in stages:
+        rate = s["rows_in"] / s["wall_s"] if s["rows_in"] and s["wall_s"] > 0 else None
+        bar = f'<div class="bar" style="width:{100 * s["wall_s"] / slowest:.1f}%"></div>'
+        name = "&nbsp;" * 4 * s["depth"] + html.escape(s["name"])
+        if s["error"]:
+            name += f' <span class="err">({html.escape(s["error"])})</span>'
+        cells = [
+            name,
+            f'{s["wall_s"]:.3f}{bar}',
+            f'{s["cpu_s"]:.3f}',
+            _fmt(s["rows_in"], ","),
+            _fmt(s["rows_out"], ","),
+            _fmt(rate, ",.0f"),
+            _fmt(None if s["bytes_read"] is None else s["bytes_read"] / 1024**2, ".1f"),
+            _fmt(None if s["bytes_written"] is None else s["bytes_written"] / 1024**2, ".1f"),
+            _fmt(s["peak_alloc_mb"], ".1f"),
+            _fmt(s["process_peak_rss_mb"], ".1f"),
+        ]
+        rows.append("<tr>" + "".join(f"<td>{c}</td>" for c in cells) + "</tr>")
+    profiles = "".join(
+        f'<details><summary>{html.escape(s["name"])}: {html.escape(s["profile"])}</summary>'
+        f'<pre>{html.escape(s["profile_top"] or "")}</pre></details>'
+        for s in stages
+        if s["profile"]
+    )
+    header = "".join(
+        f"<th>{h}</th>"
+        for h in (
+            "stage", "wall s", "cpu s", "rows in", "rows out", "rows/s",
+            "read MB", "written MB", "peak alloc MB", "process RSS MB",
+        )
+    )
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Preprocessing run report</title>
+<style>
+body {{ font-family: sans-serif; margin: 2em; }}
+table {{ border-collapse: collapse; }}
+td, th {{ border: 1px solid #ccc; padding: 3px 8px; text-align: right; }}
+td:first-child, th:first-child {{ text-align: left; }}
+.bar {{ background: #4a90d9; height: 4px; }}
+.err {{ color: #b00; }}
+</style></head><body>
+<h1>Preprocessing run report</h1>
+<p>{html.escape(" ".join(report["argv"]))}<br>
+Created {html.escape(report["created"])}; total {report["total_wall_s"]:.3f} s,
+stages {report["stages_wall_s"]:.3f} s, process peak RSS {report["process_peak_rss_mb"]:.1f} MB.
+Nested stages are indented and included in their parent's figures.</p>
+<table><tr>{header}</tr>
+{chr(10).join(rows)}
+</table>
+{profiles}
+</body></html>
+"""
+
+
+def active_recorder() -> RunRecorder | None:
+    return _ACTIVE
+
+
+@contextmanager
+def recording(
+    report_path: str | Path | None = None,
+    trace_memory: bool = False,
+    profile_dir: str | Path | None = None,
+) -> Iterator[RunRecorder]:
+    """Record every instrumented stage run inside the block; write the report on exit if a path is given."""
+    global _ACTIVE
+    previous = _ACTIVE
+    recorder = RunRecorder(trace_memory=trace_memory, profile_dir=profile_dir)
+    recorder.start()
+    _ACTIVE = recorder
+    try:
+        yield recorder
+    finally:
+        _ACTIVE = previous
+        recorder.stop()
+        if report_path is not None:
+            print(f"Saved run report to {recorder.write_report(report_path)}")
+
+
+@contextmanager
+def stage(name: str, rows_in: int | None = None) -> Iterator[StageRecord]:
+    """Record the enclosed block as a stage of the active run; set .rows_out on the yielded record."""
+    if _ACTIVE is None:
+        yield StageRecord(name=name, rows_in=rows_in)
+        return
+    with _ACTIVE.stage(name, rows_in=rows_in) as record:
+        yield record
+
+
+def instrumented(name: str | None = None):
+    """Decorator recording each call as a stage; rows come from the first DataFrame/array argument and the result."""
+
+    def decorate(fn):
+        stage_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _ACTIVE is None:
+                return fn(*args, **kwargs)
+            rows_in = next((n for n in map(count_rows, args) if n is not None), None)
+            with _ACTIVE.stage(stage_name, rows_in=rows_in) as record:
+                result = fn(*args, **kwargs)
+                record.rows_out = count_rows(result)
+            return result
+
+        return wrapper
+
+    return decorate
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a preprocessing script with per-stage instrumentation.")
+    parser.add_argument("--report", type=str, default="run_report.json", help="Report path (.json or .html).")
+    parser.add_argument("--profile-dir", type=str, default=None, help="Dump a cProfile per top-level stage here.")
+    parser.add_argument("--trace-memory", action="store_true", help="Record per-stage peak allocations (slower).")
+    parser.add_argument("script", type=str, help="Script to run, followed by its own arguments.")
+    parser.add_argument("script_args", nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+
+    script_args = args.script_args[1:] if args.script_args[:1] == ["--"] else args.script_args
+    sys.argv = [args.script] + script_args
+    sys.path.insert(0, str(Path(args.script).resolve().parent))
+    # Run as a script this file is __main__; the stage modules import the "instrumentation" module.
+    from instrumentation import recording
+    with recording(args.report, trace_memory=args.trace_memory, profile_dir=args.profile_dir):
+        runpy.run_path(args.script, run_name="__main__")
+
+
+if __name__ == "__main__":
+    main()
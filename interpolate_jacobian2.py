@@ -1,52 +1,89 @@
 import pandas as pd
 import numpy as np
 import argparse
-import cisstRobotPython
 
-def compute_flattened_jacobian(input_csv, output_csv, robot_file):
-    # Load the robot model
-    r = cisstRobotPython.robManipulator()
-    if r.LoadRobot(robot_file) != 0:
-        raise RuntimeError(f"Failed to load robot file: {robot_file}")
+from dataset import JACOBIAN_COLUMNS
+from dh_kinematics import compare_with_cisst, jacobian_spatial, load_dh_model
+from instrumentation import instrumented
+from table_io import read_table, write_table
+
+
+@instrumented()
+def compute_flattened_jacobian(
+    input_csv,
+    output_csv,
+    robot_file,
+    chunk_size: int = 100_000,
+    verify_cisst: bool = False,
+    verify_samples: int = 100,
+    verify_atol: float = 1e-9,
+):
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be >= 1, got {chunk_size}")
+
+    # Load the robot model (modified-DH table from the .rob file)
+    model = load_dh_model(robot_file)
 
     # Load joint configurations and timestamps by fixed column index:
     # col 0 = timestamp, cols 1..6 = joint positions.
-    df = pd.read_csv(input_csv, header=None)
+    df = read_table(input_csv, header=False, mmap=True)
     if df.shape[1] < 7:
         raise ValueError(
             f"Expected at least 7 columns (timestamp + 6 joint positions), got {df.shape[1]}"
         )
-    timestamps = df.iloc[:, 0].to_numpy()
-    joint_configs = df.iloc[:, 1:7].to_numpy()
-
-    rows = []
-    i = 0
-    for ts, jp in zip(timestamps, joint_configs):
-        J = np.zeros((6, 6), dtype=np.float64)
-        r.JacobianSpatial(jp, J)  # fills J in-place
+    timestamps = df.iloc[:, 0].to_numpy(dtype=np.float64)
+    joint_configs = df.iloc[:, 1:7].to_numpy(dtype=np.float64)
 
-        if i == 0:
-            print("FIRST JACOBIAN VALUE")
-            print(J) 
-        # exit()
+    # Evaluate all Jacobians in batches; chunking bounds the (chunk, 6, 6) temporaries.
+    n_rows = len(timestamps)
+    arr = np.empty((n_rows, 1 + 36), dtype=np.float64)
+    arr[:, 0] = timestamps
+    for start in range(0, n_rows, chunk_size):
+        stop = min(start + chunk_size, n_rows)
+        J = jacobian_spatial(model, joint_configs[start:stop])
+        # Row-major flatten matches the previous J.flatten(order="C") output.
+        arr[start:stop, 1:] = J.reshape(stop - start, 36)
 
-        # >>> KEY CHANGE: flatten in column-major (Fortran) order <<<
-        row = np.concatenate(([ts], J.flatten(order="C")))
-        rows.append(row)
-        i+=1
+    if n_rows:
+        print("FIRST JACOBIAN VALUE")
+        print(arr[0, 1:].reshape(6, 6))
 
-    arr = np.asarray(rows)
+    if verify_cisst and n_rows:
+        idx = np.unique(np.linspace(0, n_rows - 1, min(verify_samples, n_rows)).astype(int))
+        err = compare_with_cisst(robot_file, joint_configs[idx], model=model)
+        if err is None:
+            print("cisstRobotPython not available; skipping Jacobian verification.")
+        elif err["spatial"] > verify_atol:
+            raise RuntimeError(
+                f"Vectorized Jacobian differs from cisstRobotPython by {err['spatial']:.3e} "
+                f"(atol={verify_atol:g})"
+            )
+        else:
+            print(f"Verified {len(idx)} Jacobians against cisstRobotPython (max error {err['spatial']:.3e})")
 
-    # Optional: write a header (timestamp + J11..J66 in column-major order)
-    # header = ["TIMESTAMP"] + [f"J{r}{c}" for c in range(1,7) for r in range(1,7)]
-    pd.DataFrame(arr).to_csv(output_csv, index=False, header=False)
-    print(f"Flattened Jacobians (column-major) written to {output_csv}")
+    # CSV output stays headerless; .npy/.dset outputs keep the TIMESTAMP, J11..J66 names.
+    write_table(pd.DataFrame(arr, columns=JACOBIAN_COLUMNS), output_csv, header=False)
+    print(f"Flattened Jacobians (row-major) written to {output_csv}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Compute flattened Jacobians for joint configurations")
     parser.add_argument("input_csv", type=str, help="Path to unit converted .csv . should be in the format capture_unitConvert.csv")
     parser.add_argument("output_csv", type=str, help="Path to save flattened Jacobians")
     parser.add_argument("robot_file", type=str, help="Path to robot file (.rob)")
+    parser.add_argument("--chunk-size", type=int, default=100_000, help="Rows evaluated per vectorized batch.")
+    parser.add_argument(
+        "--verify-cisst",
+        action="store_true",
+        help="Spot-check the vectorized Jacobians against cisstRobotPython when it is installed.",
+    )
+    parser.add_argument("--verify-samples", type=int, default=100, help="Rows spot-checked by --verify-cisst.")
     args = parser.parse_args()
 
-    compute_flattened_jacobian(args.input_csv, args.output_csv, args.robot_file)
+    compute_flattened_jacobian(
+        args.input_csv,
+        args.output_csv,
+        args.robot_file,
+        chunk_size=args.chunk_size,
+        verify_cisst=args.verify_cisst,
+        verify_samples=args.verify_samples,
+    )
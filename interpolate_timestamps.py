@@ -1,41 +1,187 @@
+import zlib
+from dataclasses import dataclass, replace
+
 import numpy as np
-from scipy.interpolate import interp1d
 import pandas as pd
 import argparse
 
-def interpolate_dataframe_to_sample_rate(df, target_sample_rate):
+from instrumentation import instrumented
+from table_io import read_table, write_table
+
+RESAMPLE_KINDS = ("linear", "cubic", "sinc")
+SINC_LOBES = 3
+
+@dataclass(frozen=True)
+class ResampleIndex:
     """
-    Interpolate the DataFrame to match the given target sample rate.
+    Bracketing indices of new_time in a source timebase, computed once with searchsorted.
 
-    Parameters:
-    - df: pd.DataFrame, with a time column in seconds (float64) as the first column.
-    - target_sample_rate: float, desired sample rate in Hz.
+    Files that share a timebase (e.g. joints, sensor and jacobian tables cut from the same
+    capture) can reuse one index for every column of every file.
+    """
+    new_time: np.ndarray
+    left: np.ndarray
+    frac: np.ndarray
+    n_source: int
+    source: tuple
 
-    Returns:
-    - interpolated_df: pd.DataFrame with interpolated data at the new sample rate.
+    def matches(self, time):
+        return time_fingerprint(time) == self.source
+
+def time_fingerprint(time):
+    """(length, first, last, CRC-32 of the float64 bytes): cheap identity of a timebase."""
+    time = np.ascontiguousarray(time, dtype=np.float64)
+    if len(time) == 0:
+        return (0, None, None, 0)
+    return (len(time), float(time[0]), float(time[-1]), zlib.crc32(time))
+
+def build_resample_index(time, new_time):
     """
-    df.columns = ['time'] + [f'col_{i}' for i in range(1, df.shape[1])]
-    time = df['time'].values.astype(np.float64)
-    shifted_time = time - time[0]
-    print(shifted_time)
+    Locate each new_time sample between source samples left and left + 1.
+
+    frac is the fractional position within that interval; it falls outside [0, 1] where
+    new_time lies beyond the source range, which gives linear extrapolation. time must be
+    non-decreasing; see sort_by_time.
+    """
+    time = np.asarray(time, dtype=np.float64)
+    new_time = np.asarray(new_time, dtype=np.float64)
+    if len(time) < 2:
+        raise ValueError("Need at least two source samples to resample")
+    backwards = np.flatnonzero(np.diff(time) < 0)
+    if len(backwards):
+        raise ValueError(f"Source time must be non-decreasing; it goes backwards after sample {backwards[0]}")
+    left = np.clip(np.searchsorted(time, new_time, side="right") - 1, 0, len(time) - 2)
+    dt = time[left + 1] - time[left]
+    frac = np.divide(new_time - time[left], dt, out=np.zeros_like(new_time), where=dt != 0)
+    return ResampleIndex(new_time=new_time, left=left, frac=frac, n_source=len(time), source=time_fingerprint(time))
 
+def uniform_resample_index(time, target_sample_rate):
+    """ResampleIndex onto a uniform grid at target_sample_rate, starting at time[0] = 0 (shifted)."""
+    time = np.asarray(time, dtype=np.float64)
+    shifted_time = time - time[0]
     duration = shifted_time[-1]
     n_new_samples = int(np.floor(duration * target_sample_rate)) + 1
     new_time = np.linspace(0, duration, n_new_samples)
+    # Callers match the index against the unshifted times.
+    return replace(build_resample_index(shifted_time, new_time), source=time_fingerprint(time))
+
+def time_order(time):
+    """Stable argsort of time, or None when it is already non-decreasing."""
+    time = np.asarray(time, dtype=np.float64)
+    if not np.any(np.diff(time) < 0):
+        return None
+    return np.argsort(time, kind="stable")
+
+def sort_by_time(df):
+    """df with rows in time order, as interp1d sorted its input; df itself if already sorted."""
+    order = time_order(df.iloc[:, 0].to_numpy(dtype=np.float64))
+    return df if order is None else df.iloc[order].reset_index(drop=True)
 
-    interp_func = interp1d(shifted_time, df.drop(columns='time').values.T, kind='linear', fill_value="extrapolate")
-    interpolated_values = interp_func(new_time).T
+def _kernel_weights(frac, kind):
+    """Tap offsets relative to left and their (n, taps) weights for the chosen kernel."""
+    if kind == "linear":
+        return np.array([0, 1]), np.column_stack((1.0 - frac, frac))
+
+    # Cubic and sinc kernels assume locally uniform sampling and do not extrapolate.
+    frac = np.clip(frac, 0.0, 1.0)
+    if kind == "cubic":
+        offsets = np.arange(-1, 3)
+        x = np.abs(frac[:, np.newaxis] - offsets)
+        # Keys cubic convolution kernel, a = -0.5 (Catmull-Rom).
+        weights = np.where(
+            x <= 1,
+            1.5 * x**3 - 2.5 * x**2 + 1,
+            np.where(x < 2, -0.5 * x**3 + 2.5 * x**2 - 4 * x + 2, 0.0),
+        )
+    elif kind == "sinc":
+        offsets = np.arange(-SINC_LOBES + 1, SINC_LOBES + 1)
+        x = frac[:, np.newaxis] - offsets
+        # Lanczos-windowed sinc, normalized so a constant signal is preserved.
+        weights = np.sinc(x) * np.sinc(x / SINC_LOBES)
+        weights /= weights.sum(axis=1, keepdims=True)
+    else:
+        raise ValueError(f"Unknown resample kind: {kind}. Expected one of {RESAMPLE_KINDS}")
+    return offsets, weights
+
+def resample_values(values, index, kind="linear", start=0, stop=None):
+    """
+    Gather-and-blend values (n_source, n_columns) at index.new_time[start:stop] for all columns at once.
+
+    values may be a memmap; only the source rows around the requested outputs are read.
+    """
+    stop = len(index.new_time) if stop is None else stop
+    left = index.left[start:stop]
+    if len(left) == 0:
+        return np.empty((0,) + values.shape[1:], dtype=np.float64)
+    offsets, weights = _kernel_weights(index.frac[start:stop], kind)
+
+    # Read only the contiguous block of source rows this output range touches.
+    lo = max(0, int(left.min()) + int(offsets[0]))
+    hi = min(index.n_source, int(left.max()) + int(offsets[-1]) + 1)
+    block = np.asarray(values[lo:hi], dtype=np.float64)
+    out = np.zeros((len(left),) + block.shape[1:], dtype=np.float64)
+    for k, offset in enumerate(offsets):
+        rows = np.clip(left + offset, 0, index.n_source - 1) - lo
+        w = weights[:, k].reshape((-1,) + (1,) * (block.ndim - 1))
+        out += w * block[rows]
+    return out
+
+def iter_resampled(values, index, kind="linear", chunk_rows=1_000_000):
+    """Yield (new_time, resampled values) for consecutive blocks of output rows."""
+    if chunk_rows < 1:
+        raise ValueError(f"chunk_rows must be >= 1, got {chunk_rows}")
+    for start in range(0, len(index.new_time), chunk_rows):
+        stop = min(start + chunk_rows, len(index.new_time))
+        yield index.new_time[start:stop], resample_values(values, index, kind, start, stop)
+
+@instrumented()
+def interpolate_dataframe_to_sample_rate(df, target_sample_rate, kind="linear", index=None):
+    """
+    Interpolate the DataFrame to match the given target sample rate.
+
+    Parameters:
+    - df: pd.DataFrame, with a time column in seconds (float64) as the first column.
+      Rows out of time order are sorted first.
+    - target_sample_rate: float, desired sample rate in Hz.
+    - kind: str, "linear" (default), "cubic" or "sinc".
+    - index: ResampleIndex | None, reuse an index built for the same timebase.
+
+    Returns:
+    - interpolated_df: pd.DataFrame with interpolated data at the new sample rate
+      and the input's column labels.
+    """
+    df = sort_by_time(df)
+    time = df.iloc[:, 0].to_numpy(dtype=np.float64)
+    if index is None:
+        index = uniform_resample_index(time, target_sample_rate)
+    elif not index.matches(time):
+        raise ValueError(
+            f"Resample index was built for a different timebase ({index.n_source} samples, "
+            f"{index.source[1]} to {index.source[2]} s); DataFrame has {len(time)} samples, "
+            f"{time[0] if len(time) else None} to {time[-1] if len(time) else None} s"
+        )
 
-    interpolated_df = pd.DataFrame(np.column_stack([new_time, interpolated_values]), columns=df.columns)
-    return interpolated_df
+    out = np.empty((len(index.new_time), df.shape[1]), dtype=np.float64)
+    out[:, 0] = index.new_time
+    out[:, 1:] = resample_values(df.iloc[:, 1:].to_numpy(dtype=np.float64), index, kind)
+    return pd.DataFrame(out, columns=df.columns)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Interpolate CSV timestamps to a target sample rate.")
-    parser.add_argument("csv_path", type=str, help="Path to the CSV file.")
+    parser.add_argument("csv_path", type=str, nargs="+", help="Path(s) to the CSV file(s); each is overwritten.")
     parser.add_argument("--sample_rate", type=float, required=True, help="Target sample rate in Hz.")
+    parser.add_argument("--kind", type=str, default="linear", choices=RESAMPLE_KINDS, help="Interpolation kernel.")
     args = parser.parse_args()
 
-    df = pd.read_csv(args.csv_path, header=None)
-    interpolated_df = interpolate_dataframe_to_sample_rate(df, args.sample_rate)
-    interpolated_df.to_csv(args.csv_path, index=False, header=False)
-    print(f"Interpolated and saved to {args.csv_path} at {args.sample_rate} Hz")
+    index = None
+    index_time = None
+    for csv_path in args.csv_path:
+        df = sort_by_time(read_table(csv_path, header=False))
+        time = df.iloc[:, 0].to_numpy(dtype=np.float64)
+        # Files cut from the same capture share a timebase; reuse the bracketing indices.
+        if index_time is None or not np.array_equal(time, index_time):
+            index = uniform_resample_index(time, args.sample_rate)
+            index_time = time
+        interpolated_df = interpolate_dataframe_to_sample_rate(df, args.sample_rate, kind=args.kind, index=index)
+        write_table(interpolated_df, csv_path, header=False)
+        print(f"Interpolated and saved to {csv_path} at {args.sample_rate} Hz")
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""Bounded cross-correlation lag search over several signals at once.
+
+Only lags in [-max_lag, max_lag] are evaluated. Short windows use direct
+windowed dot products; longer ones use an FFT sized N + max_lag (instead of
+the 2N - 1 a full correlation needs) and read off just the bounded lags.
+Peaks can be refined to sub-sample precision by parabolic interpolation.
+
+Conventions match scipy.signal.correlate(r, x, mode="full"): the correlation
+at lag k is sum_n r[n + k] * x[n], so a positive lag means r lags x.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+from scipy import fft as sp_fft
+
+LAG_METHODS = ("auto", "direct", "fft")
+
+
+def _choose_method(n_samples: int, max_lag: int) -> str:
+    # Direct costs ~(2L + 1) * N multiply-adds; the FFT path ~3 transforms of N + L points.
+    fft_cost = 3.0 * (n_samples + max_lag) * np.log2(max(2, n_samples + max_lag))
+    return "direct" if (2 * max_lag + 1) * n_samples <= fft_cost else "fft"
+
+
+def bounded_xcorr(r: np.ndarray, x: np.ndarray, max_lag: int, method: str = "auto") -> tuple[np.ndarray, np.ndarray]:
+    """
+    Cross-correlation of each row pair of r and x (shape (n_signals, N)) for |lag| <= max_lag.
+
+    Returns:
+        (lags, c): lags of shape (2 * max_lag + 1,) and c of shape (n_signals, 2 * max_lag + 1).
+    """
+    r = np.atleast_2d(np.asarray(r, dtype=np.float64))
+    x = np.atleast_2d(np.asarray(x, dtype=np.float64))
+    if r.shape != x.shape:
+        raise ValueError(f"r and x must have the same shape, got {r.shape} and {x.shape}")
+    if max_lag < 0:
+        raise ValueError(f"max_lag must be >= 0, got {max_lag}")
+    n_samples = r.shape[1]
+    max_lag = min(int(max_lag), max(0, n_samples - 1))
+    lags = np.arange(-max_lag, max_lag + 1)
+    if method == "auto":
+        method = _choose_method(n_samples, max_lag)
+
+    if method == "direct":
+        c = np.empty((r.shape[0], len(lags)), dtype=np.float64)
+        for i, k in enumerate(lags):
+            if k >= 0:
+                c[:, i] = np.einsum("ij,ij->i", r[:, k:], x[:, : n_samples - k])
+            else:
+                c[:, i] = np.einsum("ij,ij->i", r[:, : n_samples + k], x[:, -k:])
+        return lags, c
+    if method != "fft":
+        raise ValueError(f"Unknown lag search method: {method}. Expected one of {LAG_METHODS}")
+
+    # Zero padding to N + L keeps every bounded lag free of circular wrap-around.
+    n_fft = sp_fft.next_fast_len(n_samples + max_lag, real=True)
+    R = sp_fft.rfft(r, n_fft, axis=1)
+    X = sp_fft.rfft(x, n_fft, axis=1)
+    circ = sp_fft.irfft(R * np.conj(X), n_fft, axis=1)
+    c = np.concatenate((circ[:, n_fft - max_lag :], circ[:, : max_lag + 1]), axis=1)
+    return lags, c
+
+
+def parabolic_peak_offset(y_prev: np.ndarray, y_peak: np.ndarray, y_next: np.ndarray) -> np.ndarray:
+    """Vertex offset in (-0.5, 0.5) of the parabola through three samples around a peak."""
+    denom = y_prev - 2.0 * y_peak + y_next
+    with np.errstate(divide="ignore", invalid="ignore"):
+        offset = np.where(denom != 0, 0.5 * (y_prev - y_next) / denom, 0.0)
+    return np.clip(offset, -0.5, 0.5)
+
+
+def _stack_demeaned(signals) -> np.ndarray:
+    """Demean each 1-D signal and zero-pad them to a common length (padding does not change bounded correlations)."""
+    signals = [np.asarray(s, dtype=np.float64) for s in signals]
+    out = np.zeros((len(signals), max((len(s) for s in signals), default=0)), dtype=np.float64)
+    for i, s in enumerate(signals):
+        if len(s):
+            out[i, : len(s)] = s - s.mean()
+    return out
+
+
+def best_lags(
+    r,
+    x,
+    max_lag: int,
+    subsample: bool = False,
+    method: str = "auto",
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Lag of the largest |correlation| for each signal pair, and the normalized correlation there.
+
+    r and x are (n_signals, N) arrays or equal-length lists of 1-D signals; r[i] and x[i] must
+    have the same length, but different pairs may differ. Each signal is demeaned first.
+    With subsample=True the integer peak is refined by fitting a parabola to |c| at the
+    peak and its two neighbours (not at the window edge).
+
+    Returns:
+        (lags, corr): float lags (integer-valued unless subsample) and correlations, shape (n_signals,).
+    """
+    if isinstance(r, np.ndarray) and r.ndim == 1:
+        r, x = [r], [x]
+    if len(r) != len(x) or any(len(ri) != len(xi) for ri, xi in zip(r, x)):
+        raise ValueError("r and x must hold the same number of equal-length signals")
+    r = _stack_demeaned(r)
+    x = _stack_demeaned(x)
+
+    lags, c = bounded_xcorr(r, x, max_lag, method=method)
+    mag = np.abs(c)
+    rows = np.arange(c.shape[0])
+    peak = np.argmax(mag, axis=1)
+    best = lags[peak].astype(np.float64)
+
+    if subsample and len(lags) >= 3:
+        inner = (peak > 0) & (peak < len(lags) - 1)
+        lo = np.clip(peak - 1, 0, len(lags) - 1)
+        hi = np.clip(peak + 1, 0, len(lags) - 1)
+        offset = parabolic_peak_offset(mag[rows, lo], mag[rows, peak], mag[rows, hi])
+        best = best + np.where(inner, offset, 0.0)
+
+    denom = np.sqrt(np.sum(r * r, axis=1) * np.sum(x * x, axis=1))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        corr = np.where(denom > np.finfo(float).eps, c[rows, peak] / denom, np.nan)
+    return best, corr
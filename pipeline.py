@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""Run the joint preprocessing chain in-process from a declarative config.
+
+The input is loaded once, every stage runs on in-memory DataFrames, and each
+resulting part is written once. Stages reuse the existing script functions:
+
+    preprocess   preprocessing.select_joint_columns
+    split        split_val_test.split_dataframe          (-> parts "val" and "test")
+    cutoff       cutoff.truncate_dataframe
+    filter       filter.design_fir_filter + apply_filter_to_*_df
+    downsample   downsample.downsample_dataframe
+    decimate     downsample.decimate_dataframe             (fused anti-alias filter + resample)
+    interpolate  interpolate_timestamps.interpolate_dataframe_to_sample_rate
+
+Usage:
+    python3 pipeline.py pipeline.example.toml [--input raw.csv] [--output out/{part}.npy]
+        [--no-cache | --clear-cache] [--cache-dir DIR] [--cache-max-mb MB]
+        [--report run.html] [--trace-memory] [--profile-dir profiles]
+
+Stage outputs are cached by stage_cache.StageCache, so re-running after changing
+only a late stage (e.g. downsample.target_freq) starts from the last unchanged one.
+--report records wall/CPU time, rows, I/O and memory for every stage (see
+instrumentation.py).
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+from typing import Callable
+
+import pandas as pd
+
+import filter as fir
+import fir_design
+from cutoff import truncate_dataframe
+from downsample import decimate_dataframe, design_decimation_filter, downsample_dataframe
+from instrumentation import recording, stage as record_stage
+from interpolate_timestamps import interpolate_dataframe_to_sample_rate
+from preprocessing import select_joint_columns
+from split_val_test import split_dataframe
+from stage_cache import DEFAULT_CACHE_DIR, StageCache, code_fingerprint, file_digest, stage_key
+from table_io import read_table, write_table
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    tomllib = None
+
+# A stage maps (DataFrame, current sample rate, params) -> (DataFrame, new sample rate).
+StageFn = Callable[[pd.DataFrame, float, dict], tuple[pd.DataFrame, float]]
+
+
+def _stage_preprocess(df: pd.DataFrame, fs: float, params: dict) -> tuple[pd.DataFrame, float]:
+    return select_joint_columns(df), fs
+
+
+def _stage_cutoff(df: pd.DataFrame, fs: float, params: dict) -> tuple[pd.DataFrame, float]:
+    return truncate_dataframe(df, float(params["seconds"]), float(params.get("frequency", fs))), fs
+
+
+def _stage_filter(df: pd.DataFrame, fs: float, params: dict) -> tuple[pd.DataFrame, float]:
+    fir_coeffs = fir.design_fir_filter(
+        filter_type=params.get("type", "kaiser"),
+        fs=float(params.get("fs", fs)),
+        fC=float(params["cutoff_hz"]),
+        order=int(params.get("order", 30)),
+    )
+    columns = params.get("columns", "joints")
+    parallel = {"executor": params.get("executor", "thread"), "workers": params.get("workers")}
+    if columns == "joints":
+        df = fir.apply_filter_to_torque_feedback_df(
+            df,
+            fir_coeffs,
+            filter_velocity=bool(params.get("velocity", False)),
+            filter_position=bool(params.get("position", False)),
+            **parallel,
+        )
+    elif columns == "sensor":
+        df = fir.apply_filter_to_fs_df(df, fir_coeffs, **parallel)
+    elif columns == "all":
+        df = fir.apply_filter_to_dataframe(df, fir_coeffs, column_indices=range(1, df.shape[1]), **parallel)
+    else:
+        df = fir.apply_filter_to_dataframe(df, fir_coeffs, column_indices=columns, **parallel)
+    return df, fs
+
+
+def _stage_downsample(df: pd.DataFrame, fs: float, params: dict) -> tuple[pd.DataFrame, float]:
+    target = float(params["target_freq"])
+    df = downsample_dataframe(df, fs, target, use_moving_average=bool(params.get("moving_average", False)))
+    return df, target
+
+
+def _stage_decimate(df: pd.DataFrame, fs: float, params: dict) -> tuple[pd.DataFrame, float]:
+    target = float(params["target_freq"])
+    cutoff = params.get("cutoff_hz")
+    order = params.get("order")
+    fir_coeffs = design_decimation_filter(
+        fs,
+        target,
+        cutoff_hz=None if cutoff is None else float(cutoff),
+        order=None if order is None else int(order),
+        filter_type=params.get("type", "kaiser"),
+    )
+    return decimate_dataframe(df, fs, target, fir_coeffs), target
+
+
+def _stage_interpolate(df: pd.DataFrame, fs: float, params: dict) -> tuple[pd.DataFrame, float]:
+    rate = float(params.get("sample_rate", fs))
+    return interpolate_dataframe_to_sample_rate(df, rate, kind=params.get("kind", "linear")), rate
+
+
+STAGES: dict[str, StageFn] = {
+    "preprocess": _stage_preprocess,
+    "cutoff": _stage_cutoff,
+    "filter": _stage_filter,
+    "downsample": _stage_downsample,
+    "decimate": _stage_decimate,
+    "interpolate": _stage_interpolate,
+}
+
+# Code each stage depends on; editing any of it invalidates that stage's cache entries.
+STAGE_DEPENDENCIES = {
+    "preprocess": (select_joint_columns,),
+    "split": (split_dataframe,),
+    "cutoff": (truncate_dataframe,),
+    "filter": (fir, fir_design),
+    "downsample": (downsample_dataframe,),
+    "decimate": (decimate_dataframe, fir_design),
+    "interpolate": (interpolate_dataframe_to_sample_rate,),
+}
+
+
+def _stage_fingerprint(name: str) -> str:
+    return code_fingerprint(STAGES.get(name, split_dataframe), *STAGE_DEPENDENCIES[name])
+
+
+def _plan_stage_keys(input_key: str, plan: list[tuple[str, dict]]) -> list[dict[str, str]]:
+    """Cache keys of every part after each planned stage, derived without touching the data."""
+    keys = []
+    current = {"data": input_key}
+    for name, params in plan:
+        fingerprint = _stage_fingerprint(name)
+        if name == "split":
+            if len(current) != 1:
+                raise ValueError("The split stage can only run once, on a single part.")
+            (parent,) = current.values()
+            current = {part: stage_key(parent, name, params, fingerprint, part) for part in ("val", "test")}
+        else:
+            current = {part: stage_key(key, name, params, fingerprint, part) for part, key in current.items()}
+        keys.append(current)
+    return keys
+
+
+def load_config(path: str | Path) -> dict:
+    """Load a pipeline config from .toml or .json."""
+    path = Path(path)
+    if path.suffix.lower() == ".json":
+        with open(path, "r") as fh:
+            return json.load(fh)
+    if path.suffix.lower() == ".toml":
+        if tomllib is None:
+            raise ImportError("Reading .toml configs requires Python 3.11+ (tomllib); use a .json config instead.")
+        with open(path, "rb") as fh:
+            return tomllib.load(fh)
+    raise ValueError(f"Unsupported config format '{path.suffix}' for {path}. Use .toml or .json")
+
+
+def run_stages(
+    df: pd.DataFrame | Callable[[], pd.DataFrame],
+    stages: list[dict],
+    sample_rate: float,
+    cache: StageCache | None = None,
+    input_key: str | None = None,
+) -> tuple[dict[str, pd.DataFrame], float]:
+    """Apply the configured stages to an in-memory frame.
+
+    Returns the resulting parts ({"data": df}, or {"val": ..., "test": ...} after a
+    split stage) and the sample rate after the last stage. With a cache and an
+    input_key, the run resumes from the last stage whose outputs are all cached;
+    df may then be a loader callable so the input is only read when needed.
+    """
+    plan = []
+    for stage in stages:
+        if not stage.get("enabled", True):
+            print(f"Skipping disabled stage: {stage['name']}")
+            continue
+        params = {k: v for k, v in stage.items() if k not in ("name", "enabled")}
+        plan.append((stage["name"], params))
+    for name, _params in plan:
+        if name not in STAGES and name != "split":
+            raise ValueError(f"Unknown stage '{name}'. Expected one of {sorted(STAGES) + ['split']}")
+
+    fs = float(sample_rate)
+    start = 0
+    keys: list[dict[str, str]] = []
+    parts = None
+    if cache is not None and input_key is not None:
+        keys = _plan_stage_keys(input_key, plan)
+        for i in range(len(plan) - 1, -1, -1):
+            if all(cache.has(key) for key in keys[i].values()):
+                parts = {}
+                for part, key in keys[i].items():
+                    parts[part], meta = cache.get(key)
+                    fs = float(meta["fs"])
+                start = i + 1
+                print(f"Cache hit: reusing outputs of {start} stage(s) up to '{plan[i][0]}'")
+                break
+    if parts is None:
+        parts = {"data": df() if callable(df) else df}
+
+    for i in range(start, len(plan)):
+        name, params = plan[i]
+        with record_stage(f"pipeline.{name}", rows_in=sum(len(p) for p in parts.values())) as record:
+            if name == "split":
+                if len(parts) != 1:
+                    raise ValueError("The split stage can only run once, on a single part.")
+                (only,) = parts.values()
+                val_df, test_df = split_dataframe(only, float(params.get("ratio", 0.5)))
+                parts = {"val": val_df, "test": test_df}
+                print(f"Split into val ({len(val_df)} rows) and test ({len(test_df)} rows)")
+            else:
+                stage_fn = STAGES[name]
+                stage_fs = fs
+                for part, part_df in parts.items():
+                    parts[part], fs = stage_fn(part_df, stage_fs, params)
+                print(f"Ran stage {name} on {len(parts)} part(s); sample rate {fs:g} Hz")
+            record.rows_out = sum(len(p) for p in parts.values())
+
+        if keys:
+            for part, part_df in parts.items():
+                cache.put(keys[i][part], part_df, {"stage": name, "params": params, "fs": fs, "rows": len(part_df)})
+    return parts, fs
+
+
+def run_pipeline(
+    config: dict,
+    input_path: str | Path | None = None,
+    output_path: str | None = None,
+    cache: StageCache | None = None,
+) -> dict[str, Path]:
+    """Load the input once, run all stages in memory, and write each part once.
+
+    Pass a StageCache to reuse stage outputs from earlier runs on the same input.
+    """
+    input_path = Path(input_path if input_path is not None else config["input"]).expanduser()
+    output_template = output_path if output_path is not None else config["output"]
+    stages = list(config.get("stages", []))
+    enabled = [s for s in stages if s.get("enabled", True)]
+
+    # Raw captures carry a header row; already-preprocessed joint tables do not.
+    default_header = bool(enabled) and enabled[0]["name"] == "preprocess"
+    input_header = bool(config.get("input_header", default_header))
+
+    def load_input() -> pd.DataFrame:
+        with record_stage("pipeline.load") as record:
+            df = read_table(input_path, header=input_header)
+            record.rows_out = len(df)
+        print(f"Loaded {input_path}: {df.shape[0]} rows x {df.shape[1]} columns")
+        return df
+
+    input_key = None
+    if cache is not None:
+        # Stages read fs from the run, not their params, so the sample rate keys the input.
+        input_params = {"header": input_header, "sample_rate": float(config["sample_rate"])}
+        input_key = stage_key(file_digest(input_path), "input", input_params, "", "data")
+    parts, _fs = run_stages(load_input, stages, float(config["sample_rate"]), cache=cache, input_key=input_key)
+
+    if len(parts) > 1 and "{part}" not in output_template:
+        raise ValueError(f"Output '{output_template}' needs a '{{part}}' placeholder for parts {list(parts)}")
+
+    written = {}
+    for part, part_df in parts.items():
+        out = Path(output_template.format(part=part)).expanduser()
+        out.parent.mkdir(parents=True, exist_ok=True)
+        with record_stage("pipeline.write", rows_in=len(part_df)):
+            write_table(part_df, out, header=bool(config.get("output_header", False)))
+        written[part] = out
+        print(f"Wrote {part}: {len(part_df)} rows -> {out}")
+    return written
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the preprocessing stages in-process from a TOML/JSON config.")
+    parser.add_argument("config", type=str, help="Pipeline config (.toml or .json)")
+    parser.add_argument("--input", type=str, default=None, help="Override the config's input path.")
+    parser.add_argument(
+        "--output",
+        type=str,
+        default=None,
+        help="Override the config's output path; use {part} when the pipeline splits.",
+    )
+    cache_group = parser.add_mutually_exclusive_group()
+    cache_group.add_argument("--no-cache", action="store_true", help="Run every stage without reading or writing the cache.")
+    cache_group.add_argument("--clear-cache", action="store_true", help="Empty the stage cache before running.")
+    parser.add_argument("--cache-dir", type=str, default=None, help=f"Stage cache directory (default: {DEFAULT_CACHE_DIR}).")
+    parser.add_argument("--cache-max-mb", type=float, default=None, help="Cache size limit before LRU eviction.")
+    parser.add_argument("--report", type=str, default=None, help="Write a per-stage run report (.json or .html).")
+    parser.add_argument("--trace-memory", action="store_true", help="Add per-stage peak allocations to the report.")
+    parser.add_argument("--profile-dir", type=str, default=None, help="Dump a cProfile per stage here (needs --report).")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    cache = None
+    if not args.no_cache:
+        cache_dir = args.cache_dir or config.get("cache_dir", DEFAULT_CACHE_DIR)
+        max_mb = args.cache_max_mb if args.cache_max_mb is not None else config.get("cache_max_mb", 4096)
+        cache = StageCache(cache_dir, max_bytes=int(max_mb * 1024**2))
+        if args.clear_cache:
+            cache.clear()
+            print(f"Cleared stage cache at {cache.root}")
+        else:
+            cache.evict()
+
+    if args.report is None:
+        run_pipeline(config, input_path=args.input, output_path=args.output, cache=cache)
+        return
+    with recording(args.report, trace_memory=args.trace_memory, profile_dir=args.profile_dir):
+        run_pipeline(config, input_path=args.input, output_path=args.output, cache=cache)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,12 +5,17 @@ from __future__ import annotations
 
 import argparse
 import re
+import sys
 from pathlib import Path
 
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from plotting import plot_trace, save_figure, subplots  # noqa: E402
+from table_io import read_table  # noqa: E402
+
 
 def _x_axis(df: pd.DataFrame) -> tuple[np.ndarray, str]:
     if "TIMESTAMP" in df.columns:
@@ -44,14 +49,14 @@ def _load_force_csv(
     force_cols: tuple[int, ...],
 ) -> pd.DataFrame:
     if has_header:
-        df = pd.read_csv(force_csv)
+        df = read_table(force_csv, mmap=True)
         expected = ("FORCE_1", "FORCE_2", "FORCE_3")
         cols = [col for col in expected if col in df.columns]
         if not cols:
             raise ValueError("Force CSV must contain at least one of FORCE_1, FORCE_2, FORCE_3.")
         return df
 
-    raw_df = pd.read_csv(force_csv, header=None)
+    raw_df = read_table(force_csv, header=False, mmap=True)
     max_idx = raw_df.shape[1] - 1
     requested = (time_col, *force_cols)
     if any(idx < 0 or idx > max_idx for idx in requested):
@@ -86,26 +91,14 @@ def _scale_to_match(target: np.ndarray, source: np.ndarray) -> np.ndarray:
     return scale * source.astype(float, copy=False) + offset
 
 
-def plot_overlay(
-    debug_csv: Path,
-    output_png: Path | None = None,
-    force_csv: Path | None = None,
-    force_has_header: bool = True,
-    force_time_col: int = 0,
-    force_value_cols: tuple[int, ...] = (1, 2, 3),
-) -> Path:
-    df = pd.read_csv(debug_csv)
-    force_df = (
-        _load_force_csv(force_csv, force_has_header, force_time_col, force_value_cols)
-        if force_csv is not None
-        else None
-    )
+def plot_overlay_frame(df: pd.DataFrame, out_path: Path, force_df: pd.DataFrame | None = None) -> Path:
+    """Render the overlay of an already loaded alignment debug table (and force table) to out_path."""
     joints = _joint_indices(df)
     if not joints:
         raise ValueError("No JOINT_<i>_* columns found in alignment debug CSV.")
 
     x, x_label = _x_axis(df)
-    fig, axes = plt.subplots(len(joints), 1, figsize=(12, 3.8 * len(joints)), sharex=True)
+    fig, axes = subplots(len(joints), 1, figsize=(12, 3.8 * len(joints)), sharex=True)
     if len(joints) == 1:
         axes = [axes]
 
@@ -125,13 +118,14 @@ def plot_overlay(
         corr_val = df[corr_col].iloc[0] if corr_col in df.columns and not df.empty else np.nan
 
         if shifted is not None:
-            ax.plot(x, shifted, label="Residual shifted", linewidth=1.0, color="tab:red")
+            plot_trace(ax, x, shifted, label="Residual shifted", linewidth=1.0, color="tab:red")
         if force_df is not None:
             force_col = f"FORCE_{joint_i}"
             if force_col in force_df.columns:
                 force_vals = _to_float(force_df, force_col)
                 scaled_force = _scale_to_match(shifted, force_vals) if shifted is not None else force_vals
-                ax.plot(
+                plot_trace(
+                    ax,
                     force_x,
                     scaled_force,
                     label=f"{force_col} scaled",
@@ -148,12 +142,25 @@ def plot_overlay(
 
     axes[-1].set_xlabel(x_label)
     fig.tight_layout()
+    return save_figure(fig, out_path)
 
+
+def plot_overlay(
+    debug_csv: Path,
+    output_png: Path | None = None,
+    force_csv: Path | None = None,
+    force_has_header: bool = True,
+    force_time_col: int = 0,
+    force_value_cols: tuple[int, ...] = (1, 2, 3),
+) -> Path:
+    df = read_table(debug_csv, mmap=True)
+    force_df = (
+        _load_force_csv(force_csv, force_has_header, force_time_col, force_value_cols)
+        if force_csv is not None
+        else None
+    )
     out_path = output_png if output_png is not None else debug_csv.with_name(f"{debug_csv.stem}_overlay.png")
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    fig.savefig(out_path, dpi=200)
-    plt.close(fig)
-    return out_path
+    return plot_overlay_frame(df, out_path, force_df)
 
 
 def parse_args() -> argparse.Namespace:
@@ -1,11 +1,19 @@
 #!/usr/bin/env python3
 import argparse
+import sys
 from pathlib import Path
 
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-from scipy.signal import filtfilt, firwin
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fir_design import design_fir  # noqa: E402
+from plotting import plot_trace, save_figure, subplots  # noqa: E402
+from table_io import read_table  # noqa: E402
+
+# Stronger stop-band than the pipeline filters' Kaiser beta of 3.5; residual plots favour attenuation.
+RESIDUAL_KAISER_BETA = 8.6
 
 
 def _infer_sampling_rate(timestamps: pd.Series) -> float:
@@ -22,7 +30,7 @@ def _kaiser_lowpass_filter(
     fs: float,
     cutoff_hz: float,
     order: int = 30,
-    beta: float = 8.6,
+    beta: float = RESIDUAL_KAISER_BETA,
 ) -> np.ndarray:
     x = pd.to_numeric(signal, errors="coerce").to_numpy(dtype=float)
     valid = np.isfinite(x)
@@ -37,76 +45,39 @@ def _kaiser_lowpass_filter(
             f"Cutoff {cutoff_hz:.3f} Hz must be below Nyquist ({nyquist:.3f} Hz)."
         )
 
-    taps = firwin(
-        numtaps=int(order) + 1,
-        cutoff=float(cutoff_hz),
-        fs=fs,
-        pass_zero="lowpass",
-        window=("kaiser", float(beta)),
-    )
+    design = design_fir("kaiser", fs, cutoff_hz, order, beta=beta)
     y = x.copy()
-    y_valid = filtfilt(taps, [1.0], x[valid])
+    y_valid = design.filtfilt(x[valid])
     y[valid] = y_valid
     return y
 
 
-def main() -> None:
-    parser = argparse.ArgumentParser(description="Plot encoder vs pot signals from *_potEncoder.csv")
-    parser.add_argument("csv", type=str, help="Path to *_potEncoder.csv")
-    parser.add_argument(
-        "--residual-kaiser-cutoff",
-        type=float,
-        default=None,
-        help="Apply a Kaiser low-pass FIR filter to residual traces using this cutoff frequency (Hz).",
-    )
-    parser.add_argument(
-        "--kaiser-beta",
-        type=float,
-        default=8.6,
-        help="Kaiser window beta parameter (higher = stronger stop-band attenuation).",
-    )
-    parser.add_argument(
-        "--kaiser-order",
-        type=int,
-        default=30,
-        help="FIR filter order for residual Kaiser low-pass (numtaps = order + 1).",
-    )
-    parser.add_argument(
-        "--print-filter-delta",
-        action="store_true",
-        help="Print per-joint residual change stats after notch filtering.",
-    )
-    parser.add_argument(
-        "--save-filtered-residual-csv",
-        nargs="?",
-        const="",
-        default=None,
-        help=(
-            "Save plotted residual traces to CSV. "
-            "If a path is provided, write there; otherwise uses "
-            "<input_stem>_encoder_residual_filtered.csv next to input."
-        ),
-    )
-    args = parser.parse_args()
-    if args.kaiser_order < 1:
-        raise ValueError("--kaiser-order must be >= 1.")
-
-    csv_path = Path(args.csv).expanduser().resolve()
-    df = pd.read_csv(csv_path)
+def plot_encoder_vs_pot(
+    df: pd.DataFrame,
+    out_prefix: Path,
+    residual_kaiser_cutoff: float | None = None,
+    kaiser_order: int = 30,
+    kaiser_beta: float = RESIDUAL_KAISER_BETA,
+    print_filter_delta: bool = False,
+) -> pd.DataFrame:
+    """
+    Save the encoder-vs-pot, residual and overlay figures as <out_prefix>_*.png.
 
+    Returns the plotted (optionally Kaiser-filtered) residual traces.
+    """
     t = pd.to_numeric(df["TIMESTAMP"], errors="coerce")
     t = t - t.iloc[0]
 
-    fig, axes = plt.subplots(3, 1, figsize=(12, 8), sharex=True)
+    fig, axes = subplots(3, 1, figsize=(12, 8), sharex=True)
     pairs = [("POT_3", "ENCODER_POS_1", "ORIGINAL_ENCODER_POS_1"),
              ("POT_4", "ENCODER_POS_2", "ORIGINAL_ENCODER_POS_2"),
              ("POT_5", "ENCODER_POS_3", "ORIGINAL_ENCODER_POS_3")]
 
     for i, (pot, enc, enc_raw) in enumerate(pairs, start=1):
         ax = axes[i - 1]
-        ax.plot(t, df[pot], label=pot, linewidth=0.9)
-        ax.plot(t, df[enc], label=f"{enc} (mapped)", linewidth=0.9)
-        ax.plot(t, df[enc_raw], label=f"{enc_raw} (raw)", linewidth=0.9, alpha=0.7)
+        plot_trace(ax, t, df[pot], label=pot, linewidth=0.9)
+        plot_trace(ax, t, df[enc], label=f"{enc} (mapped)", linewidth=0.9)
+        plot_trace(ax, t, df[enc_raw], label=f"{enc_raw} (raw)", linewidth=0.9, alpha=0.7)
         ax.set_title(f"Joint {i}")
         ax.grid(alpha=0.25)
         ax.legend(loc="upper right", fontsize=8)
@@ -114,21 +85,21 @@ def main() -> None:
     axes[-1].set_xlabel("Time from start")
     fig.tight_layout()
 
-    out_png = csv_path.with_name(f"{csv_path.stem}_encoder_vs_pot.png")
-    fig.savefig(out_png, dpi=200)
+    out_png = out_prefix.with_name(f"{out_prefix.name}_encoder_vs_pot.png")
+    save_figure(fig, out_png)
     print(f"Saved {out_png}")
 
-    fig_res, axes_res = plt.subplots(3, 1, figsize=(12, 8), sharex=True)
+    fig_res, axes_res = subplots(3, 1, figsize=(12, 8), sharex=True)
     fs = None
-    cutoff_hz = args.residual_kaiser_cutoff
+    cutoff_hz = residual_kaiser_cutoff
     residual_df = pd.DataFrame({"TIMESTAMP": pd.to_numeric(df["TIMESTAMP"], errors="coerce"), "TIME_FROM_START": t})
     residual_series = []
     if cutoff_hz is not None:
         fs = _infer_sampling_rate(df["TIMESTAMP"])
         print(
             f"Applying Kaiser FIR low-pass to residuals "
-            f"(order={args.kaiser_order}, cutoff={cutoff_hz:g} Hz, "
-            f"beta={args.kaiser_beta}, fs={fs:.3f} Hz)."
+            f"(order={kaiser_order}, cutoff={cutoff_hz:g} Hz, "
+            f"beta={kaiser_beta}, fs={fs:.3f} Hz)."
         )
     for i, (_pot, enc, enc_raw) in enumerate(pairs, start=1):
         ax = axes_res[i - 1]
@@ -139,10 +110,10 @@ def main() -> None:
                 residual,
                 fs=fs,
                 cutoff_hz=cutoff_hz,
-                order=args.kaiser_order,
-                beta=args.kaiser_beta,
+                order=kaiser_order,
+                beta=kaiser_beta,
             )
-            if args.print_filter_delta:
+            if print_filter_delta:
                 raw = pd.to_numeric(residual, errors="coerce").to_numpy(dtype=float)
                 filt = np.asarray(residual_to_plot, dtype=float)
                 valid = np.isfinite(raw) & np.isfinite(filt)
@@ -159,24 +130,24 @@ def main() -> None:
         residual_to_plot = np.asarray(residual_to_plot, dtype=float)
         residual_series.append(residual_to_plot)
         residual_df[f"JOINT_{i}_RESIDUAL"] = residual_to_plot
-        ax.plot(t, residual_to_plot, linewidth=0.9)
+        plot_trace(ax, t, residual_to_plot, linewidth=0.9)
         ax.set_title(f"Joint {i} residual: {enc} - {enc_raw}")
         ax.set_ylabel("Residual")
         ax.grid(alpha=0.25)
 
     axes_res[-1].set_xlabel("Time from start")
     fig_res.tight_layout()
-    out_res_png = csv_path.with_name(f"{csv_path.stem}_encoder_residual.png")
-    fig_res.savefig(out_res_png, dpi=200)
+    out_res_png = out_prefix.with_name(f"{out_prefix.name}_encoder_residual.png")
+    save_figure(fig_res, out_res_png)
     print(f"Saved {out_res_png}")
-    fig_overlay, axes_overlay = plt.subplots(3, 1, figsize=(12, 8), sharex=True)
+    fig_overlay, axes_overlay = subplots(3, 1, figsize=(12, 8), sharex=True)
     for i, (pot, enc, enc_raw) in enumerate(pairs, start=1):
         ax = axes_overlay[i - 1]
-        ax.plot(t, df[pot], label=pot, linewidth=0.9)
-        ax.plot(t, df[enc], label=f"{enc} (mapped)", linewidth=0.9)
-        ax.plot(t, df[enc_raw], label=f"{enc_raw} (raw)", linewidth=0.9, alpha=0.7)
+        plot_trace(ax, t, df[pot], label=pot, linewidth=0.9)
+        plot_trace(ax, t, df[enc], label=f"{enc} (mapped)", linewidth=0.9)
+        plot_trace(ax, t, df[enc_raw], label=f"{enc_raw} (raw)", linewidth=0.9, alpha=0.7)
         ax2 = ax.twinx()
-        ax2.plot(t, residual_series[i - 1], color="green", linewidth=0.9, label="Residual")
+        plot_trace(ax2, t, residual_series[i - 1], color="green", linewidth=0.9, label="Residual")
         ax.set_title(f"Joint {i}: encoder/pot with residual")
         ax.set_ylabel("Encoder/POT")
         ax2.set_ylabel("Residual")
@@ -186,9 +157,63 @@ def main() -> None:
         ax.legend(lines_1 + lines_2, labels_1 + labels_2, loc="upper right", fontsize=8)
     axes_overlay[-1].set_xlabel("Time from start")
     fig_overlay.tight_layout()
-    out_overlay_png = csv_path.with_name(f"{csv_path.stem}_encoder_pot_residual_overlay.png")
-    fig_overlay.savefig(out_overlay_png, dpi=200)
+    out_overlay_png = out_prefix.with_name(f"{out_prefix.name}_encoder_pot_residual_overlay.png")
+    save_figure(fig_overlay, out_overlay_png)
     print(f"Saved {out_overlay_png}")
+    return residual_df
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Plot encoder vs pot signals from *_potEncoder.csv")
+    parser.add_argument("csv", type=str, help="Path to *_potEncoder.csv")
+    parser.add_argument(
+        "--residual-kaiser-cutoff",
+        type=float,
+        default=None,
+        help="Apply a Kaiser low-pass FIR filter to residual traces using this cutoff frequency (Hz).",
+    )
+    parser.add_argument(
+        "--kaiser-beta",
+        type=float,
+        default=RESIDUAL_KAISER_BETA,
+        help="Kaiser window beta parameter (higher = stronger stop-band attenuation).",
+    )
+    parser.add_argument(
+        "--kaiser-order",
+        type=int,
+        default=30,
+        help="FIR filter order for residual Kaiser low-pass (numtaps = order + 1).",
+    )
+    parser.add_argument(
+        "--print-filter-delta",
+        action="store_true",
+        help="Print per-joint residual change stats after notch filtering.",
+    )
+    parser.add_argument(
+        "--save-filtered-residual-csv",
+        nargs="?",
+        const="",
+        default=None,
+        help=(
+            "Save plotted residual traces to CSV. "
+            "If a path is provided, write there; otherwise uses "
+            "<input_stem>_encoder_residual_filtered.csv next to input."
+        ),
+    )
+    args = parser.parse_args()
+    if args.kaiser_order < 1:
+        raise ValueError("--kaiser-order must be >= 1.")
+
+    csv_path = Path(args.csv).expanduser().resolve()
+    df = read_table(csv_path, mmap=True)
+    residual_df = plot_encoder_vs_pot(
+        df,
+        csv_path.with_name(csv_path.stem),
+        residual_kaiser_cutoff=args.residual_kaiser_cutoff,
+        kaiser_order=args.kaiser_order,
+        kaiser_beta=args.kaiser_beta,
+        print_filter_delta=args.print_filter_delta,
+    )
     if args.save_filtered_residual_csv is not None:
         if args.save_filtered_residual_csv == "":
             out_res_csv = csv_path.with_name(f"{csv_path.stem}_encoder_residual_filtered.csv")
@@ -1,15 +1,20 @@
 import argparse
+import sys
 from pathlib import Path
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from plotting import plot_trace, pyplot, save_or_show, subplots  # noqa: E402
+from table_io import read_table  # noqa: E402
 
 
 def read_force_csv(csv_path: Path, has_header: bool = True) -> pd.DataFrame:
     if has_header:
-        return pd.read_csv(csv_path)
+        return read_table(csv_path, mmap=True)
 
-    df = pd.read_csv(csv_path, header=None)
+    df = read_table(csv_path, header=False, mmap=True)
     n_cols = df.shape[1]
     columns = ["TIMESTAMP"] + [f"COL_{i}" for i in range(1, n_cols)]
     df.columns = columns
@@ -48,26 +53,23 @@ def plot_fft_columns(df: pd.DataFrame, columns: list[str], out_png: Path = None)
     fs = infer_fs_from_timestamp(df)
     n_plots = len(columns)
 
-    fig, axes = plt.subplots(n_plots, 1, figsize=(10, 3 + 2 * n_plots), sharex=True)
+    fig, axes = subplots(n_plots, 1, figsize=(10, 3 + 2 * n_plots), sharex=True, dpi=300)
     if n_plots == 1:
         axes = [axes]
 
     for ax, col in zip(axes, columns):
         signal = df[col].to_numpy()
         freqs, mag = compute_fft(signal, fs)
-        ax.plot(freqs, mag)
+        plot_trace(ax, freqs, mag)
         ax.set_ylabel(col)
         ax.grid(True, alpha=0.3)
 
     axes[-1].set_xlabel("Frequency (Hz)")
     axes[0].set_title("FFT Magnitude")
-    plt.tight_layout()
+    fig.tight_layout()
 
-    if out_png:
-        plt.savefig(out_png, dpi=300)
+    if save_or_show(fig, out_png):
         print(f"Saved plot to {out_png}")
-    else:
-        plt.show()
 
 
 def main():
@@ -89,6 +91,7 @@ def main():
 
     df = read_force_csv(Path(args.csv), has_header=not args.no_header)
     out_path = Path(args.out) if args.out else None
+    pyplot(interactive=out_path is None)
     if args.columns:
         columns = [c.strip() for c in args.columns.split(",") if c.strip()]
     elif args.col_indices:
@@ -1,12 +1,18 @@
 
 
 import argparse
+import sys
 from pathlib import Path
 from typing import List
 import pandas as pd
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from plotting import plot_trace, pyplot, save_figure, subplots  # noqa: E402
+from table_io import read_table  # noqa: E402
+
 try:
-    import matplotlib.pyplot as plt
+    import matplotlib  # noqa: F401
     _HAVE_PLT = True
 except Exception:
     _HAVE_PLT = False
@@ -24,8 +30,10 @@ TORQUE_COLS_1_TO_3 = [f'TORQUE_FEEDBACK_{i}' for i in range(1, 4)]
 
 
 def read_interpolated_csv(csv_path: Path) -> pd.DataFrame:
-    """Read interpolated_all_joints.csv style file saved without headers."""
-    return pd.read_csv(csv_path, header=None, names=COLUMN_NAMES)
+    """Read interpolated_all_joints.csv style file saved without headers (.dset/.npy are memory-mapped)."""
+    df = read_table(csv_path, header=False, mmap=True).iloc[:, : len(COLUMN_NAMES)]
+    df.columns = COLUMN_NAMES
+    return df
 
 
 def select_measured_torque_1_to_3(df: pd.DataFrame) -> pd.DataFrame:
@@ -57,6 +65,7 @@ def maybe_plot(joined: pd.DataFrame, out_png: Path = None):
         print("matplotlib not available; skipping plot.")
         return
 
+    plt = pyplot(interactive=out_png is None)
     df = joined.reset_index()
     ts = df['TIMESTAMP']
 
@@ -65,18 +74,18 @@ def maybe_plot(joined: pd.DataFrame, out_png: Path = None):
         col_u = f'unfiltered_TORQUE_FEEDBACK_{j}'
         if col_f not in df.columns or col_u not in df.columns:
             continue
-        plt.figure()
-        plt.plot(ts, df[col_f], label='filtered')
-        plt.plot(ts, df[col_u], label='unfiltered')
-        plt.xlabel('TIMESTAMP')
-        plt.ylabel(f'Torque J{j}')
-        plt.title(f'Filtered vs Unfiltered Torque (Joint {j})')
-        plt.legend()
-        plt.tight_layout()
+        fig, ax = subplots(dpi=300)
+        plot_trace(ax, ts, df[col_f], label='filtered')
+        plot_trace(ax, ts, df[col_u], label='unfiltered')
+        ax.set_xlabel('TIMESTAMP')
+        ax.set_ylabel(f'Torque J{j}')
+        ax.set_title(f'Filtered vs Unfiltered Torque (Joint {j})')
+        ax.legend()
+        fig.tight_layout()
         if out_png:
             stem = out_png.stem
             joint_png = out_png.with_name(f"{stem}_J{j}{out_png.suffix}")
-            plt.savefig(joint_png, dpi=300)
+            save_figure(fig, joint_png)
 
     if out_png is None:
         plt.show()
@@ -1,15 +1,20 @@
 import argparse
+import sys
 from pathlib import Path
 import pandas as pd
-import matplotlib.pyplot as plt
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from plotting import plot_trace, pyplot, save_or_show, subplots  # noqa: E402
+from table_io import read_table  # noqa: E402
 
 
 def read_original(csv_path: Path) -> pd.DataFrame:
-    return pd.read_csv(csv_path)
+    return read_table(csv_path, mmap=True)
 
 
 def read_filtered_no_header(csv_path: Path) -> pd.DataFrame:
-    df = pd.read_csv(csv_path, header=None)
+    df = read_table(csv_path, header=False, mmap=True)
     n_cols = df.shape[1]
     columns = ["TIMESTAMP"] + [f"COL_{i}" for i in range(1, n_cols)]
     df.columns = columns
@@ -33,21 +38,14 @@ def plot_overlay(
     ts_orig = original["TIMESTAMP"] if "TIMESTAMP" in original.columns else None
     ts_filt = filtered["TIMESTAMP"] if "TIMESTAMP" in filtered.columns else None
 
-    fig, axes = plt.subplots(3, 1, figsize=(10, 7), sharex=True)
+    fig, axes = subplots(3, 1, figsize=(10, 7), sharex=True, dpi=300)
     axis_labels = ["X", "Y", "Z"]
 
     for i, ax in enumerate(axes):
         oc = orig_cols[i]
         fc = filt_cols[i]
-        if ts_orig is not None:
-            ax.plot(ts_orig, original[oc], label="Original", linewidth=0.8)
-        else:
-            ax.plot(original[oc], label="Original", linewidth=0.8)
-
-        if ts_filt is not None:
-            ax.plot(ts_filt, filtered[fc], label="Filtered", linewidth=0.8)
-        else:
-            ax.plot(filtered[fc], label="Filtered", linewidth=0.8)
+        plot_trace(ax, ts_orig, original[oc], label="Original", linewidth=0.8)
+        plot_trace(ax, ts_filt, filtered[fc], label="Filtered", linewidth=0.8)
 
         ax.set_ylabel(f"Force {axis_labels[i]}")
         ax.grid(True, alpha=0.3)
@@ -55,13 +53,10 @@ def plot_overlay(
     axes[-1].set_xlabel("Timestamp")
     axes[0].set_title("Overlay: Original vs Filtered Forces")
     axes[0].legend()
-    plt.tight_layout()
+    fig.tight_layout()
 
-    if out_png:
-        plt.savefig(out_png, dpi=300)
+    if save_or_show(fig, out_png):
         print(f"Saved plot to {out_png}")
-    else:
-        plt.show()
 
 
 def main():
@@ -76,6 +71,7 @@ def main():
     original = read_original(Path(args.original))
     filtered = read_filtered_no_header(Path(args.filtered))
     out_path = Path(args.out) if args.out else None
+    pyplot(interactive=out_path is None)
     plot_overlay(original, filtered, out_path)
 
 
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""Render every figure for one capture, loading each input table once.
+
+The single-figure scripts in plot/ each parse their inputs again. This batch
+entry point reads each table once (binary .dset/.npy tables are memory-mapped),
+then hands the loaded frames to those scripts' plotting functions:
+
+    joints            <out>/joint<j>_pos_vel_torque.png for each --joint
+    pot-encoder       <out>/<stem>_encoder_vs_pot.png, _encoder_residual.png,
+                      _encoder_pot_residual_overlay.png
+    alignment debug   <out>/<stem>_overlay.png (with force overlays when a force table is given)
+    force             <out>/<stem>_force_123.png and, with --fft, <out>/<stem>_force_fft.png
+
+Figures are rendered headless with the Agg backend, and traces are min/max-
+decimated to the figure's pixel width (see plotting.py).
+
+With a capture directory, inputs that are not given explicitly are looked up
+there: joints/interpolated_all_joints.* (or interpolated_all_joints.*),
+*_potEncoder.* and *alignment*debug*.
+
+Usage:
+    python3 plot/plot_capture.py preprocessed/train/capture_03 --out-dir figures/capture_03
+    python3 plot/plot_capture.py --joints joints.dset --pot-encoder run_potEncoder.csv --force force.csv --fft
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from instrumentation import stage  # noqa: E402
+from plotting import pyplot  # noqa: E402
+from table_io import TABLE_FORMATS, read_table  # noqa: E402
+
+from aligned_residual_overlay import _load_force_csv, plot_overlay_frame  # noqa: E402
+from encoder_vs_pot import RESIDUAL_KAISER_BETA, plot_encoder_vs_pot  # noqa: E402
+from fft_force_123 import plot_fft_columns  # noqa: E402
+from plot_force_123 import plot_force_123  # noqa: E402
+from pos_vel_torque import plot_position_velocity_torque, read_interpolated_csv  # noqa: E402
+
+FORCE_COLUMNS = ["FORCE_1", "FORCE_2", "FORCE_3"]
+
+
+def _find(capture: Path | None, patterns: list[str]) -> Path | None:
+    """First table in capture matching one of patterns (in pattern order)."""
+    if capture is None:
+        return None
+    for pattern in patterns:
+        matches = sorted(p for p in capture.glob(pattern) if p.is_file() and p.suffix.lower() in TABLE_FORMATS)
+        if matches:
+            return matches[0]
+    return None
+
+
+def plot_capture(
+    out_dir: Path,
+    joints: Path | None = None,
+    pot_encoder: Path | None = None,
+    alignment_debug: Path | None = None,
+    force: Path | None = None,
+    force_has_header: bool = True,
+    joint_indices: list[int] = (1, 2, 3, 4, 5, 6),
+    fft: bool = False,
+    residual_kaiser_cutoff: float | None = None,
+    kaiser_order: int = 30,
+    kaiser_beta: float = RESIDUAL_KAISER_BETA,
+) -> list[Path]:
+    """Render all figures the given inputs support into out_dir; returns the saved PNG paths."""
+    pyplot()
+    out_dir.mkdir(parents=True, exist_ok=True)
+    saved: list[Path] = []
+
+    force_df = None
+    if force is not None:
+        with stage("plot.load_force"):
+            force_df = _load_force_csv(force, force_has_header, 0, (1, 2, 3))
+
+    if joints is not None:
+        with stage("plot.load_joints"):
+            joints_df = read_interpolated_csv(joints)
+        with stage("plot.joints", rows_in=len(joints_df)):
+            for j in joint_indices:
+                out_png = out_dir / f"joint{j}_pos_vel_torque.png"
+                plot_position_velocity_torque(joints_df, out_png, joint=j)
+                saved.append(out_png)
+
+    if pot_encoder is not None:
+        with stage("plot.load_pot_encoder"):
+            pot_df = read_table(pot_encoder, mmap=True)
+        with stage("plot.pot_encoder", rows_in=len(pot_df)):
+            prefix = out_dir / Path(pot_encoder).stem
+            plot_encoder_vs_pot(
+                pot_df,
+                prefix,
+                residual_kaiser_cutoff=residual_kaiser_cutoff,
+                kaiser_order=kaiser_order,
+                kaiser_beta=kaiser_beta,
+            )
+            saved += [
+                prefix.with_name(f"{prefix.name}_{name}.png")
+                for name in ("encoder_vs_pot", "encoder_residual", "encoder_pot_residual_overlay")
+            ]
+
+    if alignment_debug is not None:
+        with stage("plot.load_alignment_debug"):
+            debug_df = read_table(alignment_debug, mmap=True)
+        with stage("plot.alignment_debug", rows_in=len(debug_df)):
+            out_png = plot_overlay_frame(debug_df, out_dir / f"{Path(alignment_debug).stem}_overlay.png", force_df)
+            print(f"Saved {out_png}")
+            saved.append(out_png)
+
+    if force_df is not None and all(col in force_df.columns for col in FORCE_COLUMNS):
+        with stage("plot.force", rows_in=len(force_df)):
+            out_png = out_dir / f"{Path(force).stem}_force_123.png"
+            plot_force_123(force_df, out_png)
+            saved.append(out_png)
+            if fft:
+                out_png = out_dir / f"{Path(force).stem}_force_fft.png"
+                plot_fft_columns(force_df, FORCE_COLUMNS, out_png)
+                saved.append(out_png)
+    return saved
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Render all figures for one capture from tables loaded once.")
+    parser.add_argument("capture", type=Path, nargs="?", default=None, help="Capture directory to look up inputs in.")
+    parser.add_argument("--joints", type=Path, default=None, help="interpolated_all_joints table (headerless).")
+    parser.add_argument("--pot-encoder", type=Path, default=None, help="*_potEncoder table from pot_to_encoder.py.")
+    parser.add_argument("--alignment-debug", type=Path, default=None, help="append_encoder_residuals alignment debug table.")
+    parser.add_argument("--force", type=Path, default=None, help="Force table with TIMESTAMP and FORCE_1/2/3 columns.")
+    parser.add_argument(
+        "--force-no-header",
+        action="store_true",
+        help="Interpret --force as a no-header table: column 0 is time, columns 1-3 are forces.",
+    )
+    parser.add_argument("--joint", type=int, nargs="+", default=[1, 2, 3, 4, 5, 6], help="Joints to plot from --joints.")
+    parser.add_argument("--fft", action="store_true", help="Also plot the FFT magnitude of FORCE_1/2/3.")
+    parser.add_argument("--residual-kaiser-cutoff", type=float, default=None, help="Kaiser low-pass for pot residuals (Hz).")
+    parser.add_argument("--kaiser-order", type=int, default=30)
+    parser.add_argument("--kaiser-beta", type=float, default=RESIDUAL_KAISER_BETA)
+    parser.add_argument("--out-dir", type=Path, default=None, help="Output directory (default: <capture>/plots or ./plots).")
+    args = parser.parse_args()
+
+    capture = args.capture
+    if capture is not None and not capture.is_dir():
+        raise NotADirectoryError(f"Capture directory not found: {capture}")
+    joints = args.joints or _find(capture, ["joints/interpolated_all_joints.*", "interpolated_all_joints.*"])
+    pot_encoder = args.pot_encoder or _find(capture, ["*_potEncoder.*", "*/*_potEncoder.*"])
+    alignment_debug = args.alignment_debug or _find(capture, ["*alignment*debug*", "*/*alignment*debug*"])
+    if not any((joints, pot_encoder, alignment_debug, args.force)):
+        raise SystemExit("No inputs found; give a capture directory or --joints/--pot-encoder/--alignment-debug/--force.")
+    out_dir = args.out_dir or ((capture if capture is not None else Path(".")) / "plots")
+
+    saved = plot_capture(
+        out_dir,
+        joints=joints,
+        pot_encoder=pot_encoder,
+        alignment_debug=alignment_debug,
+        force=args.force,
+        force_has_header=not args.force_no_header,
+        joint_indices=args.joint,
+        fft=args.fft,
+        residual_kaiser_cutoff=args.residual_kaiser_cutoff,
+        kaiser_order=args.kaiser_order,
+        kaiser_beta=args.kaiser_beta,
+    )
+    print(f"Saved {len(saved)} figures to {out_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,17 @@
 import argparse
+import sys
 from pathlib import Path
 import pandas as pd
-import matplotlib.pyplot as plt
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from plotting import plot_trace, pyplot, save_or_show, subplots  # noqa: E402
+from table_io import read_table  # noqa: E402
 
 
 def read_force_csv(csv_path: Path, has_header: bool = True) -> pd.DataFrame:
     """Read CSV and return dataframe with FORCE_1/2/3 columns present."""
-    if has_header:
-        df = pd.read_csv(csv_path)
-    else:
-        df = pd.read_csv(csv_path, header=None)
-    return df
+    return read_table(csv_path, header=has_header, mmap=True)
 
 
 def plot_force_123(df: pd.DataFrame, out_png: Path = None):
@@ -20,27 +21,21 @@ def plot_force_123(df: pd.DataFrame, out_png: Path = None):
 
     ts = df["TIMESTAMP"] if "TIMESTAMP" in df.columns else None
 
-    fig, axes = plt.subplots(3, 1, figsize=(10, 7), sharex=True)
+    fig, axes = subplots(3, 1, figsize=(10, 7), sharex=True, dpi=300)
     labels = ["FORCE_1", "FORCE_2", "FORCE_3"]
     x_label = "Timestamp" if ts is not None else "Sample Index"
 
     for ax, col in zip(axes, labels):
-        if ts is not None:
-            ax.plot(ts, df[col])
-        else:
-            ax.plot(df[col])
+        plot_trace(ax, ts, df[col])
         ax.set_ylabel(col)
         ax.grid(True, alpha=0.3)
 
     axes[-1].set_xlabel(x_label)
     axes[0].set_title("Forces by Axis")
-    plt.tight_layout()
+    fig.tight_layout()
 
-    if out_png:
-        plt.savefig(out_png, dpi=300)
+    if save_or_show(fig, out_png):
         print(f"Saved plot to {out_png}")
-    else:
-        plt.show()
 
 
 def main():
@@ -52,6 +47,7 @@ def main():
 
     df = read_force_csv(Path(args.csv), has_header=not args.no_header)
     out_path = Path(args.out) if args.out else None
+    pyplot(interactive=out_path is None)
     plot_force_123(df, out_path)
 
 
@@ -1,20 +1,26 @@
 
 
-import pandas as pd
-import matplotlib.pyplot as plt
 import argparse
+import sys
+from pathlib import Path
 
-def plot_joint_data(file_path: str, joint_idx: int):
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from plotting import plot_trace, pyplot, save_or_show, subplots  # noqa: E402
+from table_io import read_table  # noqa: E402
+
+def plot_joint_data(file_path: str, joint_idx: int, out_png: str = None):
     """
     Plot joint position, velocity, and torque for a specified joint index using subplots.
     
     Args:
-        file_path: Path to the CSV file. 
+        file_path: Path to the CSV (or .dset/.npy) file.
                    Columns = timestamp | 6 joint pos | 6 joint vel | 6 joint torques
         joint_idx: Joint index to plot (1–6).
+        out_png: Save the figure here instead of showing it.
     """
-    # Load data
-    df = pd.read_csv(file_path, header=None)
+    # Load data (binary tables are memory-mapped rather than parsed)
+    df = read_table(file_path, header=False, mmap=True)
     
     timestamps = df.iloc[:, 0].values
     positions = df.iloc[:, 1:7].values
@@ -24,26 +30,29 @@ def plot_joint_data(file_path: str, joint_idx: int):
     j = joint_idx - 1  # convert to 0-based index
 
     # Create subplots
-    fig, axs = plt.subplots(3, 1, figsize=(8, 8), sharex=True)
+    fig, axs = subplots(3, 1, figsize=(8, 8), sharex=True)
 
-    axs[0].plot(timestamps, positions[:, j])
+    plot_trace(axs[0], timestamps, positions[:, j])
     axs[0].set_ylabel("Position")
     axs[0].set_title(f"Joint {joint_idx}")
 
-    axs[1].plot(timestamps, velocities[:, j])
+    plot_trace(axs[1], timestamps, velocities[:, j])
     axs[1].set_ylabel("Velocity")
 
-    axs[2].plot(timestamps, torques[:, j])
+    plot_trace(axs[2], timestamps, torques[:, j])
     axs[2].set_ylabel("Torque")
     axs[2].set_xlabel("Time (s)")
 
-    plt.tight_layout()
-    plt.show()
+    fig.tight_layout()
+    if save_or_show(fig, out_png):
+        print(f"Saved plot to {out_png}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Plot joint position, velocity, and torque for a specified joint index.")
     parser.add_argument("file_path", type=str, help="Path to the CSV file.")
     parser.add_argument("joint_idx", type=int, help="Joint index to plot (1-6).")
+    parser.add_argument("--out", type=str, default=None, help="Output PNG file name. If not provided, show plot interactively.")
     args = parser.parse_args()
 
-    plot_joint_data(args.file_path, args.joint_idx)
\ No newline at end of file
+    pyplot(interactive=args.out is None)
+    plot_joint_data(args.file_path, args.joint_idx, args.out)
\ No newline at end of file
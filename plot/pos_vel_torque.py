@@ -1,9 +1,14 @@
 import argparse
+import sys
 from pathlib import Path
 import pandas as pd
-import matplotlib.pyplot as plt
 from typing import List
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from plotting import plot_trace, pyplot, save_or_show, subplots  # noqa: E402
+from table_io import read_table  # noqa: E402
+
 # Expected column order for interpolated_all_joints.csv
 COLUMN_NAMES: List[str] = (
     ['TIMESTAMP'] +
@@ -14,8 +19,10 @@ COLUMN_NAMES: List[str] = (
 
 
 def read_interpolated_csv(csv_path: Path) -> pd.DataFrame:
-    """Read interpolated_all_joints.csv style file saved without headers."""
-    return pd.read_csv(csv_path, header=None, names=COLUMN_NAMES)
+    """Read interpolated_all_joints.csv style file saved without headers (.dset/.npy are memory-mapped)."""
+    df = read_table(csv_path, header=False, mmap=True).iloc[:, : len(COLUMN_NAMES)]
+    df.columns = COLUMN_NAMES
+    return df
 
 
 def plot_position_velocity_torque(df: pd.DataFrame, out_png: Path = None, joint: int = 1):
@@ -25,26 +32,22 @@ def plot_position_velocity_torque(df: pd.DataFrame, out_png: Path = None, joint:
     vel_col = f'VELOCITY_FEEDBACK_{joint}'
     tor_col = f'TORQUE_FEEDBACK_{joint}'
 
-    fig, (ax1, ax2, ax3) = plt.subplots(3, 1, figsize=(10, 6), sharex=True)
-    ax1.plot(ts, df[pos_col])
+    fig, (ax1, ax2, ax3) = subplots(3, 1, figsize=(10, 6), sharex=True, dpi=300)
+    plot_trace(ax1, ts, df[pos_col])
     ax1.set_ylabel("Position")
     ax1.set_title(f"Joint {joint} Position, Velocity, Torque")
 
-    ax2.plot(ts, df[vel_col])
+    plot_trace(ax2, ts, df[vel_col])
     ax2.set_ylabel("Velocity")
 
-    ax3.plot(ts, df[tor_col])
+    plot_trace(ax3, ts, df[tor_col])
     ax3.set_ylabel("Torque")
     ax3.set_xlabel("Timestamp")
 
 
-    plt.tight_layout()
-    # plt.show()
-    if out_png:
-        plt.savefig(out_png, dpi=300)
+    fig.tight_layout()
+    if save_or_show(fig, out_png):
         print(f"Saved plot to {out_png}")
-    else:
-        plt.show()
 
 
 def main():
@@ -56,6 +59,7 @@ def main():
 
     df = read_interpolated_csv(Path(args.csv))
     out_path = Path(args.out) if args.out else None
+    pyplot(interactive=out_path is None)
     plot_position_velocity_torque(df, out_path, joint=args.joint)
 
 
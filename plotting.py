@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""Headless, decimating plotting helpers shared by the plot/ scripts.
+
+A 10 kHz capture puts millions of points into every trace, yet a saved figure is
+only a few thousand pixels wide. plot_trace() reduces each trace to its pixel
+budget before it reaches matplotlib: the samples are split into one bucket per
+pixel column of the figure, and each bucket keeps its minimum and maximum
+(in their original order). Peaks, spikes and the envelope of noise stay exactly
+where the full trace would draw them, but Agg rasterizes ~2 points per pixel
+column instead of ~1000.
+
+pyplot() imports matplotlib on first use and selects the Agg backend, so the
+scripts run without a display. A figure that is shown interactively
+(pyplot(interactive=True) with a display) keeps every sample, so zooming still
+shows the raw data.
+
+Buckets are equal runs of samples, which matches equal widths of time for the
+uniformly sampled captures these scripts plot.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+
+DEFAULT_DPI = 200
+
+_state = {"interactive": False}
+
+
+def has_display() -> bool:
+    return sys.platform in ("darwin", "win32") or bool(os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+
+
+def pyplot(interactive: bool = False):
+    """
+    matplotlib.pyplot, imported lazily.
+
+    The Agg backend is selected unless interactive is set and a display is available
+    (an explicit MPLBACKEND is always respected).
+    """
+    import matplotlib
+
+    _state["interactive"] = interactive and has_display()
+    if not _state["interactive"] and "MPLBACKEND" not in os.environ:
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    return plt
+
+
+def subplots(*args, dpi: float = DEFAULT_DPI, **kwargs):
+    """pyplot().subplots() at the dpi the figure will be saved with, which sets its pixel budget."""
+    plt = pyplot(_state["interactive"])
+    return plt.subplots(*args, dpi=None if _state["interactive"] else dpi, **kwargs)
+
+
+def pixel_columns(fig) -> int:
+    """Width of fig in pixels at its dpi; the bucket count plot_trace() decimates to."""
+    return max(1, math.ceil(fig.get_figwidth() * fig.dpi))
+
+
+def minmax_decimate(x, y, n_buckets: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Reduce (x, y) to the minimum and maximum of each of n_buckets equal runs of samples.
+
+    The first and last samples are always kept, so axis limits match the full trace.
+    NaN samples are skipped for the extremes, but each bucket with NaNs keeps its first
+    NaN so gaps in the line survive. Traces with at most 2 * n_buckets samples are
+    returned unchanged.
+    """
+    y = np.asarray(y, dtype=float)
+    x = np.arange(len(y), dtype=float) if x is None else np.asarray(x, dtype=float)
+    if len(x) != len(y):
+        raise ValueError(f"x and y lengths differ: {len(x)} vs {len(y)}")
+    n = len(y)
+    if n_buckets < 1:
+        raise ValueError(f"n_buckets must be >= 1, got {n_buckets}")
+    if n <= 2 * n_buckets:
+        return x, y
+
+    size = math.ceil(n / n_buckets)
+    n_full = n // size
+    starts = np.arange(n_full) * size
+    body = y[: n_full * size].reshape(n_full, size)
+    nan = np.isnan(body)
+    picks = [[0, n - 1]]
+    if nan.any():
+        lo = np.where(nan, np.inf, body).argmin(axis=1)
+        hi = np.where(nan, -np.inf, body).argmax(axis=1)
+        # The first NaN of a bucket breaks the line there, as it would in the full trace.
+        gaps = nan.any(axis=1)
+        picks.append(nan[gaps].argmax(axis=1) + starts[gaps])
+    else:
+        lo = body.argmin(axis=1)
+        hi = body.argmax(axis=1)
+    picks += [lo + starts, hi + starts]
+    tail_start = n_full * size
+    if tail_start < n:
+        tail = y[tail_start:]
+        tail_nan = np.isnan(tail)
+        if not tail_nan.all():
+            picks.append(np.array([np.nanargmin(tail), np.nanargmax(tail)]) + tail_start)
+        if tail_nan.any():
+            picks.append([tail_nan.argmax() + tail_start])
+    idx = np.unique(np.concatenate(picks))
+    return x[idx], y[idx]
+
+
+def plot_trace(ax, x, y, **kwargs):
+    """
+    ax.plot(x, y, **kwargs) with the trace decimated to the figure's pixel budget.
+
+    x may be None for a sample-index axis. Interactive figures are plotted in full.
+    """
+    y = np.asarray(y, dtype=float)
+    x = np.arange(len(y), dtype=float) if x is None else np.asarray(x, dtype=float)
+    if not _state["interactive"]:
+        x, y = minmax_decimate(x, y, pixel_columns(ax.figure))
+    return ax.plot(x, y, **kwargs)
+
+
+def save_figure(fig, out_png: str | Path, dpi: float | None = None) -> Path:
+    """Save fig (at its own dpi unless given) and close it, freeing its memory in batch runs."""
+    out_png = Path(out_png)
+    out_png.parent.mkdir(parents=True, exist_ok=True)
+    fig.savefig(out_png, dpi=dpi if dpi is not None else "figure")
+    pyplot(_state["interactive"]).close(fig)
+    return out_png
+
+
+def save_or_show(fig, out_png: str | Path | None = None, dpi: float | None = None) -> Path | None:
+    """save_figure() when out_png is given, otherwise show fig."""
+    if out_png:
+        return save_figure(fig, out_png, dpi)
+    pyplot(_state["interactive"]).show()
+    return None
@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""Pot-to-encoder calibration, fitted for all joints at once and saved for reuse.
+
+Each joint maps a signed pot reading (POT_3, POT_4 and inverted POT_5) onto its
+encoder position (ENCODER_POS_1..3). The columns are stacked into (rows, joints)
+arrays. NaN rows are masked per joint, and every joint is solved together:
+
+    lstsq   ordinary least squares, the closed-form solution of the stacked
+            block-diagonal problem (identical to fitting each joint on its own)
+    huber   iteratively reweighted least squares with Huber weights (k = 1.345 on
+            a MAD-based residual scale), for pot spikes and encoder glitches
+    ransac  consensus line from random sample pairs; the final fit uses its inliers
+
+segments > 1 replaces each line with a continuous piecewise-linear map whose
+knots sit at quantiles of the pot range; this absorbs pot nonlinearity near the
+ends of travel. It combines with every method.
+
+A calibration saved with save_calibration() is a small JSON file.
+pot_to_encoder.py and extract_encoder_info.py take it with --calibration: the
+first run fits and writes the file, and later runs load it instead of refitting.
+
+Usage:
+    python3 pot_calibration.py fit zynq_data.csv calibration.json [--method huber] [--segments 4]
+    python3 pot_calibration.py show calibration.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+POT_ENCODER_PAIRS = (
+    ("POT_3", "ENCODER_POS_1", 1.0),
+    ("POT_4", "ENCODER_POS_2", 1.0),
+    ("POT_5", "ENCODER_POS_3", -1.0),
+)
+FIT_METHODS = ("lstsq", "huber", "ransac")
+CALIBRATION_VERSION = 1
+HUBER_K = 1.345
+MAD_SCALE = 1.4826  # MAD -> standard deviation for Gaussian residuals
+HUBER_MAX_ITER = 50
+RANSAC_TRIALS = 200
+RANSAC_SCORE_ROWS = 20_000
+
+
+@dataclass
+class PotCalibration:
+    """Per-joint pot -> encoder maps; knots/values are set only for piecewise maps."""
+
+    pots: list[str]
+    encoders: list[str]
+    signs: np.ndarray
+    slopes: np.ndarray
+    intercepts: np.ndarray
+    method: str = "lstsq"
+    knots: np.ndarray | None = None
+    values: np.ndarray | None = None
+    rms: np.ndarray | None = None
+    rows: np.ndarray | None = None
+
+    @property
+    def segments(self) -> int:
+        return 1 if self.knots is None else self.knots.shape[1] - 1
+
+    def apply(self, pots: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+        """
+        Mapped encoder positions for raw (unsigned) pot readings of shape (rows, joints).
+
+        A linear map is one multiply-add pass with the sign folded into the gain; out may be
+        pots itself, which avoids any temporary.
+        """
+        pots = np.asarray(pots, dtype=float)
+        if self.knots is None:
+            out = np.multiply(pots, self.signs * self.slopes, out=out)
+            out += self.intercepts
+            return out
+        signed = pots * self.signs
+        out = np.empty_like(signed) if out is None else out
+        for j in range(signed.shape[1]):
+            seg, frac = _segment_positions(signed[:, j], self.knots[j])
+            out[:, j] = self.values[j, seg] + frac * (self.values[j, seg + 1] - self.values[j, seg])
+        return out
+
+    def apply_frame(self, df: pd.DataFrame) -> np.ndarray:
+        pots = numeric_columns(df, self.pots)
+        return self.apply(pots, out=pots)
+
+    def to_dict(self) -> dict:
+        joints = []
+        for j, (pot, enc) in enumerate(zip(self.pots, self.encoders)):
+            joint = {
+                "pot": pot,
+                "encoder": enc,
+                "sign": float(self.signs[j]),
+                "slope": float(self.slopes[j]),
+                "intercept": float(self.intercepts[j]),
+            }
+            if self.knots is not None:
+                joint["knots"] = self.knots[j].tolist()
+                joint["values"] = self.values[j].tolist()
+            if self.rms is not None:
+                joint["rms"] = float(self.rms[j])
+            if self.rows is not None:
+                joint["rows"] = int(self.rows[j])
+            joints.append(joint)
+        return {"version": CALIBRATION_VERSION, "method": self.method, "segments": self.segments, "joints": joints}
+
+    @classmethod
+    def from_dict(cls, meta: dict) -> PotCalibration:
+        if meta.get("version") != CALIBRATION_VERSION:
+            raise ValueError(f"Unsupported calibration version {meta.get('version')}")
+        joints = meta["joints"]
+        piecewise = "knots" in joints[0]
+        return cls(
+            pots=[j["pot"] for j in joints],
+            encoders=[j["encoder"] for j in joints],
+            signs=np.array([j["sign"] for j in joints]),
+            slopes=np.array([j["slope"] for j in joints]),
+            intercepts=np.array([j["intercept"] for j in joints]),
+            method=meta.get("method", "lstsq"),
+            knots=np.array([j["knots"] for j in joints]) if piecewise else None,
+            values=np.array([j["values"] for j in joints]) if piecewise else None,
+            rms=np.array([j["rms"] for j in joints]) if "rms" in joints[0] else None,
+            rows=np.array([j["rows"] for j in joints]) if "rows" in joints[0] else None,
+        )
+
+
+def numeric_columns(df: pd.DataFrame, columns: list[str]) -> np.ndarray:
+    """columns of df as one float (rows, len(columns)) array; non-numeric entries become NaN."""
+    block = df[columns]
+    if not all(pd.api.types.is_numeric_dtype(dtype) for dtype in block.dtypes):
+        block = block.apply(pd.to_numeric, errors="coerce")
+    return block.to_numpy(dtype=float, copy=True)
+
+
+def _segment_positions(x: np.ndarray, knots: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Segment index and position within it for each x; the end segments extend linearly."""
+    seg = np.clip(np.searchsorted(knots, x, side="right") - 1, 0, len(knots) - 2)
+    width = knots[seg + 1] - knots[seg]
+    frac = np.divide(x - knots[seg], width, out=np.zeros_like(x), where=width > 0)
+    return seg, frac
+
+
+def _weighted_linear(x: np.ndarray, y: np.ndarray, w: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Weighted least-squares line per column; w is zero on masked rows. x and y hold no NaN where w > 0."""
+    sw = w.sum(axis=0)
+    safe = np.where(sw > 0, sw, 1.0)
+    x_mean = np.einsum("ij,ij->j", w, x) / safe
+    y_mean = np.einsum("ij,ij->j", w, y) / safe
+    dx = x - x_mean
+    denom = np.einsum("ij,ij,ij->j", w, dx, dx)
+    cov = np.einsum("ij,ij,ij->j", w, dx, y - y_mean)
+    n_rows = np.count_nonzero(w, axis=0)
+    flat = denom <= np.finfo(float).eps
+    slopes = np.where(flat, 1.0, cov / np.where(flat, 1.0, denom))
+    intercepts = np.where(flat, y_mean - x_mean, y_mean - slopes * x_mean)
+    # Too few rows to fit: identity map, as the per-joint fit did.
+    few = n_rows < 2
+    return np.where(few, 1.0, slopes), np.where(few, 0.0, intercepts)
+
+
+def _weighted_piecewise(x: np.ndarray, y: np.ndarray, w: np.ndarray, knots: np.ndarray) -> np.ndarray:
+    """Knot values of the weighted least-squares continuous piecewise-linear map per column."""
+    n_joints, n_knots = knots.shape
+    normal = np.zeros((n_joints, n_knots, n_knots))
+    rhs = np.zeros((n_joints, n_knots))
+    for j in range(n_joints):
+        seg, frac = _segment_positions(x[:, j], knots[j])
+        a, b = 1.0 - frac, frac
+        wj, yj = w[:, j], np.where(w[:, j] > 0, y[:, j], 0.0)
+        diag = np.bincount(seg, wj * a * a, n_knots) + np.bincount(seg + 1, wj * b * b, n_knots)
+        off = np.bincount(seg, wj * a * b, n_knots - 1)
+        normal[j] = np.diag(diag) + np.diag(off, 1) + np.diag(off, -1)
+        rhs[j] = np.bincount(seg, wj * a * yj, n_knots) + np.bincount(seg + 1, wj * b * yj, n_knots)
+    # A light curvature penalty keeps knots of empty segments on the neighbouring line.
+    second_diff = np.diff(np.eye(n_knots), 2, axis=0)
+    ridge = 1e-9 * np.maximum(w.sum(axis=0), 1.0)
+    normal += ridge[:, None, None] * (second_diff.T @ second_diff)
+    return np.linalg.solve(normal, rhs[..., None])[..., 0]
+
+
+def _quantile_knots(x: np.ndarray, valid: np.ndarray, segments: int) -> np.ndarray:
+    knots = np.empty((x.shape[1], segments + 1))
+    for j in range(x.shape[1]):
+        xj = x[valid[:, j], j]
+        if len(xj) < 2 or xj.max() <= xj.min():
+            raise ValueError(f"Cannot fit a {segments}-segment map: joint {j + 1} pot range is empty")
+        knots[j] = np.quantile(xj, np.linspace(0.0, 1.0, segments + 1))
+        if np.any(np.diff(knots[j]) <= 0):
+            knots[j] = np.linspace(xj.min(), xj.max(), segments + 1)
+    return knots
+
+
+def _fit(x, y, w, knots):
+    """(slopes, intercepts, knot values or None) of the weighted fit, and its residuals."""
+    slopes, intercepts = _weighted_linear(x, y, w)
+    if knots is None:
+        return slopes, intercepts, None, y - (x * slopes + intercepts)
+    values = _weighted_piecewise(x, y, w, knots)
+    pred = np.empty_like(x)
+    for j in range(x.shape[1]):
+        seg, frac = _segment_positions(x[:, j], knots[j])
+        pred[:, j] = values[j, seg] + frac * (values[j, seg + 1] - values[j, seg])
+    return slopes, intercepts, values, y - pred
+
+
+def _robust_scale(residual: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    scale = MAD_SCALE * np.nanmedian(np.where(valid, np.abs(residual), np.nan), axis=0)
+    return np.where(np.isfinite(scale) & (scale > 0), scale, np.finfo(float).eps)
+
+
+def _ransac_inliers(x, y, valid, trials, threshold, seed) -> np.ndarray:
+    """Inlier mask of the best two-point line per joint, scored on a row subsample."""
+    rng = np.random.default_rng(seed)
+    inliers = np.zeros_like(valid)
+    for j in range(x.shape[1]):
+        rows = np.flatnonzero(valid[:, j])
+        if len(rows) < 2:
+            inliers[:, j] = valid[:, j]
+            continue
+        pairs = rows[rng.integers(0, len(rows), size=(trials, 2))]
+        x0, x1 = x[pairs[:, 0], j], x[pairs[:, 1], j]
+        y0, y1 = y[pairs[:, 0], j], y[pairs[:, 1], j]
+        ok = x1 != x0
+        slope = np.where(ok, (y1 - y0) / np.where(ok, x1 - x0, 1.0), 0.0)
+        intercept = y0 - slope * x0
+        score_rows = rows if len(rows) <= RANSAC_SCORE_ROWS else rng.choice(rows, RANSAC_SCORE_ROWS, replace=False)
+        resid = np.abs(y[score_rows, j, None] - (x[score_rows, j, None] * slope + intercept))
+        counts = np.where(ok, (resid < threshold[j]).sum(axis=0), -1)
+        best = int(np.argmax(counts))
+        inliers[:, j] = valid[:, j] & (np.abs(y[:, j] - (x[:, j] * slope[best] + intercept[best])) < threshold[j])
+    return inliers
+
+
+def fit_calibration(
+    pots: np.ndarray,
+    encoders: np.ndarray,
+    signs=None,
+    method: str = "lstsq",
+    segments: int = 1,
+    pot_cols: list[str] | None = None,
+    encoder_cols: list[str] | None = None,
+    huber_k: float = HUBER_K,
+    ransac_trials: int = RANSAC_TRIALS,
+    ransac_threshold: float | None = None,
+    seed: int = 0,
+) -> PotCalibration:
+    """
+    Fit every joint's pot -> encoder map in one stacked solve.
+
+    Parameters:
+        pots, encoders (np.ndarray): (rows, joints) raw pot readings and encoder positions; NaN rows
+            are ignored per joint.
+        signs (array-like | None): Per-joint pot sign (default: POT_ENCODER_PAIRS).
+        method (str): "lstsq", "huber" or "ransac".
+        segments (int): 1 for a line, > 1 for a continuous piecewise-linear map.
+        ransac_threshold (float | None): Inlier distance; defaults to 3 x the MAD scale of the
+            least-squares residual.
+
+    Returns:
+        PotCalibration
+    """
+    if method not in FIT_METHODS:
+        raise ValueError(f"Unknown calibration method: {method}. Expected one of {FIT_METHODS}")
+    if segments < 1:
+        raise ValueError(f"segments must be >= 1, got {segments}")
+    pots = np.asarray(pots, dtype=float)
+    encoders = np.asarray(encoders, dtype=float)
+    n_joints = pots.shape[1]
+    signs = np.array([s for _, _, s in POT_ENCODER_PAIRS] if signs is None else signs, dtype=float)
+    pot_cols = pot_cols or [p for p, _, _ in POT_ENCODER_PAIRS][:n_joints]
+    encoder_cols = encoder_cols or [e for _, e, _ in POT_ENCODER_PAIRS][:n_joints]
+
+    x = pots * signs
+    valid = np.isfinite(x) & np.isfinite(encoders)
+    x = np.where(valid, x, 0.0)
+    y = np.where(valid, encoders, 0.0)
+    w = valid.astype(float)
+    knots = _quantile_knots(x, valid, segments) if segments > 1 else None
+
+    slopes, intercepts, values, resid = _fit(x, y, w, knots)
+    if method == "huber":
+        for _ in range(HUBER_MAX_ITER):
+            scale = _robust_scale(resid, valid)
+            abs_resid = np.abs(resid)
+            w = np.where(valid, np.minimum(1.0, huber_k * scale / np.maximum(abs_resid, np.finfo(float).tiny)), 0.0)
+            prev = (slopes, intercepts) if values is None else (values,)
+            slopes, intercepts, values, resid = _fit(x, y, w, knots)
+            current = (slopes, intercepts) if values is None else (values,)
+            if all(np.allclose(a, b, rtol=1e-10, atol=1e-12) for a, b in zip(prev, current)):
+                break
+    elif method == "ransac":
+        threshold = 3.0 * _robust_scale(resid, valid) if ransac_threshold is None else np.full(n_joints, ransac_threshold)
+        w = _ransac_inliers(x, y, valid, ransac_trials, threshold, seed).astype(float)
+        slopes, intercepts, values, resid = _fit(x, y, w, knots)
+
+    rows = valid.sum(axis=0)
+    rms = np.sqrt(np.where(valid, resid**2, 0.0).sum(axis=0) / np.maximum(rows, 1))
+    return PotCalibration(
+        pots=list(pot_cols),
+        encoders=list(encoder_cols),
+        signs=signs,
+        slopes=slopes,
+        intercepts=intercepts,
+        method=method,
+        knots=knots,
+        values=values,
+        rms=rms,
+        rows=rows,
+    )
+
+
+def calibrate_frame(df: pd.DataFrame, fit_encoder_cols: list[str] | None = None, pairs=POT_ENCODER_PAIRS, **fit_kwargs) -> PotCalibration:
+    """Fit the pairs' pots in df against fit_encoder_cols (default: the pairs' encoder columns)."""
+    pot_cols = [p for p, _, _ in pairs]
+    encoder_cols = [e for _, e, _ in pairs]
+    return fit_calibration(
+        numeric_columns(df, pot_cols),
+        numeric_columns(df, fit_encoder_cols or encoder_cols),
+        signs=[s for _, _, s in pairs],
+        pot_cols=pot_cols,
+        encoder_cols=encoder_cols,
+        **fit_kwargs,
+    )
+
+
+def save_calibration(calibration: PotCalibration, path: str | Path) -> Path:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(calibration.to_dict(), indent=2) + "\n")
+    return path
+
+
+def load_calibration(path: str | Path) -> PotCalibration:
+    with open(path, "r") as fh:
+        return PotCalibration.from_dict(json.load(fh))
+
+
+def load_or_fit_calibration(
+    df: pd.DataFrame,
+    path: str | Path | None = None,
+    fit_encoder_cols: list[str] | None = None,
+    refit: bool = False,
+    **fit_kwargs,
+) -> PotCalibration:
+    """The calibration saved at path if there is one (and not refit), else a fresh fit saved to path."""
+    if path is not None and Path(path).is_file() and not refit:
+        calibration = load_calibration(path)
+        print(f"Loaded pot calibration from {path} ({calibration.method}, {calibration.segments} segment(s))")
+        return calibration
+    calibration = calibrate_frame(df, fit_encoder_cols, **fit_kwargs)
+    if path is not None:
+        save_calibration(calibration, path)
+        print(f"Saved pot calibration to {path}")
+    return calibration
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fit or inspect a pot-to-encoder calibration.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    fit = sub.add_parser("fit", help="Fit POT_3/4/5 against ENCODER_POS_1/2/3 of a headered capture.")
+    fit.add_argument("input_csv", type=str, help="Raw capture (or pot_to_encoder output) with headers.")
+    fit.add_argument("output", type=str, help="Calibration JSON to write.")
+    fit.add_argument("--method", type=str, default="lstsq", choices=list(FIT_METHODS))
+    fit.add_argument("--segments", type=int, default=1, help="Piecewise-linear segments per joint.")
+    show = sub.add_parser("show", help="Print a calibration file.")
+    show.add_argument("path", type=str)
+    args = parser.parse_args()
+
+    if args.command == "fit":
+        df = pd.read_csv(args.input_csv)
+        # pot_to_encoder output keeps the raw encoder channels as ORIGINAL_ENCODER_POS_i.
+        fit_cols = [
+            f"ORIGINAL_{enc}" if f"ORIGINAL_{enc}" in df.columns else enc for _, enc, _ in POT_ENCODER_PAIRS
+        ]
+        calibration = calibrate_frame(df, fit_cols, method=args.method, segments=args.segments)
+        save_calibration(calibration, args.output)
+        print(f"Saved pot calibration to {args.output}")
+    else:
+        calibration = load_calibration(args.path)
+    print(f"method={calibration.method}, segments={calibration.segments}")
+    for j, (pot, enc) in enumerate(zip(calibration.pots, calibration.encoders)):
+        rms = "" if calibration.rms is None else f", rms={calibration.rms[j]:.6g}"
+        print(
+            f" - {enc} = {calibration.slopes[j]:.6g} * ({calibration.signs[j]:+g} * {pot}) "
+            f"+ {calibration.intercepts[j]:.6g}{rms}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -2,63 +2,32 @@ from __future__ import annotations
 
 import argparse
 from pathlib import Path
-import numpy as np
 import pandas as pd
 
-
-def _fit_linear_map(x: pd.Series, y: pd.Series) -> tuple[float, float]:
-    x_num = pd.to_numeric(x, errors="coerce").to_numpy(dtype=float)
-    y_num = pd.to_numeric(y, errors="coerce").to_numpy(dtype=float)
-
-    valid = np.isfinite(x_num) & np.isfinite(y_num)
-    if np.count_nonzero(valid) < 2:
-        return 1.0, 0.0
-
-    x_valid = x_num[valid]
-    y_valid = y_num[valid]
-
-    x_mean = x_valid.mean()
-    y_mean = y_valid.mean()
-    denom = np.sum((x_valid - x_mean) ** 2)
-    if denom <= np.finfo(float).eps:
-        return 1.0, float(y_mean - x_mean)
-
-    slope = float(np.sum((x_valid - x_mean) * (y_valid - y_mean)) / denom)
-    intercept = float(y_mean - slope * x_mean)
-    return slope, intercept
-
-
-def _smoothed_velocity(
-    timestamps: pd.Series,
-    positions: pd.Series,
-    smooth_span: int,
-) -> np.ndarray:
-    ts = pd.to_numeric(timestamps, errors="coerce").to_numpy(dtype=float)
-    pos = pd.to_numeric(positions, errors="coerce").to_numpy(dtype=float)
-
-    if len(pos) < 3:
-        return np.zeros_like(pos)
-
-    span = max(3, int(smooth_span))
-    pos_smooth = pd.Series(pos).ewm(span=span, adjust=False).mean().to_numpy()
-
-    dt = np.diff(ts)
-    if np.all(dt > 0):
-        vel = np.gradient(pos_smooth, ts, edge_order=1)
-    else:
-        positive_dt = dt[dt > 0]
-        step = float(np.median(positive_dt)) if len(positive_dt) else 1.0
-        vel = np.gradient(pos_smooth, step, edge_order=1)
-
-    vel_smooth = pd.Series(vel).ewm(span=max(3, span // 2), adjust=False).mean().to_numpy()
-    return vel_smooth
+from calibration_store import DEFAULT_DRIFT_TOLERANCE, add_store_arguments, resolve_calibration
+from instrumentation import instrumented
+from pot_calibration import FIT_METHODS, POT_ENCODER_PAIRS, numeric_columns
+from velocity import DEFAULT_KALMAN_BANDWIDTH_HZ, DEFAULT_SAVGOL_WINDOW, VELOCITY_METHODS, estimate_velocity
 
 
+@instrumented()
 def replace_encoder_from_pots(
     input_csv: str,
     output_csv: str,
     update_velocity: bool = True,
     vel_smooth_span: int = 25,
+    velocity_method: str = "ewm",
+    savgol_window: int = DEFAULT_SAVGOL_WINDOW,
+    kalman_bandwidth_hz: float = DEFAULT_KALMAN_BANDWIDTH_HZ,
+    calibration_path: str | None = None,
+    fit_method: str = "lstsq",
+    segments: int = 1,
+    refit: bool = False,
+    calibration_store: str | None = None,
+    robot: str | None = None,
+    capture_date: str | None = None,
+    check_drift: bool = False,
+    drift_tolerance: float = DEFAULT_DRIFT_TOLERANCE,
 ) -> pd.DataFrame:
     input_path = Path(input_csv).expanduser().resolve()
     output_path = Path(output_csv).expanduser().resolve()
@@ -90,16 +59,21 @@ def replace_encoder_from_pots(
     for i in range(1, 4):
         df[f"ORIGINAL_ENCODER_POS_{i}"] = df[f"ENCODER_POS_{i}"]
 
-    pot_to_encoder_pos = [
-        ("POT_3", "ENCODER_POS_1", 1.0),
-        ("POT_4", "ENCODER_POS_2", 1.0),
-        ("POT_5", "ENCODER_POS_3", -1.0),
-    ]
-
-    for pot_col, enc_pos_col, sign in pot_to_encoder_pos:
-        signed_pot = df[pot_col] * sign
-        slope, intercept = _fit_linear_map(signed_pot, df[enc_pos_col])
-        df[enc_pos_col] = slope * signed_pot + intercept
+    # A stored or saved calibration is applied as is; otherwise all three joints are fitted in one solve.
+    calibration = resolve_calibration(
+        df,
+        calibration_path=calibration_path,
+        store=calibration_store,
+        robot=robot,
+        capture_date=capture_date,
+        refit=refit,
+        check_drift=check_drift,
+        drift_tolerance=drift_tolerance,
+        source=str(input_path),
+        method=fit_method,
+        segments=segments,
+    )
+    df[[enc for _, enc, _ in POT_ENCODER_PAIRS]] = calibration.apply_frame(df)
 
     if update_velocity:
         vel_cols = [f"ENCODER_VEL_{i}" for i in range(1, 4)]
@@ -108,12 +82,15 @@ def replace_encoder_from_pots(
             raise ValueError(
                 f"Velocity update requested, but missing velocity columns: {missing_vel}"
             )
-        for i in range(1, 4):
-            df[f"ENCODER_VEL_{i}"] = _smoothed_velocity(
-                timestamps=df["TIMESTAMP"],
-                positions=df[f"ENCODER_POS_{i}"],
-                smooth_span=vel_smooth_span,
-            )
+        # All three joints in one pass; "ewm" is the original causal smoother.
+        df[vel_cols] = estimate_velocity(
+            numeric_columns(df, ["TIMESTAMP"])[:, 0],
+            numeric_columns(df, [f"ENCODER_POS_{i}" for i in range(1, 4)]),
+            method=velocity_method,
+            span=vel_smooth_span,
+            window=savgol_window,
+            bandwidth_hz=kalman_bandwidth_hz,
+        )
 
     df.to_csv(output_path, index=False)
     print(f"Wrote POT-mapped encoder CSV to: {output_path}")
@@ -137,6 +114,27 @@ if __name__ == "__main__":
         default=6,
         help="Smoothing span used for POT-derived velocity calculation.",
     )
+    parser.add_argument(
+        "--velocity-method",
+        type=str,
+        default="ewm",
+        choices=list(VELOCITY_METHODS),
+        help="ewm (causal, lags), savgol or kalman (zero-phase); see velocity.py.",
+    )
+    parser.add_argument("--savgol-window", type=int, default=DEFAULT_SAVGOL_WINDOW, help="Savitzky-Golay window (rows).")
+    parser.add_argument(
+        "--kalman-bandwidth-hz", type=float, default=DEFAULT_KALMAN_BANDWIDTH_HZ, help="Kalman smoother bandwidth (Hz)."
+    )
+    parser.add_argument(
+        "--calibration",
+        type=str,
+        default=None,
+        help="Pot calibration JSON: loaded when it exists, otherwise fitted and saved there.",
+    )
+    parser.add_argument("--fit-method", type=str, default="lstsq", choices=list(FIT_METHODS))
+    parser.add_argument("--segments", type=int, default=1, help="Piecewise-linear segments per joint.")
+    parser.add_argument("--refit", action="store_true", help="Refit and overwrite an existing --calibration file.")
+    add_store_arguments(parser)
     parser.add_argument(
         "--residual-notch-60hz",
         action="store_true",
@@ -161,4 +159,16 @@ if __name__ == "__main__":
         output_csv=args.output_csv,
         update_velocity=not args.keep_original_vel,
         vel_smooth_span=args.vel_smooth_span,
+        velocity_method=args.velocity_method,
+        savgol_window=args.savgol_window,
+        kalman_bandwidth_hz=args.kalman_bandwidth_hz,
+        calibration_path=args.calibration,
+        fit_method=args.fit_method,
+        segments=args.segments,
+        refit=args.refit,
+        calibration_store=args.calibration_store,
+        robot=args.robot,
+        capture_date=args.capture_date,
+        check_drift=args.check_drift,
+        drift_tolerance=args.drift_tolerance,
     )
@@ -1,20 +1,27 @@
 import pandas as pd
 import argparse
 
+from instrumentation import instrumented
+from table_io import read_table, write_table
+
+# Select columns by name (first 6 for each, only measured torque)
+ORDERED_COLS = (
+    ['TIMESTAMP'] +
+    [f'POSITION_FEEDBACK_{i}' for i in range(1, 7)] +
+    [f'VELOCITY_FEEDBACK_{i}' for i in range(1, 7)] +
+    [f'TORQUE_FEEDBACK_{i}' for i in range(1, 7)]
+)
+
+def select_joint_columns(df: pd.DataFrame) -> pd.DataFrame:
+    return df[ORDERED_COLS]
+
+@instrumented()
 def preprocess_csv(input_csv_path: str, output_csv_path: str = 'interpolated_all_joints.csv') -> pd.DataFrame:
     # Load data with header row
-    df = pd.read_csv(input_csv_path)
-
-    # Select columns by name (first 6 for each, only measured torque)
-    ordered_cols = (
-        ['TIMESTAMP'] +
-        [f'POSITION_FEEDBACK_{i}' for i in range(1, 7)] +
-        [f'VELOCITY_FEEDBACK_{i}' for i in range(1, 7)] +
-        [f'TORQUE_FEEDBACK_{i}' for i in range(1, 7)]
-    )
+    df = read_table(input_csv_path, header=True)
 
-    df_ordered = df[ordered_cols]
-    df_ordered.to_csv(output_csv_path, index=False, header=False)
+    df_ordered = select_joint_columns(df)
+    write_table(df_ordered, output_csv_path, header=False)
     return df_ordered
 
 if __name__ == "__main__":
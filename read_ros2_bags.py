@@ -1,31 +1,137 @@
 #!/usr/bin/env python3
+from __future__ import annotations
+
 import os
+import json
 import time
 import argparse
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from scipy import interpolate
 from rosbags.highlevel import AnyReader
 
+from interpolate_timestamps import build_resample_index, resample_values, time_order
+from synchronize_streams import print_stats, synchronize_streams
+from table_io import NpyAppender, write_table
+
+
+class _GrowableBuffer:
+    """Preallocated float64 row buffer that doubles its capacity when full."""
+
+    def __init__(self, n_cols: int, capacity: int):
+        self.data = np.empty((max(1, capacity), n_cols), dtype=np.float64)
+        self.size = 0
+
+    def append(self, t: float, values) -> None:
+        if self.size == self.data.shape[0]:
+            grown = np.empty((2 * self.data.shape[0], self.data.shape[1]), dtype=np.float64)
+            grown[: self.size] = self.data[: self.size]
+            self.data = grown
+        self.data[self.size, 0] = t
+        self.data[self.size, 1:] = values
+        self.size += 1
+
+    def take(self) -> np.ndarray:
+        """Return the filled rows (a view) and reset the buffer."""
+        rows = self.data[: self.size]
+        self.size = 0
+        return rows
+
+
+STREAMS = ("joints", "jacobian", "jaw", "sensor")
+
+
+def default_topic_map(arm: str = "PSM1") -> dict[str, list[str]]:
+    """Topics decoded into each output stream; leading slashes are ignored when matching."""
+    return {
+        "joints": [f"{arm}/measured_js"],
+        "jacobian": [f"{arm}/spatial/jacobian"],
+        "jaw": [f"{arm}/jaw/measured_js"],
+        "sensor": ["measured_cf", f"{arm}/body/measured_cf", f"{arm}/spatial/measured_cf"],
+    }
+
+
+def load_topic_map(path: str | None = None, arm: str = "PSM1") -> dict[str, list[str]]:
+    """Load a {stream: [topics]} JSON file; streams it omits keep their default topics."""
+    topic_map = default_topic_map(arm)
+    if path is None:
+        return topic_map
+
+    with open(path, "r") as fh:
+        overrides = json.load(fh)
+    unknown = sorted(set(overrides) - set(STREAMS))
+    if unknown:
+        raise ValueError(f"Unknown streams in topic map {path}: {unknown}. Expected a subset of {STREAMS}")
+    for stream, topics in overrides.items():
+        topic_map[stream] = [topics] if isinstance(topics, str) else list(topics)
+    return topic_map
+
+
+def _normalize_topic(topic: str) -> str:
+    return topic.lstrip("/")
+
+
+def _message_values(stream: str, msg) -> np.ndarray:
+    """Flatten one deserialized message into the column layout used by the CSV writer."""
+    if stream == "joints":
+        return np.concatenate((msg.position, msg.velocity, msg.effort))
+    if stream == "jacobian":
+        return np.asarray(msg.data, dtype=np.float64)
+    if stream == "jaw":
+        return np.concatenate((np.atleast_1d(msg.position), np.atleast_1d(msg.velocity), np.atleast_1d(msg.effort)))
+    f = msg.wrench.force
+    tau = msg.wrench.torque
+    return np.array([f.x, f.y, f.z, tau.x, tau.y, tau.z], dtype=np.float64)
+
 
 class Rosbag2Parser:
     def __init__(self, args):
         self.args = args
         for k, v in args.__dict__.items():
             setattr(self, k, v)
+        self.topic_map = load_topic_map(
+            getattr(args, "topic_map_file", None), getattr(args, "arm", "PSM1")
+        )
+        self.topic_to_stream = {
+            _normalize_topic(topic): stream
+            for stream, topics in self.topic_map.items()
+            for topic in topics
+        }
+
+    def _open_connections(self, reader):
+        """Print the bag's topics and return only the connections that feed an output stream."""
+        print(f"Opened bag with {len(reader.connections)} topics:")
+        for c in reader.connections:
+            print(" -", c.topic)
+        connections = [
+            c for c in reader.connections if _normalize_topic(c.topic) in self.topic_to_stream
+        ]
+        print(f"Decoding {len(connections)} of {len(reader.connections)} connections")
+        return connections
 
     def interp(self, time, mat):
-        """Interpolate matrix columns to a given time vector."""
+        """Interpolate matrix columns to a given time vector (linear, extrapolating at the ends)."""
+        order = time_order(mat[:, 0])
+        if order is not None:
+            mat = mat[order]
         new_mat = np.zeros((len(time), mat.shape[1]))
         new_mat[:, 0] = time
-        for i in range(1, mat.shape[1]):
-            f = interpolate.interp1d(
-                mat[:, 0], mat[:, i], bounds_error=False, fill_value="extrapolate"
-            )
-            new_mat[:, i] = f(time)
+        new_mat[:, 1:] = resample_values(mat[:, 1:], build_resample_index(mat[:, 0], time))
         return new_mat
 
-    def single_bag_to_csv(self, bag_path: Path):
+    def write_synced(self, streams: dict[str, np.ndarray], index: int, ext: str) -> dict:
+        """Resample all streams of one bag onto a shared clock and write one aligned table."""
+        aligned, stats = synchronize_streams(streams, rate=self.sync_rate)
+        folder = Path(self.output) / "synced"
+        folder.mkdir(parents=True, exist_ok=True)
+        write_table(aligned, folder / f"{self.prefix}{index}.{ext}", header=True)
+        with open(folder / f"{self.prefix}{index}_stats.json", "w") as fh:
+            json.dump(stats, fh, indent=2)
+        print_stats(stats)
+        return stats
+
+    def single_bag_to_csv(self, bag_path: Path, index: int) -> dict[str, int] | None:
+        """Convert one bag to per-topic CSVs; returns message counts, or None if skipped."""
         print(f"\n📦 Processing bag: {bag_path}")
         folder = Path(self.output)
         (folder / "joints").mkdir(parents=True, exist_ok=True)
@@ -39,38 +145,34 @@ class Rosbag2Parser:
         jaw_timestamps, jaw_data = [], []
 
         with AnyReader([bag_path]) as reader:
-            print(f"Opened bag with {len(reader.connections)} topics:")
-            for c in reader.connections:
-                print(" -", c.topic)
+            connections = self._open_connections(reader)
 
-            for connection, timestamp, rawdata in reader.messages():
+            # An empty connection list would disable filtering, so only read when something matched.
+            messages = reader.messages(connections=connections) if connections else ()
+            for connection, timestamp, rawdata in messages:
                 msg = reader.deserialize(rawdata, connection.msgtype)
                 t = timestamp / 1e9  # convert ns → s
-                topic = connection.topic
+                stream = self.topic_to_stream[_normalize_topic(connection.topic)]
 
                 # --- Joint states ---
-                if topic in ("PSM1/measured_js", "/PSM1/measured_js"):
+                if stream == "joints":
                     joint_timestamps.append(t)
                     joint_position.append(list(msg.position))
                     joint_velocity.append(list(msg.velocity))
                     joint_effort.append(list(msg.effort))
 
                 # --- Jacobian ---
-                elif topic in ("PSM1/spatial/jacobian", "/PSM1/spatial/jacobian"):
+                elif stream == "jacobian":
                     jacobian_timestamps.append(t)
                     jacobian_data.append(list(msg.data))
 
                 # --- Jaw joint state ---
-                elif topic in ("PSM1/jaw/measured_js", "/PSM1/jaw/measured_js"):
+                elif stream == "jaw":
                     jaw_timestamps.append(t)
                     jaw_data.append([msg.position, msg.velocity, msg.effort])
 
                 # --- Force sensors ---
-                elif topic in (
-                    "/measured_cf",
-                    "/PSM1/body/measured_cf",
-                    "/PSM1/spatial/measured_cf",
-                ):
+                elif stream == "sensor":
                     force_timestamps.append(t)
                     f = msg.wrench.force
                     tau = msg.wrench.torque
@@ -79,7 +181,7 @@ class Rosbag2Parser:
         # ✅ check after all messages
         if not joint_timestamps:
             print("⚠️  No joint data found — skipping.")
-            return
+            return None
 
         # --- Normalize timestamps ---
         start_time = joint_timestamps[0]
@@ -99,13 +201,13 @@ class Rosbag2Parser:
             (joint_timestamps, joint_position, joint_velocity, joint_effort)
         )
         np.savetxt(
-            folder / "joints" / f"{self.prefix}{self.index}.csv", joints, delimiter=","
+            folder / "joints" / f"{self.prefix}{index}.csv", joints, delimiter=","
         )
 
         if len(jacobian_data) > 0:
             jacobian = np.column_stack((jacobian_timestamps, jacobian_data))
             np.savetxt(
-                folder / "jacobian" / f"{self.prefix}{self.index}.csv",
+                folder / "jacobian" / f"{self.prefix}{index}.csv",
                 jacobian,
                 delimiter=",",
             )
@@ -113,7 +215,7 @@ class Rosbag2Parser:
         if len(force_data) > 0:
             force = np.column_stack((force_timestamps, force_data))
             np.savetxt(
-                folder / "sensor" / f"{self.prefix}{self.index}.csv",
+                folder / "sensor" / f"{self.prefix}{index}.csv",
                 force,
                 delimiter=",",
             )
@@ -121,22 +223,152 @@ class Rosbag2Parser:
         if len(jaw_data) > 0:
             jaw = np.column_stack((jaw_timestamps, np.squeeze(jaw_data)))
             np.savetxt(
-                folder / "jaw" / f"{self.prefix}{self.index}.csv", jaw, delimiter=","
+                folder / "jaw" / f"{self.prefix}{index}.csv", jaw, delimiter=","
             )
 
-        print(f"✅ Wrote out {self.prefix}{self.index}.csv")
-        self.index += 1
+        if getattr(self, "sync_rate", None):
+            streams = {"joints": joints}
+            if len(jacobian_data) > 0:
+                streams["jacobian"] = jacobian
+            if len(jaw_data) > 0:
+                streams["jaw"] = jaw
+            if len(force_data) > 0:
+                streams["sensor"] = force
+            self.write_synced(streams, index, "csv")
+
+        print(f"✅ Wrote out {self.prefix}{index}.csv")
+        return {
+            "joints": len(joint_timestamps),
+            "jacobian": len(jacobian_data),
+            "jaw": len(jaw_data),
+            "sensor": len(force_data),
+        }
+
+    def single_bag_to_npy(self, bag_path: Path, index: int) -> dict[str, int] | None:
+        """Stream one bag into per-topic .npy files with the same columns as the CSV output.
+
+        Rows are staged in fixed-size buffers and appended to disk whenever a buffer
+        fills, so peak memory does not grow with the bag length.
+        """
+        print(f"\n📦 Streaming bag: {bag_path}")
+        folder = Path(self.output)
+        chunk_rows = int(self.chunk_rows)
+        if chunk_rows < 1:
+            raise ValueError(f"--chunk-rows must be >= 1, got {chunk_rows}")
+
+        buffers: dict[str, _GrowableBuffer] = {}
+        writers: dict[str, NpyAppender] = {}
+        start_time = None
+
+        def flush(stream: str) -> None:
+            rows = buffers[stream].take()
+            if rows.shape[0] == 0:
+                return
+            rows[:, 0] -= start_time
+            if stream not in writers:
+                (folder / stream).mkdir(parents=True, exist_ok=True)
+                writers[stream] = NpyAppender(
+                    folder / stream / f"{self.prefix}{index}.npy", rows.shape[1]
+                )
+            writers[stream].append(rows)
+
+        with AnyReader([bag_path]) as reader:
+            connections = self._open_connections(reader)
+
+            messages = reader.messages(connections=connections) if connections else ()
+            for connection, timestamp, rawdata in messages:
+                stream = self.topic_to_stream[_normalize_topic(connection.topic)]
+                msg = reader.deserialize(rawdata, connection.msgtype)
+                values = _message_values(stream, msg)
+                t = timestamp / 1e9  # convert ns → s
+
+                if stream == "joints" and start_time is None:
+                    start_time = t
+                buf = buffers.get(stream)
+                if buf is None:
+                    buf = buffers[stream] = _GrowableBuffer(1 + len(values), chunk_rows)
+                buf.append(t, values)
+
+                # Timestamps are normalized to the first joint sample, so rows that
+                # arrive before it stay buffered (the buffer grows) until it is known.
+                if start_time is not None and buf.size >= chunk_rows:
+                    flush(stream)
+
+        if start_time is None:
+            print("⚠️  No joint data found — skipping.")
+            return None
+
+        for stream in buffers:
+            flush(stream)
+        for writer in writers.values():
+            writer.close()
 
-    def parse_all(self):
+        if getattr(self, "sync_rate", None):
+            # The per-stream files are memory-mapped; only the rows each output needs are read.
+            streams = {stream: np.load(writer.path, mmap_mode="r") for stream, writer in writers.items()}
+            self.write_synced(streams, index, "npy")
+
+        print(f"✅ Wrote out {self.prefix}{index}.npy")
+        return {stream: writer.n_rows for stream, writer in writers.items()}
+
+    def convert_bag(self, bag_path: Path, index: int) -> dict:
+        """Convert one bag to the configured format and return its summary entry."""
+        convert = self.single_bag_to_npy if self.format == "npy" else self.single_bag_to_csv
+        start = time.time()
+        counts = convert(bag_path, index)
+        return {
+            "bag": str(bag_path),
+            "index": index,
+            "written": counts is not None,
+            "seconds": time.time() - start,
+            "messages": counts or {},
+        }
+
+    def find_bags(self) -> list[Path]:
         bag_path = Path(self.folder)
         if (bag_path / "metadata.yaml").exists():
             # Single ROS2 bag folder
-            self.single_bag_to_csv(bag_path)
+            return [bag_path]
+        # Search for nested bag folders
+        return [subdir for subdir in sorted(bag_path.iterdir()) if (subdir / "metadata.yaml").exists()]
+
+    def parse_all(self) -> list[dict]:
+        # Indices are fixed per bag before any work starts, so file names do not
+        # depend on scheduling (a skipped bag leaves its index unused).
+        tasks = [(bag, self.index + k) for k, bag in enumerate(self.find_bags())]
+        jobs = max(1, int(getattr(self, "jobs", 1)))
+
+        if jobs == 1 or len(tasks) <= 1:
+            summary = [self.convert_bag(bag, index) for bag, index in tasks]
         else:
-            # Search for nested bag folders
-            for subdir in sorted(bag_path.iterdir()):
-                if (subdir / "metadata.yaml").exists():
-                    self.single_bag_to_csv(subdir)
+            with ProcessPoolExecutor(max_workers=min(jobs, len(tasks))) as pool:
+                futures = [pool.submit(_convert_bag_worker, self.args, bag, index) for bag, index in tasks]
+                summary = [future.result() for future in futures]
+        self.index += len(tasks)
+
+        print_summary(summary)
+        summary_json = getattr(self, "summary_json", None)
+        if summary_json:
+            Path(summary_json).parent.mkdir(parents=True, exist_ok=True)
+            with open(summary_json, "w") as fh:
+                json.dump(summary, fh, indent=2)
+            print(f"Saved conversion summary to {summary_json}")
+        return summary
+
+
+def _convert_bag_worker(args, bag_path: Path, index: int) -> dict:
+    return Rosbag2Parser(args).convert_bag(bag_path, index)
+
+
+def print_summary(summary: list[dict]) -> None:
+    print("\n📊 Conversion summary:")
+    for entry in summary:
+        status = "ok" if entry["written"] else "skipped"
+        counts = ", ".join(f"{k}={v}" for k, v in entry["messages"].items())
+        print(
+            f" - [{entry['index']}] {Path(entry['bag']).name}: {status}, "
+            f"{entry['seconds']:.1f}s{', ' + counts if counts else ''}"
+        )
 
 
 def main():
@@ -163,6 +395,48 @@ def main():
     parser.add_argument(
         "--index", type=int, default=0, help="Starting file index for naming"
     )
+    parser.add_argument(
+        "--arm", type=str, default="PSM1", help="Arm namespace used by the default topic map"
+    )
+    parser.add_argument(
+        "--topic-map",
+        dest="topic_map_file",
+        type=str,
+        default=None,
+        help='JSON file mapping streams to topics, e.g. {"sensor": ["/force_sensor/wrench"]}',
+    )
+    parser.add_argument(
+        "--format",
+        type=str,
+        default="csv",
+        choices=["csv", "npy"],
+        help="csv: buffer the whole bag and write text CSVs; npy: stream fixed-size chunks to binary .npy files",
+    )
+    parser.add_argument(
+        "--chunk-rows",
+        type=int,
+        default=65536,
+        help="Rows buffered per topic before flushing to disk in npy mode",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes used to convert nested bag folders",
+    )
+    parser.add_argument(
+        "--sync-rate",
+        type=float,
+        default=None,
+        help="Also resample all streams onto one clock at this rate (Hz) and write synced/<prefix><index> with gap/jitter stats",
+    )
+    parser.add_argument(
+        "--summary-json",
+        type=str,
+        default=None,
+        help="Optional path to save per-bag timing and message counts as JSON",
+    )
     args = parser.parse_args()
 
     start = time.time()
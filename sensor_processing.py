@@ -1,9 +1,9 @@
-import pandas as pd
+from table_io import read_table, write_table
 
 def save_sensor_data(df, sensor_cols, output_path):
     sensor_df = df[sensor_cols]
 
-    sensor_df.to_csv(output_path, index=False, header=False)
+    write_table(sensor_df, output_path, header=False)
     
 
 if __name__ == "__main__":
@@ -14,7 +14,7 @@ if __name__ == "__main__":
 
     args = parser.parse_args()
 
-    df = pd.read_csv(args.input_csv)
+    df = read_table(args.input_csv, header=True)
 
     sensor_columns = ["TIMESTAMP","FORCE_1", "FORCE_2", "FORCE_3", "TORQUE_1", "TORQUE_2", "TORQUE_3"]
     save_sensor_data(df, sensor_columns, args.output_csv)
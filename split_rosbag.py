@@ -5,7 +5,6 @@ import rosbag
 
 def find_bag_file(folder):
     """Find the first .bag file in a folder."""
-    print("FIND BAG FOLDER")
     bags = glob.glob(os.path.join(folder, "*.bag"))
     if not bags:
         raise FileNotFoundError(f"No .bag files found in {folder}")
@@ -17,7 +16,6 @@ def split_rosbag_by_time(folder, val_name="val.bag", test_name="test.bag"):
     Find the first bag file in a folder and split it into val/test halves by time.
     """
 
-    print("HEREE")
     input_bag = find_bag_file(folder)
     val_path = os.path.join(folder, val_name)
     test_path = os.path.join(folder, test_name)
@@ -1,8 +1,11 @@
-import pandas as pd
 import argparse
+from pathlib import Path
 
-def split_val_test(input_csv, split_ratio=.5, has_header=False):
-    df = pd.read_csv(input_csv, header=0 if has_header else None)
+from instrumentation import instrumented
+from table_io import read_table, write_table
+
+@instrumented()
+def split_dataframe(df, split_ratio=.5):
     split_idx = int(len(df) * split_ratio)
     val_df = df.iloc[:split_idx].copy()
     test_df = df.iloc[split_idx:].copy()
@@ -11,11 +14,18 @@ def split_val_test(input_csv, split_ratio=.5, has_header=False):
     if len(test_df) > 0:
         ts_col = df.columns[0]
         test_df[ts_col] = test_df[ts_col] - test_df[ts_col].iloc[0]
+    return val_df, test_df
+
+def split_val_test(input_csv, split_ratio=.5, has_header=False):
+    df = read_table(input_csv, header=has_header)
+    val_df, test_df = split_dataframe(df, split_ratio)
 
-    val_df.to_csv("val.csv", index=False, header=has_header)
-    test_df.to_csv("test.csv", index=False, header=has_header)
-    print("Validation set saved to val.csv", len(val_df), "rows")
-    print("Test set saved to test.csv", len(test_df), "rows")
+    # Outputs keep the input's format, e.g. val.csv/test.csv or val.npy/test.npy.
+    suffix = Path(input_csv).suffix
+    write_table(val_df, f"val{suffix}", header=has_header)
+    write_table(test_df, f"test{suffix}", header=has_header)
+    print(f"Validation set saved to val{suffix}", len(val_df), "rows")
+    print(f"Test set saved to test{suffix}", len(test_df), "rows")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Split preprocessed CSV into validation and test sets (no shuffle, preserves order)")
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""Content-addressed cache for pipeline stage outputs.
+
+Each entry is keyed by a SHA-256 chained from the input file's contents through
+every stage's name, code fingerprint and parameters, so changing a late stage
+(e.g. the downsample rate) reuses every earlier stage's cached output. Entries
+are pickled DataFrames (index preserved) plus a small JSON metadata file, and
+the cache is trimmed least-recently-used first once it exceeds max_bytes.
+
+Usage:
+    python3 stage_cache.py --clear [--cache-dir DIR]
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import shutil
+from pathlib import Path
+
+import pandas as pd
+
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "force_estimation_preprocess"
+DEFAULT_MAX_BYTES = 4 * 1024**3
+
+
+def file_digest(path: str | Path, block_size: int = 1 << 20) -> str:
+    """SHA-256 of a file's contents."""
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def code_fingerprint(stage_fn, *dependencies) -> str:
+    """Hash the stage function's source and the full source of the modules it calls into."""
+    h = hashlib.sha256(inspect.getsource(stage_fn).encode())
+    for dep in dependencies:
+        module = dep if inspect.ismodule(dep) else inspect.getmodule(dep)
+        h.update(inspect.getsource(module).encode())
+    return h.hexdigest()
+
+
+def stage_key(parent_key: str, stage_name: str, params: dict, fingerprint: str, part: str) -> str:
+    payload = json.dumps(
+        {"parent": parent_key, "stage": stage_name, "params": params, "code": fingerprint, "part": part},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class StageCache:
+    def __init__(self, root: str | Path = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = Path(root).expanduser()
+        self.max_bytes = int(max_bytes)
+
+    def _paths(self, key: str) -> tuple[Path, Path]:
+        folder = self.root / key[:2]
+        return folder / f"{key}.pkl", folder / f"{key}.json"
+
+    def has(self, key: str) -> bool:
+        data_path, meta_path = self._paths(key)
+        return data_path.is_file() and meta_path.is_file()
+
+    def get(self, key: str) -> tuple[pd.DataFrame, dict] | None:
+        if not self.has(key):
+            return None
+        data_path, meta_path = self._paths(key)
+        with open(meta_path, "r") as fh:
+            meta = json.load(fh)
+        df = pd.read_pickle(data_path)
+        # Mark as recently used for LRU eviction.
+        os.utime(data_path)
+        return df, meta
+
+    def put(self, key: str, df: pd.DataFrame, meta: dict) -> None:
+        data_path, meta_path = self._paths(key)
+        data_path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to temporaries first so an interrupted run never leaves a half entry.
+        tmp_data = data_path.with_suffix(".pkl.tmp")
+        df.to_pickle(tmp_data)
+        tmp_meta = meta_path.with_suffix(".json.tmp")
+        with open(tmp_meta, "w") as fh:
+            json.dump(meta, fh, indent=2, default=str)
+        os.replace(tmp_data, data_path)
+        os.replace(tmp_meta, meta_path)
+        self.evict()
+
+    def size_bytes(self) -> int:
+        if not self.root.is_dir():
+            return 0
+        return sum(p.stat().st_size for p in self.root.glob("*/*.pkl"))
+
+    def evict(self) -> int:
+        """Delete least-recently-used entries until the cache fits in max_bytes; returns entries removed."""
+        if not self.root.is_dir():
+            return 0
+        entries = sorted(
+            ((p.stat().st_mtime, p.stat().st_size, p) for p in self.root.glob("*/*.pkl")),
+            key=lambda item: item[0],
+        )
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, data_path in entries:
+            if total <= self.max_bytes:
+                break
+            data_path.unlink(missing_ok=True)
+            data_path.with_suffix(".json").unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self) -> None:
+        if self.root.is_dir():
+            shutil.rmtree(self.root)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Inspect or clear the pipeline stage cache.")
+    parser.add_argument("--cache-dir", type=str, default=str(DEFAULT_CACHE_DIR), help="Cache directory.")
+    parser.add_argument("--clear", action="store_true", help="Delete every cached stage output.")
+    args = parser.parse_args()
+
+    cache = StageCache(args.cache_dir)
+    if args.clear:
+        cache.clear()
+        print(f"Cleared stage cache at {cache.root}")
+    else:
+        print(f"Stage cache at {cache.root}: {cache.size_bytes() / 1024**2:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""Resample the joints, jacobian, jaw and sensor streams of one capture onto one clock.
+
+Every stream is resampled in a single vectorized pass with the searchsorted
+gather-and-blend engine from interpolate_timestamps. The result is one aligned
+table plus per-stream timing statistics (rate, jitter, gaps).
+
+Usage:
+    python3 synchronize_streams.py --joints parsed/joints/ros2_0.csv --sensor parsed/sensor/ros2_0.csv \
+        [--jacobian ...] [--jaw ...] --rate 1000 -o synced.csv [--stats-json stats.json]
+
+read_ros2_bags.py --sync-rate does the same while converting a bag, without the
+per-stream round trip through disk.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from interpolate_timestamps import RESAMPLE_KINDS, build_resample_index, resample_values, time_order
+from instrumentation import instrumented
+from table_io import read_table, write_table
+
+SYNC_STREAMS = ("joints", "jacobian", "jaw", "sensor")
+
+# A sample interval longer than this many median intervals counts as a gap.
+DEFAULT_GAP_FACTOR = 3.0
+
+
+def stream_stats(time: np.ndarray, gap_factor: float = DEFAULT_GAP_FACTOR) -> dict:
+    """Rate, jitter and gap statistics of one stream's timestamps (seconds)."""
+    time = np.asarray(time, dtype=np.float64)
+    stats = {"samples": int(len(time))}
+    if len(time) < 2:
+        return stats
+    dt = np.diff(time)
+    median_dt = float(np.median(dt))
+    jitter = dt - median_dt
+    gaps = dt > gap_factor * median_dt
+    stats.update(
+        start=float(time[0]),
+        end=float(time[-1]),
+        rate_hz=1.0 / median_dt if median_dt > 0 else float("inf"),
+        median_dt=median_dt,
+        jitter_std=float(np.std(jitter)),
+        jitter_p99=float(np.percentile(np.abs(jitter), 99)),
+        max_gap=float(dt.max()),
+        gaps=int(gaps.sum()),
+        gap_seconds=float(dt[gaps].sum()),
+        non_monotonic=int((dt < 0).sum()),
+    )
+    return stats
+
+
+def target_clock(streams: dict[str, np.ndarray], rate: float) -> np.ndarray:
+    """Uniform clock at rate over the interval every stream covers, so nothing is extrapolated."""
+    start = max(float(values[0, 0]) for values in streams.values())
+    end = min(float(values[-1, 0]) for values in streams.values())
+    if end <= start:
+        raise ValueError(f"Streams {sorted(streams)} do not overlap in time")
+    return start + np.arange(int(np.floor((end - start) * rate)) + 1) / rate
+
+
+@instrumented()
+def synchronize_streams(
+    streams: dict[str, np.ndarray],
+    rate: float | None = None,
+    kind: str = "linear",
+    gap_factor: float = DEFAULT_GAP_FACTOR,
+) -> tuple[pd.DataFrame, dict]:
+    """
+    Resample each (n_i, 1 + c_i) stream (timestamp first) onto a shared clock.
+
+    Parameters:
+        streams: {name: array}; empty streams are dropped.
+        rate: Target clock rate in Hz; defaults to the joints stream's median rate.
+        kind: Resampling kernel ("linear", "cubic" or "sinc").
+        gap_factor: Intervals longer than gap_factor * median interval count as gaps.
+
+    Returns:
+        (aligned, stats): a DataFrame with TIMESTAMP followed by <stream>_<i> columns, and
+        {"rate_hz", "rows", "streams"} where streams holds stream_stats for each stream plus
+        aligned_in_gap, the number of aligned rows that fall inside one of its gaps.
+    """
+    # Canonical stream order keeps the column layout independent of message arrival order.
+    order = [name for name in SYNC_STREAMS if name in streams] + [name for name in streams if name not in SYNC_STREAMS]
+    streams = {name: np.asarray(streams[name]) for name in order if streams[name] is not None and len(streams[name]) > 1}
+    if not streams:
+        raise ValueError("No stream has at least two samples to synchronize")
+
+    stats = {name: stream_stats(values[:, 0], gap_factor) for name, values in streams.items()}
+    # Stats report out-of-order samples as recorded; resampling needs them in time order.
+    for name, values in streams.items():
+        order = time_order(values[:, 0])
+        if order is not None:
+            streams[name] = values[order]
+    if rate is None:
+        reference = "joints" if "joints" in stats else next(iter(stats))
+        rate = stats[reference]["rate_hz"]
+    clock = target_clock(streams, rate)
+
+    columns = ["TIMESTAMP"]
+    blocks = [clock[:, np.newaxis]]
+    indices = []
+    for name, values in streams.items():
+        time = np.asarray(values[:, 0], dtype=np.float64)
+        # Streams recorded on the same timebase share one set of bracketing indices.
+        index = next((idx for t, idx in indices if np.array_equal(t, time)), None)
+        if index is None:
+            index = build_resample_index(time, clock)
+            indices.append((time, index))
+        blocks.append(resample_values(values[:, 1:], index, kind))
+        columns += [f"{name}_{i}" for i in range(1, values.shape[1])]
+
+        dt = time[index.left + 1] - time[index.left]
+        stats[name]["aligned_in_gap"] = int((dt > gap_factor * stats[name]["median_dt"]).sum())
+
+    aligned = pd.DataFrame(np.hstack(blocks), columns=columns)
+    return aligned, {"rate_hz": float(rate), "rows": int(len(clock)), "streams": stats}
+
+
+def print_stats(stats: dict) -> None:
+    print(f"Aligned {stats['rows']} rows at {stats['rate_hz']:g} Hz")
+    for name, s in stats["streams"].items():
+        if s["samples"] < 2:
+            print(f" - {name}: {s['samples']} samples")
+            continue
+        print(
+            f" - {name}: {s['samples']} samples at {s['rate_hz']:.1f} Hz, "
+            f"jitter std {s['jitter_std'] * 1e6:.1f} us (p99 {s['jitter_p99'] * 1e6:.1f} us), "
+            f"{s['gaps']} gaps (max {s['max_gap'] * 1e3:.1f} ms), {s['aligned_in_gap']} aligned rows in gaps"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Resample per-stream tables of one capture onto a shared clock.")
+    for stream in SYNC_STREAMS:
+        parser.add_argument(f"--{stream}", type=str, default=None, help=f"Headerless {stream} table (timestamp first).")
+    parser.add_argument("--rate", type=float, default=None, help="Target clock in Hz (default: joints rate).")
+    parser.add_argument("--kind", type=str, default="linear", choices=RESAMPLE_KINDS, help="Interpolation kernel.")
+    parser.add_argument("--gap-factor", type=float, default=DEFAULT_GAP_FACTOR, help="Gap threshold in median intervals.")
+    parser.add_argument("-o", "--output", type=str, required=True, help="Aligned table (.csv, .npy, ...).")
+    parser.add_argument("--stats-json", type=str, default=None, help="Optional path for the per-stream stats.")
+    args = parser.parse_args()
+
+    streams = {
+        stream: read_table(getattr(args, stream), header=False).to_numpy(dtype=np.float64)
+        for stream in SYNC_STREAMS
+        if getattr(args, stream)
+    }
+    aligned, stats = synchronize_streams(streams, rate=args.rate, kind=args.kind, gap_factor=args.gap_factor)
+    write_table(aligned, args.output, header=True)
+    print_stats(stats)
+    if args.stats_json:
+        Path(args.stats_json).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.stats_json, "w") as fh:
+            json.dump(stats, fh, indent=2)
+    print(f"Saved aligned table to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
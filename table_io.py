@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""Shared table I/O for the preprocessing scripts.
+
+The on-disk format is chosen from the file suffix:
+    .csv               text, with or without a header row (previous behaviour)
+    .npy               float64 array + <name>.npy.schema.json sidecar holding the column names
+    .dset              self-describing memory-mappable float64/float32 table (see dataset.py)
+    .parquet/.feather  pandas/pyarrow columnar formats (requires pyarrow)
+
+Binary formats avoid re-parsing and re-formatting floats between stages and
+round-trip float64 values exactly. Use `python3 table_io.py in.npy out.csv` to
+export CSV for the training side.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+TABLE_FORMATS = {".csv": "csv", ".npy": "npy", ".dset": "dset", ".parquet": "parquet", ".feather": "feather"}
+
+
+def table_format(path: str | Path) -> str:
+    suffix = Path(path).suffix.lower()
+    if suffix not in TABLE_FORMATS:
+        raise ValueError(f"Unsupported table format '{suffix}' for {path}. Expected one of {sorted(TABLE_FORMATS)}")
+    return TABLE_FORMATS[suffix]
+
+
+def schema_path(path: str | Path) -> Path:
+    path = Path(path)
+    return path.with_name(path.name + ".schema.json")
+
+
+def read_schema(path: str | Path) -> dict:
+    """Load the sidecar for a .npy table; a missing sidecar means positional columns."""
+    sidecar = schema_path(path)
+    if not sidecar.is_file():
+        return {"columns": None, "header": False}
+    with open(sidecar, "r") as fh:
+        return json.load(fh)
+
+
+def read_table(path: str | Path, header: bool = True, mmap: bool = False) -> pd.DataFrame:
+    """Read a table written by write_table (or any CSV).
+
+    header=False mirrors pd.read_csv(header=None): columns come back as 0..n-1 even
+    when the file stores names. mmap=True memory-maps .npy/.dset tables instead of reading them.
+    """
+    fmt = table_format(path)
+    if fmt == "csv":
+        return pd.read_csv(path, header=0 if header else None)
+    if fmt == "dset":
+        from dataset import open_dataset
+
+        df = open_dataset(path).to_dataframe(copy=not mmap)
+    elif fmt == "parquet":
+        df = pd.read_parquet(path)
+    elif fmt == "feather":
+        df = pd.read_feather(path)
+    else:
+        arr = np.load(path, mmap_mode="r" if mmap else None)
+        if arr.ndim != 2:
+            raise ValueError(f"Expected a 2-D table in {path}, got shape {arr.shape}")
+        columns = read_schema(path).get("columns")
+        df = pd.DataFrame(arr, columns=columns if header and columns else None, copy=not mmap)
+
+    if not header:
+        df.columns = range(df.shape[1])
+    return df
+
+
+def write_table(df: pd.DataFrame, path: str | Path, header: bool = True) -> Path:
+    """Write a DataFrame in the format implied by the suffix of path.
+
+    header=False matches to_csv(header=False) for CSV; binary formats always keep
+    the column names (as the sidecar for .npy) and record whether they are meaningful.
+    """
+    path = Path(path)
+    fmt = table_format(path)
+    if fmt == "csv":
+        df.to_csv(path, index=False, header=header)
+        return path
+
+    columns = [int(c) if isinstance(c, (int, np.integer)) else str(c) for c in df.columns]
+    if fmt in ("parquet", "feather"):
+        out = df.reset_index(drop=True)
+        out.columns = [str(c) for c in columns]
+        if fmt == "parquet":
+            out.to_parquet(path, index=False)
+        else:
+            out.to_feather(path)
+        return path
+
+    non_numeric = [c for c, dtype in zip(df.columns, df.dtypes) if not pd.api.types.is_numeric_dtype(dtype)]
+    if non_numeric:
+        raise ValueError(f"Columns {non_numeric} are not numeric; use .csv or .parquet for {path}")
+    if fmt == "dset":
+        from dataset import write_dataset
+
+        return write_dataset(df.to_numpy(dtype=np.float64), path, columns=columns, header=header)
+    np.save(path, df.to_numpy(dtype=np.float64))
+    with open(schema_path(path), "w") as fh:
+        schema = {"columns": columns, "dtype": "float64", "header": bool(header), "rows": int(len(df))}
+        json.dump(schema, fh, indent=2)
+    return path
+
+
+def table_columns(path: str | Path, header: bool = True) -> list:
+    """Column labels read_table would return, without reading the data."""
+    fmt = table_format(path)
+    if fmt == "csv":
+        if header:
+            return list(pd.read_csv(path, nrows=0).columns)
+        return list(range(pd.read_csv(path, header=None, nrows=1).shape[1]))
+    if fmt in ("npy", "dset"):
+        arr, columns = _mapped_table(path)
+        return list(columns) if header and columns else list(range(arr.shape[1]))
+    return list(read_table(path, header=header).columns)
+
+
+def _mapped_table(path: str | Path) -> tuple[np.ndarray, list | None]:
+    """Memory-mapped rows of a .npy or .dset table and its stored column names."""
+    if table_format(path) == "dset":
+        from dataset import open_dataset
+
+        ds = open_dataset(path)
+        return ds.data, ds.columns
+    return np.load(path, mmap_mode="r"), read_schema(path).get("columns")
+
+
+def iter_table(
+    path: str | Path,
+    header: bool = True,
+    chunk_rows: int = 1_000_000,
+    usecols: list | None = None,
+) -> Iterator[pd.DataFrame]:
+    """Yield consecutive row blocks of a table; .npy/.dset are memory-mapped and CSV parsed in chunks.
+
+    usecols selects columns by label (positions when header=False) and fixes their order.
+    """
+    if chunk_rows < 1:
+        raise ValueError(f"chunk_rows must be >= 1, got {chunk_rows}")
+    fmt = table_format(path)
+    if fmt == "csv":
+        reader = pd.read_csv(path, header=0 if header else None, usecols=usecols, chunksize=chunk_rows)
+        for chunk in reader:
+            yield chunk if usecols is None else chunk[list(usecols)]
+        return
+    if fmt not in ("npy", "dset"):
+        # Columnar formats are read whole; they are compact enough for the tables used here.
+        df = read_table(path, header=header)
+        if usecols is not None:
+            df = df[list(usecols)]
+        for start in range(0, len(df), chunk_rows):
+            yield df.iloc[start : start + chunk_rows]
+        return
+
+    arr, _ = _mapped_table(path)
+    columns = table_columns(path, header=header)
+    positions = list(range(arr.shape[1])) if usecols is None else [columns.index(c) for c in usecols]
+    labels = [columns[i] for i in positions]
+    for start in range(0, arr.shape[0], chunk_rows):
+        yield pd.DataFrame(np.asarray(arr[start : start + chunk_rows][:, positions]), columns=labels)
+
+
+class NpyAppender:
+    """Append float64 rows to a 2-D .npy file; the header is finalized on close()."""
+
+    # Fixed header size so the final shape can be rewritten in place.
+    HEADER_BYTES = 128
+
+    def __init__(self, path: Path, n_cols: int):
+        self.path = path
+        self.n_cols = n_cols
+        self.n_rows = 0
+        self._fh = open(path, "wb")
+        self._write_header()
+
+    def _write_header(self) -> None:
+        header = (
+            f"{{'descr': '<f8', 'fortran_order': False, 'shape': ({self.n_rows}, {self.n_cols}), }}"
+        )
+        prefix = b"\x93NUMPY\x01\x00"
+        pad = self.HEADER_BYTES - len(prefix) - 2 - len(header) - 1
+        if pad < 0:
+            raise ValueError(f"Array shape too large for fixed .npy header: {self.path}")
+        body = (header + " " * pad + "\n").encode("latin1")
+        self._fh.write(prefix + len(body).to_bytes(2, "little") + body)
+
+    def append(self, rows: np.ndarray) -> None:
+        self._fh.write(np.ascontiguousarray(rows, dtype="<f8").tobytes())
+        self.n_rows += rows.shape[0]
+
+    def close(self) -> None:
+        self._fh.seek(0)
+        self._write_header()
+        self._fh.close()
+
+
+class TableWriter:
+    """Write a .csv, .npy or .dset table block by block, as write_table would write the whole frame.
+
+    Rows go to a temporary file that replaces path on close(), so path may also be
+    the table being streamed in.
+    """
+
+    def __init__(self, path: str | Path, header: bool = True):
+        self.path = Path(path)
+        self.fmt = table_format(self.path)
+        if self.fmt not in ("csv", "npy", "dset"):
+            raise ValueError(f"Streaming writes support .csv, .npy and .dset, not {self.path.suffix}")
+        self.header = header
+        self.tmp_path = self.path.with_name(self.path.name + ".partial")
+        self.columns: list | None = None
+        self.n_rows = 0
+        self._appender = None
+
+    def write(self, df: pd.DataFrame) -> None:
+        if self.columns is None:
+            self.columns = [int(c) if isinstance(c, (int, np.integer)) else str(c) for c in df.columns]
+            if self.fmt == "npy":
+                self._appender = NpyAppender(self.tmp_path, df.shape[1])
+            elif self.fmt == "dset":
+                from dataset import DatasetWriter
+
+                self._appender = DatasetWriter(self.tmp_path, self.columns, header=self.header)
+            else:
+                df.iloc[:0].to_csv(self.tmp_path, index=False, header=self.header)
+        if self._appender is not None:
+            self._appender.append(df.to_numpy(dtype=np.float64))
+        else:
+            df.to_csv(self.tmp_path, mode="a", index=False, header=False)
+        self.n_rows += len(df)
+
+    def close(self) -> Path:
+        if self.columns is None:
+            raise ValueError(f"No rows were written to {self.path}")
+        if self._appender is not None:
+            self._appender.close()
+        if self.fmt == "npy":
+            with open(schema_path(self.path), "w") as fh:
+                schema = {"columns": self.columns, "dtype": "float64", "header": bool(self.header), "rows": self.n_rows}
+                json.dump(schema, fh, indent=2)
+        os.replace(self.tmp_path, self.path)
+        return self.path
+
+    def abort(self) -> None:
+        """Discard the rows written so far; path is left as it was."""
+        if self._appender is not None:
+            self._appender.close()
+        self.tmp_path.unlink(missing_ok=True)
+
+
+def table_has_header(path: str | Path) -> bool:
+    """Whether a binary table was written from a headered source (CSV is never assumed headered)."""
+    fmt = table_format(path)
+    if fmt == "npy":
+        return bool(read_schema(path).get("header", False))
+    if fmt == "dset":
+        from dataset import read_dataset_header
+
+        return bool(read_dataset_header(path)[0].get("header", False))
+    return fmt in ("parquet", "feather")
+
+
+def convert_table(src: str | Path, dst: str | Path, header: bool | None = None) -> Path:
+    """Convert between formats; header=None keeps the header flag stored with a binary source."""
+    if header is None:
+        header = table_has_header(src)
+    df = read_table(src, header=header)
+    return write_table(df, dst, header=header)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Convert a table between .csv, .npy, .dset, .parquet and .feather.")
+    parser.add_argument("input", type=str, help="Source table")
+    parser.add_argument("output", type=str, help="Destination table; format taken from the suffix")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--has-header", action="store_true", help="Treat the source as having named columns.")
+    group.add_argument("--no-header", action="store_true", help="Treat the source as headerless.")
+    args = parser.parse_args()
+
+    header = True if args.has_header else False if args.no_header else None
+    out = convert_table(args.input, args.output, header=header)
+    print(f"Converted {args.input} -> {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""Joint velocity and acceleration from position samples, for all joints at once.
+
+Positions are (rows, joints) arrays. Every estimator is a linear recursion or
+convolution along axis 0, so all joints go through one scipy call per stage:
+
+    ewm     causal: EWM-smoothed position, np.gradient, then a second EWM of half
+            the span. This is the estimator pot_to_encoder.py has always used;
+            both EWMs lag the signal.
+    savgol  zero-phase Savitzky-Golay derivative (local polynomial fit) on the
+            median sample step.
+    kalman  constant-acceleration Kalman filter + RTS smoother with steady-state
+            gains, zero-phase. The process noise follows from bandwidth_hz.
+
+The steady-state Kalman filter and smoother are linear time-invariant. Each is
+diagonalized into three first-order recursions, which lfilter runs over every
+joint at once; the smoother output matches the textbook covariance recursion
+once the start-up transient has decayed.
+
+estimate_velocity_chunked() computes the same estimates chunk by chunk with a
+halo of rows around each chunk, so memory-mapped captures never load whole.
+The halo is exact for savgol. For ewm and kalman it is the length over which
+the recursion's memory decays below HALO_TOLERANCE.
+
+Columns with NaN gaps are estimated one finite run at a time; NaN rows stay NaN.
+"""
+
+from __future__ import annotations
+
+import math
+from functools import lru_cache
+
+import numpy as np
+from scipy.linalg import solve_discrete_are
+from scipy.signal import lfilter, savgol_filter
+
+from filter import finite_runs
+
+VELOCITY_METHODS = ("ewm", "savgol", "kalman")
+DEFAULT_EWM_SPAN = 25
+DEFAULT_SAVGOL_WINDOW = 101
+DEFAULT_SAVGOL_POLYORDER = 3
+DEFAULT_KALMAN_BANDWIDTH_HZ = 10.0
+HALO_TOLERANCE = 1e-12
+
+
+def sample_step(t: np.ndarray) -> float:
+    """Median positive timestamp step (1.0 when there is none)."""
+    dt = np.diff(np.asarray(t, dtype=float))
+    positive = dt[dt > 0]
+    return float(np.median(positive)) if len(positive) else 1.0
+
+
+def _ewm(x: np.ndarray, span: int) -> np.ndarray:
+    """pandas ewm(span, adjust=False).mean() along axis 0 for finite x."""
+    alpha = 2.0 / (span + 1.0)
+    return lfilter([alpha], [1.0, alpha - 1.0], x, axis=0, zi=(1.0 - alpha) * x[:1])[0]
+
+
+def _ewm_estimate(t, pos, step, monotonic, span, acceleration):
+    span = max(3, int(span))
+    smooth = _ewm(pos, span)
+    spacing = t if monotonic else step
+    vel = _ewm(np.gradient(smooth, spacing, axis=0, edge_order=1), max(3, span // 2))
+    if not acceleration:
+        return vel, None
+    return vel, np.gradient(vel, spacing, axis=0, edge_order=1)
+
+
+def _savgol_estimate(pos, step, window, polyorder, acceleration):
+    window = min(int(window) | 1, pos.shape[0] if pos.shape[0] % 2 else pos.shape[0] - 1)
+    polyorder = min(int(polyorder), window - 1)
+    vel = savgol_filter(pos, window, polyorder, deriv=1, delta=step, axis=0)
+    acc = savgol_filter(pos, window, polyorder, deriv=2, delta=step, axis=0) if acceleration else None
+    return vel, acc
+
+
+@lru_cache(maxsize=32)
+def kalman_gains(omega: float) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Steady-state constant-acceleration model in sample units for bandwidth omega (rad/sample).
+
+    Only the ratio of process to measurement noise sets the gains; with unit measurement
+    noise, white-jerk intensity omega**6 puts the filter's bandwidth near omega. The state
+    (position, velocity, acceleration) is scaled by 1/(1, omega, omega**2), which keeps the
+    eigenbases used by _modal_recursion well conditioned (~10 rather than ~1e5).
+
+    Returns:
+        (F, K, A, C, scale): transition, Kalman gain, filter matrix (I - K H) F and smoother
+        gain in scaled coordinates, and the scale taking scaled states back to sample units.
+    """
+    F = np.array([[1.0, 1.0, 0.5], [0.0, 1.0, 1.0], [0.0, 0.0, 1.0]])
+    H = np.array([[1.0, 0.0, 0.0]])
+    Q = omega**6 * np.array([[1 / 20, 1 / 8, 1 / 6], [1 / 8, 1 / 3, 1 / 2], [1 / 6, 1 / 2, 1.0]])
+    P_pred = solve_discrete_are(F.T, H.T, Q, np.array([[1.0]]))
+    K = P_pred[:, 0] / (P_pred[0, 0] + 1.0)
+    P = P_pred - np.outer(K, P_pred[0])
+    A = F - np.outer(K, F[0])
+    C = P @ F.T @ np.linalg.inv(P_pred)
+
+    scale = np.array([1.0, omega, omega**2])
+    return F * scale / scale[:, None], K / scale, A * scale / scale[:, None], C * scale / scale[:, None], scale
+
+
+def _modal_recursion(M: np.ndarray, u: np.ndarray, x0: np.ndarray) -> np.ndarray:
+    """x_k = M x_{k-1} + u_k for u of shape (N, 3, J) and x_{-1} = x0 (3, J), via M's eigenbasis."""
+    lam, V = np.linalg.eig(M)
+    V_inv = np.linalg.inv(V)
+    e = np.einsum("ij,njk->nik", V_inv, u)
+    w0 = V_inv @ x0
+    modes = np.empty_like(e)
+    for i, li in enumerate(lam):
+        modes[:, i] = lfilter([1.0], [1.0, -li], e[:, i], axis=0, zi=(li * w0[i])[np.newaxis])[0]
+    return np.einsum("ij,njk->nik", V, modes).real
+
+
+def _kalman_estimate(pos, step, bandwidth_hz, acceleration):
+    F, K, A, C, scale = kalman_gains(2 * math.pi * bandwidth_hz * step)
+    x0 = np.zeros((3, pos.shape[1]))
+    x0[0] = pos[0]
+    filtered = _modal_recursion(A, K[np.newaxis, :, np.newaxis] * pos[:, np.newaxis, :], x0)
+    # RTS pass, run forward over the reversed sequence: x_s[k] = C x_s[k+1] + (I - C F) x_f[k].
+    drive = np.einsum("ij,njk->nik", np.eye(3) - C @ F, filtered[::-1])
+    drive[0] = filtered[-1]
+    smoothed = _modal_recursion(C, drive, np.zeros_like(x0))[::-1]
+    vel = smoothed[:, 1] * (scale[1] / step)
+    acc = smoothed[:, 2] * (scale[2] / step**2) if acceleration else None
+    return vel, acc
+
+
+def _estimate_block(t, pos, method, step, monotonic, acceleration, params):
+    if method == "ewm":
+        return _ewm_estimate(t, pos, step, monotonic, params.get("span", DEFAULT_EWM_SPAN), acceleration)
+    if method == "savgol":
+        window = params.get("window", DEFAULT_SAVGOL_WINDOW)
+        polyorder = params.get("polyorder", DEFAULT_SAVGOL_POLYORDER)
+        return _savgol_estimate(pos, step, window, polyorder, acceleration)
+    return _kalman_estimate(pos, step, params.get("bandwidth_hz", DEFAULT_KALMAN_BANDWIDTH_HZ), acceleration)
+
+
+def _estimate(t, pos, method, step, monotonic, acceleration, params):
+    """Estimate over finite columns as one block and over each finite run of the others."""
+    vel = np.full(pos.shape, np.nan)
+    acc = np.full(pos.shape, np.nan) if acceleration else None
+    finite = np.isfinite(pos).all(axis=0)
+    blocks = [(slice(None), np.flatnonzero(finite))] if finite.any() else []
+    for c in np.flatnonzero(~finite):
+        blocks += [(slice(start, stop), np.array([c])) for start, stop in finite_runs(pos[:, c])]
+    for rows, cols in blocks:
+        block = pos[rows][:, cols]
+        if block.shape[0] < 3:
+            vel[rows, cols] = 0.0
+            if acceleration:
+                acc[rows, cols] = 0.0
+            continue
+        v, a = _estimate_block(t[rows], block, method, step, monotonic, acceleration, params)
+        vel[rows, cols] = v
+        if acceleration:
+            acc[rows, cols] = a
+    return vel, acc
+
+
+def _prepare(t, pos, method):
+    if method not in VELOCITY_METHODS:
+        raise ValueError(f"Unknown velocity method: {method}. Expected one of {VELOCITY_METHODS}")
+    t = np.asarray(t, dtype=float)
+    pos = np.asarray(pos, dtype=float)
+    return t, pos, pos.ndim == 1
+
+
+def estimate_velocity(t, pos, method: str = "ewm", acceleration: bool = False, **params):
+    """
+    Velocity (and optionally acceleration) of every position column.
+
+    Parameters:
+        t (array-like): (N,) timestamps in seconds.
+        pos (array-like): (N,) or (N, joints) positions.
+        method (str): "ewm", "savgol" or "kalman".
+        acceleration (bool): Also return the acceleration estimate.
+        **params: span (ewm), window and polyorder (savgol), bandwidth_hz (kalman).
+
+    Returns:
+        vel, or (vel, acc), shaped like pos.
+    """
+    t, pos, flat = _prepare(t, pos, method)
+    pos2 = pos.reshape(len(pos), -1)
+    dt = np.diff(t)
+    vel, acc = _estimate(t, pos2, method, sample_step(t), bool(np.all(dt > 0)), acceleration, params)
+    if flat:
+        vel = vel[:, 0]
+        acc = acc[:, 0] if acceleration else None
+    return (vel, acc) if acceleration else vel
+
+
+def halo_rows(method: str, step: float = 1.0, **params) -> tuple[int, int]:
+    """(rows before, rows after) a chunk needs so its interior matches the whole-signal estimate."""
+    if method == "ewm":
+        # Position EWM, then velocity EWM: a start-up error must decay through both in turn.
+        span = max(3, int(params.get("span", DEFAULT_EWM_SPAN)))
+        decays = (1.0 - 2.0 / (span + 1.0), 1.0 - 2.0 / (max(3, span // 2) + 1.0))
+        tail = sum(math.ceil(math.log(HALO_TOLERANCE) / math.log(decay)) for decay in decays) + 2
+        return tail, 2
+    if method == "savgol":
+        half = (int(params.get("window", DEFAULT_SAVGOL_WINDOW)) | 1) // 2
+        return half, half
+    _, _, A, C, _ = kalman_gains(2 * math.pi * params.get("bandwidth_hz", DEFAULT_KALMAN_BANDWIDTH_HZ) * step)
+    rows = [math.ceil(math.log(HALO_TOLERANCE) / math.log(np.abs(np.linalg.eigvals(M)).max())) for M in (A, C)]
+    return sum(rows), sum(rows)
+
+
+def estimate_velocity_chunked(t, pos, method: str = "ewm", chunk_rows: int = 1_000_000, acceleration: bool = False, **params):
+    """
+    estimate_velocity() computed chunk_rows output rows at a time.
+
+    t and pos only need row slicing (e.g. np.memmap columns of a .dset capture); each
+    chunk is estimated with halo_rows() of context on both sides.
+    """
+    if chunk_rows < 1:
+        raise ValueError(f"chunk_rows must be >= 1, got {chunk_rows}")
+    if method not in VELOCITY_METHODS:
+        raise ValueError(f"Unknown velocity method: {method}. Expected one of {VELOCITY_METHODS}")
+    flat = np.ndim(pos) == 1
+    n_rows = len(t)
+    t_all = np.asarray(t, dtype=float)
+    step = sample_step(t_all)
+    monotonic = bool(np.all(np.diff(t_all) > 0))
+    before, after = halo_rows(method, step, **params)
+
+    n_cols = 1 if flat else pos.shape[1]
+    vel = np.empty((n_rows, n_cols))
+    acc = np.empty((n_rows, n_cols)) if acceleration else None
+    for start in range(0, n_rows, chunk_rows):
+        stop = min(start + chunk_rows, n_rows)
+        lo, hi = max(0, start - before), min(n_rows, stop + after)
+        block = np.asarray(pos[lo:hi], dtype=float).reshape(hi - lo, -1)
+        v, a = _estimate(t_all[lo:hi], block, method, step, monotonic, acceleration, params)
+        vel[start:stop] = v[start - lo : stop - lo]
+        if acceleration:
+            acc[start:stop] = a[start - lo : stop - lo]
+    if flat:
+        vel = vel[:, 0]
+        acc = acc[:, 0] if acceleration else None
+    return (vel, acc) if acceleration else vel
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""Index of fixed-length training windows over a directory of preprocessed captures.
+
+Expected layout (any depth below each split; joints/jacobian tables pair by stem):
+
+    root/train/<capture>/joints/interpolated_all_joints.dset
+    root/train/<capture>/jacobian/interpolated_all_jacobian.dset
+    root/val/...   root/test/...
+
+build_window_index() reads every capture once. It records per-file row counts
+and timestamp ranges, plus the start row of every valid window. A window is
+valid when it holds no non-finite value and crosses no timestamp gap. Each split
+then has two flat arrays (file id, start row), so WindowSplit[i] resolves
+window i with two array lookups and slices the memory-mapped files. No file is
+scanned at read time. Binary tables (.dset from dataset.py, or .npy) are mapped;
+a CSV is read whole on its first access.
+
+Usage:
+    python3 window_index.py build preprocessed/ --window 200 [--stride 1] [-o preprocessed/windows.npz]
+    python3 window_index.py info preprocessed/windows.npz
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+
+from dataset import open_dataset
+from synchronize_streams import DEFAULT_GAP_FACTOR
+from table_io import read_table, table_format
+
+SPLITS = ("train", "val", "test")
+# Table formats find_captures() accepts, most preferred first.
+TABLE_PREFERENCE = (".dset", ".npy", ".csv")
+INDEX_VERSION = 1
+
+
+def _load_rows(path: Path) -> np.ndarray:
+    """All rows of a table as a 2-D array; memory-mapped for .dset and .npy."""
+    fmt = table_format(path)
+    if fmt == "dset":
+        return open_dataset(path).data
+    if fmt == "npy":
+        return np.load(path, mmap_mode="r")
+    return read_table(path, header=False).to_numpy(dtype=np.float64)
+
+
+def _tables_by_stem(folder: Path, rename: tuple[str, str] | None = None) -> dict[str, Path]:
+    """One table per stem in folder, preferring .dset over .npy over .csv (conversions of each other)."""
+    tables: dict[str, Path] = {}
+    for path in sorted(folder.iterdir()):
+        if not path.is_file() or path.suffix not in TABLE_PREFERENCE:
+            continue
+        stem = path.stem.replace(*rename) if rename else path.stem
+        if stem not in tables or TABLE_PREFERENCE.index(path.suffix) < TABLE_PREFERENCE.index(tables[stem].suffix):
+            tables[stem] = path
+    return tables
+
+
+def find_captures(root: str | Path, splits=SPLITS) -> list[tuple[str, Path, Path]]:
+    """
+    (split, joints file, jacobian file) for every joints/jacobian folder pair under root/<split>.
+
+    Tables are paired by stem, with "jacobian" in a jacobian stem read as "joints"
+    (interpolated_all_jacobian pairs with interpolated_all_joints). A stem present in
+    several formats is used once, in the format TABLE_PREFERENCE lists first.
+    """
+    root = Path(root)
+    captures = []
+    for split in splits:
+        for joints_dir in sorted((root / split).rglob("joints")):
+            jacobian_dir = joints_dir.with_name("jacobian")
+            if not joints_dir.is_dir() or not jacobian_dir.is_dir():
+                continue
+            joints_files = _tables_by_stem(joints_dir)
+            jacobian_files = _tables_by_stem(jacobian_dir, ("jacobian", "joints"))
+            unmatched = sorted(set(joints_files) ^ set(jacobian_files))
+            if unmatched:
+                raise ValueError(f"{joints_dir.parent}: joints and jacobian tables do not pair up; unmatched stems {unmatched}")
+            captures += [(split, joints_files[stem], jacobian_files[stem]) for stem in sorted(joints_files)]
+    return captures
+
+
+def valid_window_starts(
+    time: np.ndarray,
+    finite_rows: np.ndarray,
+    window: int,
+    stride: int = 1,
+    gap_factor: float = DEFAULT_GAP_FACTOR,
+) -> np.ndarray:
+    """Start rows s (multiples of stride) whose rows [s, s + window) are finite and gap-free."""
+    n_rows = len(time)
+    if n_rows < window:
+        return np.empty(0, dtype=np.int64)
+    bad = np.concatenate(([0], np.cumsum(~finite_rows, dtype=np.int64)))
+    dt = np.diff(time)
+    positive = dt[dt > 0]
+    median_dt = float(np.median(positive)) if len(positive) else 0.0
+    # A gap at j separates rows j and j + 1; non-increasing timestamps count as gaps too.
+    gap = (dt > gap_factor * median_dt) | (dt <= 0)
+    gaps = np.concatenate(([0], np.cumsum(gap, dtype=np.int64)))
+
+    starts = np.arange(0, n_rows - window + 1, stride)
+    ok = (bad[starts + window] == bad[starts]) & (gaps[starts + window - 1] == gaps[starts])
+    return starts[ok]
+
+
+def build_window_index(
+    root: str | Path,
+    window: int,
+    stride: int = 1,
+    output: str | Path | None = None,
+    gap_factor: float = DEFAULT_GAP_FACTOR,
+    splits=SPLITS,
+) -> Path:
+    """Scan every capture under root once and write the window index (default root/windows.npz)."""
+    if window < 1 or stride < 1:
+        raise ValueError(f"window and stride must be >= 1, got {window} and {stride}")
+    root = Path(root)
+    output = Path(output) if output is not None else root / "windows.npz"
+    base = output.resolve().parent
+
+    files = []
+    arrays = {}
+    for split in splits:
+        file_ids, starts = [], []
+        for split_name, joints_path, jacobian_path in find_captures(root, (split,)):
+            joints = _load_rows(joints_path)
+            jacobian = _load_rows(jacobian_path)
+            n_rows = min(len(joints), len(jacobian))
+            if len(joints) != len(jacobian):
+                print(f"{joints_path.parent.parent}: joints has {len(joints)} rows, jacobian {len(jacobian)}; using {n_rows}")
+            time = np.asarray(joints[:n_rows, 0], dtype=np.float64)
+            finite = np.isfinite(joints[:n_rows]).all(axis=1) & np.isfinite(jacobian[:n_rows]).all(axis=1)
+            file_starts = valid_window_starts(time, finite, window, stride, gap_factor)
+
+            file_ids.append(np.full(len(file_starts), len(files), dtype=np.uint32))
+            starts.append(file_starts)
+            files.append(
+                {
+                    "split": split_name,
+                    "joints": _relative(joints_path, base),
+                    "jacobian": _relative(jacobian_path, base),
+                    "rows": int(n_rows),
+                    "t_start": float(time[0]) if n_rows else None,
+                    "t_end": float(time[-1]) if n_rows else None,
+                    "windows": int(len(file_starts)),
+                }
+            )
+        all_starts = np.concatenate(starts) if starts else np.empty(0, dtype=np.int64)
+        start_dtype = np.uint32 if not len(all_starts) or all_starts.max() < 2**32 else np.int64
+        arrays[f"{split}_file"] = np.concatenate(file_ids) if file_ids else np.empty(0, dtype=np.uint32)
+        arrays[f"{split}_start"] = all_starts.astype(start_dtype)
+
+    meta = {"version": INDEX_VERSION, "window": window, "stride": stride, "gap_factor": gap_factor, "files": files}
+    output.parent.mkdir(parents=True, exist_ok=True)
+    np.savez(output, meta=np.array(json.dumps(meta)), **arrays)
+    return output
+
+
+def _relative(path: Path, base: Path) -> str:
+    """path relative to base when it lies below it, else absolute."""
+    path = path.resolve()
+    try:
+        return str(path.relative_to(base))
+    except ValueError:
+        return str(path)
+
+
+class WindowSplit:
+    """The windows of one split; split[i] -> (joints rows, jacobian rows) of window i."""
+
+    def __init__(self, index: WindowIndex, name: str, file_ids: np.ndarray, starts: np.ndarray):
+        self.index = index
+        self.name = name
+        self.file_ids = file_ids
+        self.starts = starts
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def locate(self, i: int) -> tuple[dict, int]:
+        """File record and start row of window i."""
+        return self.index.files[self.file_ids[i]], int(self.starts[i])
+
+    def __getitem__(self, i: int) -> tuple[np.ndarray, np.ndarray]:
+        file_id = int(self.file_ids[i])
+        start = int(self.starts[i])
+        joints, jacobian = self.index.tables(file_id)
+        stop = start + self.index.window
+        return joints[start:stop], jacobian[start:stop]
+
+
+class WindowIndex:
+    """A window index written by build_window_index; tables are opened lazily and kept open."""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        with np.load(self.path) as npz:
+            meta = json.loads(str(npz["meta"]))
+            arrays = {key: npz[key] for key in npz.files if key != "meta"}
+        if meta.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported window index version {meta.get('version')} in {self.path}")
+        self.window = int(meta["window"])
+        self.stride = int(meta["stride"])
+        self.gap_factor = float(meta["gap_factor"])
+        self.files: list[dict] = meta["files"]
+        self.splits = {
+            key[: -len("_start")]: WindowSplit(self, key[: -len("_start")], arrays[key[: -len("_start")] + "_file"], arrays[key])
+            for key in arrays
+            if key.endswith("_start")
+        }
+        self._tables: dict[int, tuple[np.ndarray, np.ndarray]] = {}
+
+    def __getitem__(self, split: str) -> WindowSplit:
+        return self.splits[split]
+
+    def tables(self, file_id: int) -> tuple[np.ndarray, np.ndarray]:
+        if file_id not in self._tables:
+            record = self.files[file_id]
+            base = self.path.resolve().parent
+            self._tables[file_id] = (_load_rows(base / record["joints"]), _load_rows(base / record["jacobian"]))
+        return self._tables[file_id]
+
+
+def load_window_index(path: str | Path) -> WindowIndex:
+    return WindowIndex(path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build or inspect a training window index.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Index every joints/jacobian pair under root/{train,val,test}.")
+    build.add_argument("root", type=str, help="Directory holding the train/val/test folders.")
+    build.add_argument("--window", type=int, required=True, help="Window length in rows.")
+    build.add_argument("--stride", type=int, default=1, help="Spacing of candidate window starts in rows.")
+    build.add_argument("--gap-factor", type=float, default=DEFAULT_GAP_FACTOR, help="Gap threshold in median intervals.")
+    build.add_argument("-o", "--output", type=str, default=None, help="Index file (default: root/windows.npz).")
+    info = sub.add_parser("info", help="Summarize an index file.")
+    info.add_argument("path", type=str)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        path = build_window_index(args.root, args.window, args.stride, args.output, args.gap_factor)
+        print(f"Saved window index to {path}")
+    else:
+        path = args.path
+    index = load_window_index(path)
+    print(f"window={index.window} rows, stride={index.stride}, {len(index.files)} captures")
+    for name, split in index.splits.items():
+        records = [f for f in index.files if f["split"] == name]
+        rows = sum(f["rows"] for f in records)
+        print(f" - {name}: {len(split)} windows from {len(records)} captures ({rows} rows)")
+
+
+if __name__ == "__main__":
+    main()